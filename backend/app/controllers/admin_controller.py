@@ -0,0 +1,158 @@
+"""
+Admin controller for diagnostics endpoints (profiles, memory, tenants, dataset uploads, warm-up, admission)
+"""
+import hmac
+import os
+from fastapi import APIRouter, Depends, File, Header, HTTPException, UploadFile
+from fastapi.responses import PlainTextResponse
+from typing import Dict, List, Any
+from app.utils.profiling import profile_store, PROFILING_ENABLED
+from app.utils.memory import memory_report, allocation_stats
+from app.services.dataset_registry import dataset_registry
+from app.services.ingestion_service import ingestion_manager, MAX_UPLOAD_BYTES
+from app.services.warmup_service import warmup_runner, load_targets
+from app.utils.admission import admission_controller, ADMISSION_ENABLED, DEFAULT_REQUEST_BUDGET
+
+# Uploads are read in chunks of this size so oversized files are refused without buffering them whole
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+def require_admin(x_admin_token: str = Header(default=None)):
+    """Guard admin endpoints with ADMIN_TOKEN; without a configured token they are disabled"""
+    expected = os.environ.get('ADMIN_TOKEN')
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN is not set)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/profiles")
+async def list_profiles() -> Dict[str, Any]:
+    """List the stored request profiles (most recent first)"""
+    return {
+        "enabled": PROFILING_ENABLED,
+        "profiles": profile_store.list()
+    }
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "json"):
+    """Get one profile as a JSON call tree or as pstats text (?format=text)"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile not found: {profile_id}")
+    if format == "text":
+        return PlainTextResponse(profile['text'])
+    return {key: value for key, value in profile.items() if key != 'text'}
+
+@router.delete("/profiles")
+async def clear_profiles() -> Dict[str, str]:
+    """Drop every stored profile"""
+    profile_store.clear()
+    return {"status": "cleared"}
+
+@router.get("/memory")
+def get_memory(tenant: str = None) -> Dict[str, Any]:
+    """Dataset column bytes, derived-structure bytes, load peaks and per-method allocation deltas
+    (sync: loading the tenant and deep_size over its structures run in the threadpool)"""
+    try:
+        service = dataset_registry.get(tenant)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown tenant: {tenant}")
+    try:
+        return memory_report(service)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error building memory report: {str(e)}")
+
+@router.get("/data-quality")
+def get_data_quality(tenant: str = None) -> Dict[str, Any]:
+    """Schema validation report of a tenant's dataset (coercions, repaired values, tCO2e consistency)"""
+    try:
+        service = dataset_registry.get(tenant)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown tenant: {tenant}")
+    return {
+        "tenant": tenant or dataset_registry.default_tenant,
+        "dataset_version": service.dataset_version,
+        "load_error": service.load_error,
+        "report": service.quality_report
+    }
+
+@router.delete("/memory/methods")
+async def clear_memory_methods() -> Dict[str, str]:
+    """Reset the per-method allocation statistics"""
+    allocation_stats.clear_methods()
+    return {"status": "cleared"}
+
+@router.post("/datasets", status_code=202)
+async def upload_dataset(file: UploadFile = File(...), mode: str = "replace", tenant: str = None) -> Dict[str, Any]:
+    """Queue an xlsx / CSV CLIMAS export for ingestion (replace a tenant's dataset, creating the tenant,
+    or append new periods); it goes live once the job succeeds"""
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Uploaded file exceeds {MAX_UPLOAD_BYTES:,} bytes")
+        chunks.append(chunk)
+    content = b''.join(chunks)
+    try:
+        return ingestion_manager.submit(file.filename, content, mode, tenant)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/datasets/jobs")
+async def list_ingestion_jobs() -> List[Dict[str, Any]]:
+    """Recent ingestion jobs (most recent first)"""
+    return ingestion_manager.list()
+
+@router.get("/datasets/jobs/{job_id}")
+async def get_ingestion_job(job_id: str) -> Dict[str, Any]:
+    """Status of an ingestion job with per-stage progress and timings"""
+    job = ingestion_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job not found: {job_id}")
+    return job
+
+@router.get("/tenants")
+async def list_tenants() -> Dict[str, Any]:
+    """Registered tenants with their load / spill state and the memory budget"""
+    return {
+        "memory_budget_bytes": dataset_registry.memory_budget,
+        "loaded_bytes": dataset_registry.loaded_bytes(),
+        "tenants": dataset_registry.tenants()
+    }
+
+@router.post("/tenants/{tenant}/evict")
+def evict_tenant(tenant: str) -> Dict[str, Any]:
+    """Spill a tenant's dataset to disk and free its memory (it reloads on next access)"""
+    try:
+        evicted = dataset_registry.evict(tenant)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown tenant: {tenant}")
+    return {"tenant": tenant, "evicted": evicted}
+
+@router.get("/warmup")
+async def get_warmup() -> Dict[str, Any]:
+    """Warm-up status per tenant with per-payload timings, in the order they were computed"""
+    return {
+        "targets": warmup_runner.prioritized(load_targets()),
+        **warmup_runner.status()
+    }
+
+@router.post("/warmup", status_code=202)
+async def run_warmup() -> Dict[str, Any]:
+    """Re-run the warm-up (e.g. after changing WARMUP_TARGETS_FILE or registering factor sets)"""
+    started = warmup_runner.start()
+    return {"started": started, **warmup_runner.status()}
+
+@router.get("/admission")
+async def get_admission() -> Dict[str, Any]:
+    """Concurrency, queue depth, hold-time estimate and rejections per cost class"""
+    return {
+        "enabled": ADMISSION_ENABLED,
+        "default_budget_seconds": DEFAULT_REQUEST_BUDGET,
+        "classes": admission_controller.describe()
+    }
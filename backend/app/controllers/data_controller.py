@@ -1,124 +1,263 @@
 """
 Data controller for emissions dashboard API endpoints
 """
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
 from typing import Dict, List, Any
-from app.services.data_service import emissions_service
+from app.models.data_model import FactorSet, ScenarioRequest
+from app.controllers.admin_controller import require_admin
+from app.services.data_service import EmissionsDataService
+from app.services.dataset_registry import dataset_registry
+from app.services.report_service import report_renderer, parse_charts, REPORT_FORMATS
 
+# Every endpoint is sync so FastAPI runs it in its threadpool: even "cheap" routes can load a tenant or
+# build an index on first use, which must not stall the event loop. Admission control
+# (app/utils/admission.py) caps the chart routes so the cheap ones still find free threads
 router = APIRouter()
 
+def _get_tenant_service(tenant: str = None) -> EmissionsDataService:
+    """Resolve a tenant's service (the default tenant when none is given), loading it on first use"""
+    try:
+        return dataset_registry.get(tenant)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown tenant: {tenant}")
+
+def _get_service(factor_set: str = None, tenant: str = None) -> EmissionsDataService:
+    """Resolve the tenant's service view for the requested factor set (stored emissions by default)"""
+    service = _get_tenant_service(tenant)
+    if factor_set and not service.factor_engine.has_factor_set(factor_set):
+        raise HTTPException(status_code=404, detail=f"Unknown factor set: {factor_set}")
+    return service.with_factor_set(factor_set)
+
 @router.get("/emissions")
-async def get_emissions_data() -> Dict[str, Any]:
+def get_emissions_data(factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
     """Get emissions data organized by scope"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_emissions_by_scope()
+        return service.get_emissions_by_scope()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving emissions data: {str(e)}")
 
 @router.get("/emissions/parameters")
-async def get_emissions_by_parameter(limit: int = 10) -> List[Dict[str, Any]]:
+def get_emissions_by_parameter(limit: int = 10, factor_set: str = None, tenant: str = None) -> List[Dict[str, Any]]:
     """Get top emissions by parameter type"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_emissions_by_parameter(limit)
+        return service.get_emissions_by_parameter(limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving parameter data: {str(e)}")
 
 @router.get("/emissions/hierarchy")
-async def get_emissions_by_hierarchy() -> Dict[str, float]:
+def get_emissions_by_hierarchy(factor_set: str = None, tenant: str = None) -> Dict[str, float]:
     """Get emissions by hierarchy level"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_emissions_by_hierarchy()
+        return service.get_emissions_by_hierarchy()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving hierarchy data: {str(e)}")
 
 @router.get("/summary")
-async def get_summary_stats() -> Dict[str, Any]:
-    """Get summary statistics for the dashboard"""
+def get_summary_stats(exact: bool = False, factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
+    """Get summary statistics for the dashboard (distinct counts / percentiles from sketches unless exact)"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_summary_stats()
+        return service.get_summary_stats(exact)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving summary stats: {str(e)}")
 
+@router.get("/factor-sets")
+def list_factor_sets(tenant: str = None) -> List[Dict[str, Any]]:
+    """List the factor sets charts can be evaluated against"""
+    return _get_tenant_service(tenant).factor_engine.list_factor_sets()
+
+@router.post("/factor-sets", dependencies=[Depends(require_admin)])
+def register_factor_set(factor_set: FactorSet, tenant: str = None) -> Dict[str, Any]:
+    """Register (or replace) a named GWP / emission-factor table (admin only: it changes every tenant user's charts)"""
+    service = _get_tenant_service(tenant)
+    try:
+        stored = service.factor_engine.register_factor_set(factor_set)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"name": stored.name, "version": stored.version}
+
+@router.get("/emissions/time-series")
+def get_time_series(dimension: str = "Escopo", year: int = None, window: int = 3,
+                    factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
+    """Get monthly series with rolling averages, year-over-year deltas and trends"""
+    service = _get_service(factor_set, tenant)
+    try:
+        return service.get_time_series(dimension, year, window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving time series: {str(e)}")
+
+@router.post("/scenarios/simulate")
+def simulate_reduction_scenario(request: ScenarioRequest, factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
+    """Monte Carlo simulation of reduction levers with percentile bands"""
+    service = _get_service(factor_set, tenant)
+    try:
+        return service.simulate_reduction_scenario(
+            [lever.model_dump() for lever in request.levers],
+            request.year,
+            request.trials,
+            request.seed
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error running scenario simulation: {str(e)}")
+
 # New endpoints for chart proposals
 @router.get("/emissions/top-parameters")
-async def get_top_emission_parameters(limit: int = 15) -> List[Dict[str, Any]]:
+def get_top_emission_parameters(limit: int = 15, factor_set: str = None, tenant: str = None) -> List[Dict[str, Any]]:
     """Get top emission sources by parameter type for Chart 1"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_top_emission_parameters(limit)
+        return service.get_top_emission_parameters(limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving top parameters: {str(e)}")
 
+@router.get("/emissions/top")
+def get_top_n(dimension: str = "Parâmetro", limit: int = 10, year: int = None, others: bool = True,
+              factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
+    """Get the top-N keys of any dimension by emissions, with an "others" bucket"""
+    service = _get_service(factor_set, tenant)
+    try:
+        return service.get_top_n(dimension, limit, year, others)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving top-N data: {str(e)}")
+
+@router.get("/search")
+def search_dimension_values(q: str = "", dimension: str = None, limit: int = 10,
+                            factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
+    """Autocomplete dimension values (Parâmetro, Unidade operacional, Tecnologia, hierarchy nodes...);
+    dimension is an optional comma-separated list restricting the dimensions searched"""
+    service = _get_service(factor_set, tenant)
+    try:
+        dimensions = [name.strip() for name in dimension.split(',') if name.strip()] if dimension else None
+        return service.get_search_suggestions(q, dimensions, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching dimension values: {str(e)}")
+
 @router.get("/emissions/hierarchy-treemap")
-async def get_hierarchy_treemap_data(level: int = 3) -> Dict[str, Any]:
+def get_hierarchy_treemap_data(level: int = 3, factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
     """Get hierarchy data for treemap visualization for Chart 2"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_hierarchy_treemap_data(level)
+        return service.get_hierarchy_treemap_data(level)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving hierarchy treemap data: {str(e)}")
 
 @router.get("/emissions/transportation")
-async def get_transportation_emissions() -> Dict[str, Any]:
+def get_transportation_emissions(factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
     """Get transportation emissions breakdown for Chart 3"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_transportation_emissions()
+        return service.get_transportation_emissions()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving transportation data: {str(e)}")
 
 @router.get("/emissions/scope-category")
-async def get_emissions_by_scope_category(year: int = 2023) -> Dict[str, Any]:
+def get_emissions_by_scope_category(year: int = 2023, factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
     """Get emissions data organized by scope and category for Chart 1"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_emissions_by_scope_category(year)
+        return service.get_emissions_by_scope_category(year)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving scope-category data: {str(e)}")
 
 @router.get("/emissions/gas-breakdown")
-async def get_gas_emissions_breakdown(year: int = 2023) -> Dict[str, Any]:
+def get_gas_emissions_breakdown(year: int = 2023, factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
     """Get gas emissions breakdown with conversion factors for Chart 2"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_gas_emissions_breakdown(year)
+        return service.get_gas_emissions_breakdown(year)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving gas breakdown data: {str(e)}")
 
 @router.get("/emissions/hierarchical-heatmap")
-async def get_hierarchical_emissions_heatmap(year: int = 2023) -> Dict[str, Any]:
+def get_hierarchical_emissions_heatmap(year: int = 2023, factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
     """Get hierarchical emissions data for heatmap visualization for Chart 3"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_hierarchical_emissions_heatmap(year)
+        return service.get_hierarchical_emissions_heatmap(year)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving hierarchical heatmap data: {str(e)}")
 
 # New endpoints for the three proposed charts
 @router.get("/emissions/operational-performance")
-async def get_operational_performance(year: int = 2023, limit: int = 15) -> Dict[str, Any]:
+def get_operational_performance(year: int = 2023, limit: int = 15, factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
     """Get operational unit performance data for Chart Proposal 1"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_operational_performance(year, limit)
+        return service.get_operational_performance(year, limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving operational performance data: {str(e)}")
 
 @router.get("/emissions/process-technology-analysis")
-async def get_process_technology_analysis(technology: str = None, scope: str = None) -> Dict[str, Any]:
+def get_process_technology_analysis(technology: str = None, scope: str = None, factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
     """Get process and technology emissions analysis for Chart Proposal 2"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_process_technology_analysis(technology, scope)
+        return service.get_process_technology_analysis(technology, scope)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving process technology analysis: {str(e)}")
 
+@router.get("/emissions/flows")
+def get_emissions_flows(stages: str = None, technology: str = None, scope: str = None, year: int = None,
+                        factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
+    """Get multi-stage Sankey flows; stages is a comma-separated list (default Tecnologia,Categoria,Escopo,Gás)"""
+    service = _get_service(factor_set, tenant)
+    try:
+        stage_list = [stage.strip() for stage in stages.split(',') if stage.strip()] if stages else None
+        return service.get_emissions_flows(stage_list, technology, scope, year)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving emissions flows: {str(e)}")
+
 @router.get("/emissions/hierarchical-intelligence")
-async def get_hierarchical_intelligence(level: int = 1, year: int = 2023) -> Dict[str, Any]:
-    """Get hierarchical emissions intelligence for Chart Proposal 3"""
+def get_hierarchical_intelligence(level: int = 1, year: int = 2023, exact: bool = False,
+                                  factor_set: str = None, tenant: str = None) -> Dict[str, Any]:
+    """Get hierarchical emissions intelligence for Chart Proposal 3 (unit counts from sketches unless exact)"""
+    service = _get_service(factor_set, tenant)
     try:
-        return emissions_service.get_hierarchical_intelligence(level, year)
+        return service.get_hierarchical_intelligence(level, year, exact)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving hierarchical intelligence data: {str(e)}")
 
+@router.get("/reports/export")
+def export_report(format: str = "pdf", charts: str = None, year: int = 2023, level: int = 3,
+                  factor_set: str = None, tenant: str = None) -> Response:
+    """Render chart payloads (scope-category, gas-breakdown, treemap, heatmap) into a PDF or PNG report"""
+    service = _get_service(factor_set, tenant)
+    try:
+        report, cached = report_renderer.render(service, parse_charts(charts), format, year, level, factor_set)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error rendering report: {str(e)}")
+    return Response(
+        content=report,
+        media_type=REPORT_FORMATS[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="emissions-report-{year}.{format}"',
+            "X-Report-Cache": "hit" if cached else "miss"
+        }
+    )
+
 @router.get("/health")
-async def data_health_check() -> Dict[str, str]:
+def data_health_check(tenant: str = None) -> Dict[str, str]:
     """Health check for data service"""
+    service = _get_tenant_service(tenant)
     try:
         # Try to access the data service
-        stats = emissions_service.get_summary_stats()
+        stats = service.get_summary_stats()
         return {
             "status": "healthy",
             "service": "Emissions Data Service",
@@ -3,12 +3,18 @@ Main FastAPI application for ESG Dashboard
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uvicorn
 import os
 
 # Import routers
-from app.controllers import data_controller
+from app.controllers import data_controller, admin_controller
+from app.utils.metrics import MetricsMiddleware, metrics
+from app.utils.profiling import ProfilingMiddleware
+from app.utils.admission import AdmissionMiddleware
+from app.services.dataset_registry import dataset_registry
+from app.services.warmup_service import warmup_runner, WARMUP_ENABLED, READINESS_WAITS_FOR_WARMUP
+from app.services.report_service import report_renderer
 
 app = FastAPI(
     title="ESG Dashboard API",
@@ -16,6 +22,10 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Per-endpoint concurrency caps and load shedding (added first so CORS and metrics also cover the 503s);
+# requests are held while their dataset loads or warms instead of spending their budget on it
+app.add_middleware(AdmissionMiddleware, registry=dataset_registry, warming=warmup_runner.is_warming)
+
 # Configure CORS for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -30,8 +40,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency, size and in-flight metrics (served on /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in request profiling (ENABLE_PROFILING=1 plus X-Profile header or ?profile=1)
+app.add_middleware(ProfilingMiddleware)
+
 # Include routers
 app.include_router(data_controller.router, prefix="/api/data", tags=["data"])
+app.include_router(admin_controller.router, prefix="/admin", tags=["admin"])
+
+@app.on_event("startup")
+async def start_warmup():
+    """Load the datasets and precompute the default chart payloads in the background"""
+    if WARMUP_ENABLED:
+        warmup_runner.start()
+
+@app.on_event("shutdown")
+async def save_route_frequencies():
+    """Keep this process' route counts for prioritizing the next warm-up"""
+    warmup_runner.save_frequencies()
+
+@app.on_event("shutdown")
+async def stop_report_workers():
+    """Stop the report rendering processes"""
+    report_renderer.shutdown()
 
 @app.get("/")
 async def root():
@@ -48,6 +81,21 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "ESG Dashboard API"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 503 until the default dataset is loaded (and warmed, with READINESS_WAITS_FOR_WARMUP)"""
+    if not WARMUP_ENABLED:
+        return {"status": "ready", "warmup": "disabled"}
+    warmup = warmup_runner.status()
+    ready = warmup_runner.is_finished() if READINESS_WAITS_FOR_WARMUP else warmup_runner.is_data_ready()
+    content = {"status": "ready" if ready else "starting", "warmup": warmup['status']}
+    return JSONResponse(content=content, status_code=200 if ready else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus metrics in text exposition format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/test")
 async def test_endpoint():
     """Simple test endpoint that doesn't depend on data files"""
@@ -61,4 +61,29 @@ class ChartData(BaseModel):
     """Chart data response"""
     labels: List[str]
     datasets: List[Dict[str, Any]]
-    metadata: Optional[Dict[str, Any]] = None 
\ No newline at end of file
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class FactorSet(BaseModel):
+    """Named table of GWP values (by gas) and emission factors (by parameter, then gas)"""
+    name: str
+    description: Optional[str] = None
+    gwp: Dict[str, float] = Field(default_factory=dict)
+    # {"Parâmetro": {"Gás": factor}} - one parameter emits several gases with very different factors
+    emission_factors: Dict[str, Dict[str, float]] = Field(default_factory=dict)
+    version: int = 1
+
+class ReductionLever(BaseModel):
+    """Reduction applied to every row matching one dimension value, as a % range"""
+    dimension: str  # 'Categoria', 'Tecnologia' or 'Unidade operacional'
+    value: str
+    low: float = Field(ge=0, le=100)
+    high: float = Field(ge=0, le=100)
+    mode: Optional[float] = Field(default=None, ge=0, le=100)  # triangular distribution when set
+
+class ScenarioRequest(BaseModel):
+    """Monte Carlo reduction scenario"""
+    levers: List[ReductionLever]
+    year: Optional[int] = 2023
+    trials: int = Field(default=5000, ge=1, le=200000)
+    seed: Optional[int] = None
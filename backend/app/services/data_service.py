@@ -3,53 +3,314 @@ Data service for processing ESG emissions data from TestData.xlsx
 """
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Callable, Tuple
+import copy
+import itertools
 import os
+import threading
 
+from app.services.factor_service import FactorRecalculationEngine, REPORTED_FACTOR_SET
+from app.services.scenario_service import ScenarioSimulator
+from app.services.flow_service import build_flows, DEFAULT_FLOW_STAGES
+from app.services.ranking_service import RankedAggregate, RANKING_DIMENSIONS, RANKING_MEASURES
+from app.services.timeseries_service import TimeSeriesIndex, SERIES_DIMENSIONS, parse_month_index, format_month
+from app.services.sketch_service import PartitionedSketches, SUMMARY_QUANTILES
+from app.services.search_service import SearchIndex, SEARCH_DIMENSIONS, MAX_SEARCH_LIMIT
+from app.services.schema_service import validate_frame, check_consistency, combine_reports, factor_value
+from app.utils.metrics import instrument_methods
+from app.utils.profiling import profile_methods
+from app.utils.payload_cache import PayloadCache, cached_payload
+from app.utils.memory import (
+    trace_methods, traced_phase, start_tracing, deep_size, frame_buffers, frame_bytes, MEMORY_TRACING_ENABLED
+)
+
+# Dataset versions are unique across service instances so caches never mix datasets
+_dataset_versions = itertools.count(1)
+
+# Derived structures the chart endpoints read - built ahead of go-live by the ingestion pipeline
+PREBUILT_SERIES = [
+    'parameter_category', ('Escopo', 'Categoria'), 'Gás', 'Unidade operacional',
+    'Hierarquia nível 1', 'Hierarquia nível 2', 'Hierarquia nível 3'
+]
+PREBUILT_RANKINGS = ['Parâmetro', ('Unidade operacional', 'Hierarquia nível 2')]
+# (cell dimensions, distinct-count column, with quantiles) - summary stats and level-1 intelligence
+PREBUILT_SKETCHES = [((), 'Parâmetro', True), (('Hierarquia nível 1', 'Escopo'), 'Unidade operacional', False)]
+
+@profile_methods('get_', 'simulate_')
+@instrument_methods('get_', 'simulate_')
+@trace_methods('get_', 'simulate_')
 class EmissionsDataService:
-    def __init__(self):
-        # Try multiple paths for different environments
-        possible_paths = [
-            "../data/TestData.xlsx",  # Local development
-            "./data/TestData.xlsx",   # Railway deployment
-            "data/TestData.xlsx"      # Alternative
-        ]
-        
-        self.data_file_path = None
-        for path in possible_paths:
-            if os.path.exists(path):
-                self.data_file_path = path
-                break
-        
-        if not self.data_file_path:
-            print("Warning: TestData.xlsx not found in any expected location")
-            self.data_file_path = "../data/TestData.xlsx"  # Fallback
-        
-        self._load_data()
+    def __init__(self, data_file_path: str = None, df: pd.DataFrame = None, clean: bool = True,
+                 quality_report: Dict[str, Any] = None):
+        """Load TestData.xlsx (default), another data file, or an already-parsed frame
+        (raw, or already cleaned when clean=False - e.g. a spilled snapshot). A `quality_report`
+        means the frame already went through schema validation (see schema_service)"""
+        self.data_file_path = data_file_path
+        
+        if not self.data_file_path and df is None:
+            # Try multiple paths for different environments
+            possible_paths = [
+                "../data/TestData.xlsx",  # Local development
+                "./data/TestData.xlsx",   # Railway deployment
+                "data/TestData.xlsx"      # Alternative
+            ]
+            
+            for path in possible_paths:
+                if os.path.exists(path):
+                    self.data_file_path = path
+                    break
+            
+            if not self.data_file_path:
+                print("Warning: TestData.xlsx not found in any expected location")
+                self.data_file_path = "../data/TestData.xlsx"  # Fallback
+        
+        self.dataset_version = 0
+        self.load_error = None
+        self.quality_report = None
+        self.factor_engine = FactorRecalculationEngine()
+        self._load_data(df, clean, quality_report)
     
-    def _load_data(self):
+    @traced_phase
+    def _load_data(self, raw_df: pd.DataFrame = None, clean: bool = True, quality_report: Dict[str, Any] = None):
         """Load and preprocess the emissions data"""
         try:
-            # Load the Excel file
-            self.df = pd.read_excel(self.data_file_path)
+            # Load the Excel file (unless a raw frame was handed over)
+            self.df = raw_df if raw_df is not None else pd.read_excel(self.data_file_path)
             
             # Clean and prepare the data
-            self._clean_data()
+            if clean:
+                self._clean_data(quality_report)
+            else:
+                self.quality_report = quality_report
             
         except Exception as e:
             print(f"Error loading data: {e}")
+            self.load_error = str(e)
             self.df = pd.DataFrame()
+        
+        self._on_dataset_changed()
+    
+    def _on_dataset_changed(self):
+        """Invalidate everything derived from the previous dataset"""
+        self.dataset_version = next(_dataset_versions)
+        self.factor_engine.bind(self.df)
+        self._reset_caches()
+    
+    def _reset_caches(self):
+        """Drop per-instance derived structures (they are rebuilt lazily)"""
+        self._factor_views = {}
+        self._scenario_simulators = {}
+        self._timeseries = None
+        self._rankings = {}
+        self._periods = None
+        self._search_index = None
+        self._sketches = {}
+        self._payloads = PayloadCache()
+    
+    def _get_timeseries(self) -> TimeSeriesIndex:
+        """Monthly series index, built on first use"""
+        if self._timeseries is None:
+            self._timeseries = TimeSeriesIndex(self.df)
+        return self._timeseries
+    
+    def _get_ranking(self, dimension, year: int = None) -> RankedAggregate:
+        """Sum/count aggregate per key of a dimension (optionally one year), built on first use"""
+        key = (dimension, year)
+        if key not in self._rankings:
+            source_df = self.df if year is None else self.df[self.df['Ano'] == year]
+            self._rankings[key] = RankedAggregate(source_df, dimension)
+        return self._rankings[key]
+    
+    def _get_sketches(self, dimension: tuple, distinct_column: str, quantiles: bool = False) -> PartitionedSketches:
+        """Per (dimension, month) distinct-count / quantile sketches, built on first use"""
+        key = (dimension, distinct_column, quantiles)
+        if key not in self._sketches:
+            self._sketches[key] = PartitionedSketches(self.df, dimension, distinct_column, quantiles)
+        return self._sketches[key]
+    
+    def _get_search_index(self) -> SearchIndex:
+        """Autocomplete index over the string dimensions (shares the per-dimension rankings), built on first use"""
+        if self._search_index is None:
+            self._search_index = SearchIndex({dimension: self._get_ranking(dimension) for dimension in SEARCH_DIMENSIONS})
+        return self._search_index
+    
+    def build_indexes(self, progress: Callable[[float], None] = None):
+        """Build the series / rankings the chart endpoints use instead of on their first request"""
+        if self.df.empty:
+            return
+        
+        latest_year = int(self.df['Ano'].max())
+        timeseries = self._get_timeseries()
+        steps = [lambda dimension=dimension: timeseries.series(dimension) for dimension in PREBUILT_SERIES]
+        steps += [lambda dimension=dimension: self._get_ranking(dimension) for dimension in PREBUILT_RANKINGS]
+        steps += [lambda dimension=dimension: self._get_ranking(dimension, latest_year) for dimension in PREBUILT_RANKINGS]
+        steps += [lambda spec=spec: self._get_sketches(*spec) for spec in PREBUILT_SKETCHES]
+        steps.append(self._get_search_index)
+        
+        for i, step in enumerate(steps):
+            step()
+            if progress:
+                progress((i + 1) / len(steps))
     
-    def _clean_data(self):
+    def with_factor_set(self, name: str = None) -> 'EmissionsDataService':
+        """Return a view of this service whose emissions are recomputed with a named factor set"""
+        if not name or name == REPORTED_FACTOR_SET or self.df.empty:
+            return self
+        
+        key = (name, self.factor_engine.get_factor_set(name).version, self.dataset_version)
+        view = self._factor_views.get(key)
+        if view is None:
+            columns = self.factor_engine.recalculate(name)
+            
+            view = copy.copy(self)
+            view.df = self.df.assign(**columns)
+            view._reset_caches()
+            self._factor_views = {
+                cached_key: cached_view for cached_key, cached_view in self._factor_views.items()
+                if cached_key[0] != name
+            }
+            self._factor_views[key] = view
+        
+        return view
+    
+    def describe_memory(self) -> Dict[str, Any]:
+        """Retained bytes of every derived structure (the base frame is reported separately)"""
+        seen = frame_buffers(self.df)
+        structures = {
+            'timeseries_index': deep_size(self._timeseries, seen),
+            'rankings': deep_size(self._rankings, seen),
+            'search_index': deep_size(self._search_index, seen),
+            'sketches': deep_size(self._sketches, seen),
+            'scenario_simulators': deep_size(self._scenario_simulators, seen),
+            'factor_engine': deep_size(self.factor_engine, seen),
+            'payload_cache': deep_size(self._payloads, seen)
+        }
+        
+        # Factor views only own the recomputed columns plus their own derived structures
+        factor_views = {}
+        for (name, version, _), view in self._factor_views.items():
+            factor_views[f"{name}@v{version}"] = frame_bytes(view.df, base=self.df) + sum(
+                deep_size(structure, seen)
+                for structure in (view._timeseries, view._rankings, view._scenario_simulators, view._search_index,
+                                  view._sketches)
+            )
+        structures['factor_views'] = sum(factor_views.values())
+        
+        return {
+            'total_bytes': sum(structures.values()),
+            'structures': structures,
+            'factor_views': factor_views,
+            'entries': {
+                'timeseries_dimensions': len(self._timeseries.built_dimensions()) if self._timeseries is not None else 0,
+                'rankings': len(self._rankings),
+                'search_entries': len(self._search_index) if self._search_index is not None else 0,
+                'sketch_cells': sum(len(sketches) for sketches in self._sketches.values()),
+                'scenario_simulators': len(self._scenario_simulators),
+                'factor_views': len(self._factor_views),
+                'payloads': len(self._payloads)
+            }
+        }
+    
+    @traced_phase
+    def _clean_data(self, quality_report: Dict[str, Any] = None):
         """Clean and prepare the data for analysis"""
+        self.df, self.quality_report = self.clean_rows(self.df, quality_report)
+    
+    def clean_rows(self, raw_df: pd.DataFrame, quality_report: Dict[str, Any] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """Clean raw export rows into the analysis frame layout, returning the rows and their data-quality
+        report (the frame is schema-validated first unless `quality_report` comes from validate_frame)"""
+        if quality_report is None:
+            raw_df, quality_report = validate_frame(raw_df)
+        
         # Remove rows with zero emissions (keeping only meaningful data)
-        self.df = self.df[self.df['Emissões (tCO2e)'] > 0].copy()
+        df = raw_df[raw_df['Emissões (tCO2e)'] > 0].copy()
+        quality_report['rows']['non_positive_emissions'] = int(len(raw_df) - len(df))
+        quality_report['rows']['clean'] = int(len(df))
+        quality_report['consistency'] = check_consistency(df)
         
         # Create a simplified parameter category for grouping
-        self.df['parameter_category'] = self.df['Parâmetro'].apply(self._categorize_parameter)
+        df['parameter_category'] = df['Parâmetro'].apply(self._categorize_parameter)
+        
+        # Parse the competency period once into an integer month index
+        df['month_index'] = parse_month_index(df['Competência'], df['Ano'])
+        return df, quality_report
+    
+    def loaded_periods(self) -> frozenset:
+        """Month indexes present in the dataset"""
+        if self._periods is None:
+            self._periods = frozenset(np.unique(self.df['month_index']).tolist()) if not self.df.empty else frozenset()
+        return self._periods
+    
+    def append_rows(self, delta: pd.DataFrame, quality_report: Dict[str, Any] = None) -> 'EmissionsDataService':
+        """New service over this dataset plus cleaned `delta` rows (see clean_rows) for periods not loaded yet
+        
+        Every derived structure already built (monthly series, rankings, scenario cells, recomputed
+        factor columns and factor views) is carried over and updated with the delta only; this
+        service is left untouched so it keeps serving until the new one is activated.
+        """
+        if delta.empty:
+            raise ValueError("No rows with positive emissions to append")
+        if self.df.empty:
+            return EmissionsDataService(data_file_path=self.data_file_path, df=delta, clean=False,
+                                        quality_report=quality_report)
+        
+        overlapping = self.loaded_periods() & set(np.unique(delta['month_index']).tolist())
+        if overlapping:
+            periods = ', '.join(format_month(month) for month in sorted(overlapping))
+            raise ValueError(f"Periods already loaded (append only takes new periods): {periods}")
+        
+        missing = [col for col in self.df.columns if col not in delta.columns]
+        if missing:
+            raise ValueError(f"Appended rows are missing columns: {', '.join(missing)}")
+        
+        service = self._appended(pd.concat([self.df, delta[self.df.columns]], ignore_index=True), delta)
+        service.dataset_version = next(_dataset_versions)
+        service.factor_engine = self.factor_engine.appended(service.df, delta)
+        service.quality_report = combine_reports(self.quality_report, quality_report)
+        service._periods = self.loaded_periods() | set(np.unique(delta['month_index']).tolist())
+        
+        # Factor views are re-keyed to the new dataset version, their structures updated the same way
+        for (name, version, _), view in self._factor_views.items():
+            columns = service.factor_engine.recalculate(name)
+            view_delta = delta.assign(**{col: values[len(self.df):] for col, values in columns.items()})
+            service_view = view._appended(service.df.assign(**columns), view_delta)
+            service_view.factor_engine = service.factor_engine
+            service_view.dataset_version = service.dataset_version
+            service._factor_views[(name, version, service.dataset_version)] = service_view
+        
+        return service
+    
+    def _appended(self, df: pd.DataFrame, delta: pd.DataFrame) -> 'EmissionsDataService':
+        """Shallow copy over `df` (this frame followed by `delta`) with the built structures updated"""
+        service = copy.copy(self)
+        service.df = df
+        service._reset_caches()
+        
+        if self._timeseries is not None:
+            service._timeseries = self._timeseries.appended(df, delta)
+        
+        delta_years = {}
+        for (dimension, year), ranking in self._rankings.items():
+            if year is None:
+                service._rankings[(dimension, year)] = ranking.appended(delta)
+            else:
+                if year not in delta_years:
+                    delta_years[year] = delta[delta['Ano'] == year]
+                service._rankings[(dimension, year)] = ranking.appended(delta_years[year])
+        
+        # Sketch cells are per month, so the delta's periods only add cells
+        for key, sketches in self._sketches.items():
+            service._sketches[key] = sketches.appended(delta)
         
-        # Ensure year is properly formatted
-        self.df['Ano'] = self.df['Ano'].astype(int)
+        for year, simulator in self._scenario_simulators.items():
+            if year is None:
+                service._scenario_simulators[year] = simulator.appended(delta)
+            else:
+                if year not in delta_years:
+                    delta_years[year] = delta[delta['Ano'] == year]
+                service._scenario_simulators[year] = simulator.appended(delta_years[year])
+        
+        return service
     
     def _categorize_parameter(self, parameter: str) -> str:
         """Categorize parameters into emission scopes"""
@@ -80,57 +341,59 @@ class EmissionsDataService:
         ]
         return any(keyword in parameter.lower() for keyword in transport_keywords)
     
+    @cached_payload
     def get_emissions_by_scope(self) -> Dict[str, Any]:
         """Get emissions data organized by scope for the dashboard"""
         if self.df.empty:
             return self._get_empty_data()
         
-        # Group by scope and calculate totals
-        scope_data = self.df.groupby('parameter_category')['Emissões (tCO2e)'].sum()
+        # Yearly totals per scope straight from the monthly series
+        timeseries = self._get_timeseries()
+        years = [int(year) for year in sorted(self.df['Ano'].unique())]
+        scope_data = {year: timeseries.totals('parameter_category', year) for year in years}
+        
+        # Companies are the top of the hierarchy per country ("ML - Brasil")
+        company_series = timeseries.series(('Hierarquia nível 1', 'País', 'parameter_category'))
+        company_data = {}
+        for (company, country, scope), values in zip(company_series.keys, company_series.values['Emissões (tCO2e)']):
+            name = f"{company} - {country}"
+            for year in years:
+                year_total = float(values[timeseries.month_range(year)].sum())
+                company_data.setdefault(scope, {}).setdefault(name, {})[str(year)] = year_total
+        companies = sorted({name for scope_companies in company_data.values() for name in scope_companies})
         
         # Create the data structure expected by the frontend
-        companies = ['ML - Brasil']  # Single company in this dataset
-        
         return {
             'companies': companies,
-            'years': [str(year) for year in sorted(self.df['Ano'].unique())],
-            'scope1': {
-                'ML - Brasil': {
-                    '2023': float(scope_data.get('scope1', 0))
-                }
-            },
-            'scope2': {
-                'ML - Brasil': {
-                    '2023': float(scope_data.get('scope2', 0))
-                }
-            },
-            'scope3': {
-                'ML - Brasil': {
-                    '2023': float(scope_data.get('scope3', 0))
+            'years': [str(year) for year in years],
+            **{
+                scope: {
+                    name: {
+                        str(year): company_data.get(scope, {}).get(name, {}).get(str(year), 0.0) for year in years
+                    }
+                    for name in companies
                 }
+                for scope in ['scope1', 'scope2', 'scope3']
             }
         }
     
+    @cached_payload
     def get_emissions_by_parameter(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Get top emissions by parameter type"""
         if self.df.empty:
             return []
         
-        # Group by parameter and sum emissions
-        param_emissions = self.df.groupby('Parâmetro')['Emissões (tCO2e)'].sum().sort_values(ascending=False)
-        
-        # Get top parameters
-        top_params = param_emissions.head(limit)
-        
+        # Top parameters by emissions
         return [
             {
-                'parameter': param,
-                'emissions': float(emissions),
-                'category': self._categorize_parameter(param)
+                'parameter': item['key'],
+                'emissions': item['sums']['Emissões (tCO2e)'],
+                'category': self._categorize_parameter(item['key'])
             }
-            for param, emissions in top_params.items()
+            for item in self._get_ranking('Parâmetro').top(limit)
         ]
     
+    @cached_payload
     def get_emissions_by_hierarchy(self) -> Dict[str, float]:
         """Get emissions by hierarchy level"""
         if self.df.empty:
@@ -141,47 +404,130 @@ class EmissionsDataService:
         
         return {level: float(emissions) for level, emissions in hierarchy_emissions.items()}
     
-    def get_summary_stats(self) -> Dict[str, Any]:
-        """Get summary statistics for the dashboard"""
+    @cached_payload
+    def get_summary_stats(self, exact: bool = False) -> Dict[str, Any]:
+        """Get summary statistics for the dashboard (merged monthly sketches, or a full scan when exact)"""
         if self.df.empty:
             return self._get_empty_stats()
         
-        total_emissions = self.df['Emissões (tCO2e)'].sum()
-        avg_emissions = self.df['Emissões (tCO2e)'].mean()
-        max_emissions = self.df['Emissões (tCO2e)'].max()
-        unique_parameters = self.df['Parâmetro'].nunique()
+        if exact:
+            emissions = self.df['Emissões (tCO2e)']
+            return {
+                'total_emissions': float(emissions.sum()),
+                'average_emissions': float(emissions.mean()),
+                'max_emissions': float(emissions.max()),
+                'unique_parameters': int(self.df['Parâmetro'].nunique()),
+                'total_records': int(len(self.df)),
+                'year_range': f"{self.df['Ano'].min()} - {self.df['Ano'].max()}",
+                'emissions_percentiles': {
+                    f"p{round(q * 100)}": float(value)
+                    for q, value in zip(SUMMARY_QUANTILES, np.quantile(emissions.to_numpy(), SUMMARY_QUANTILES))
+                },
+                'exact': True
+            }
         
+        # Sums, counts and maxima merge exactly; distinct parameters and percentiles are estimates
+        sketches = self._get_sketches((), 'Parâmetro', True)
+        summary = sketches.query()[()]
+        months = sketches.months()
         return {
-            'total_emissions': float(total_emissions),
-            'average_emissions': float(avg_emissions),
-            'max_emissions': float(max_emissions),
-            'unique_parameters': int(unique_parameters),
-            'total_records': int(len(self.df)),
-            'year_range': f"{self.df['Ano'].min()} - {self.df['Ano'].max()}"
+            'total_emissions': summary.total,
+            'average_emissions': summary.total / summary.rows,
+            'max_emissions': summary.maximum,
+            'unique_parameters': summary.distinct.count(),
+            'total_records': summary.rows,
+            'year_range': f"{months[0] // 12} - {months[-1] // 12}",
+            'emissions_percentiles': {
+                f"p{round(q * 100)}": value
+                for q, value in zip(SUMMARY_QUANTILES, summary.quantiles.quantiles(SUMMARY_QUANTILES))
+            },
+            'exact': False
         }
     
     # New methods for chart proposals
+    @cached_payload
     def get_top_emission_parameters(self, limit: int = 15) -> List[Dict[str, Any]]:
         """Get top emission sources by parameter type for Chart 1"""
         if self.df.empty:
             return []
         
-        # Group by parameter and sum emissions
-        param_emissions = self.df.groupby('Parâmetro')['Emissões (tCO2e)'].sum().sort_values(ascending=False)
+        # Sum and row count come from the same aggregation pass
+        return [
+            {
+                'name': item['key'],
+                'emissions': item['sums']['Emissões (tCO2e)'],
+                'scope': self._categorize_parameter(item['key']),
+                'count': item['count']
+            }
+            for item in self._get_ranking('Parâmetro').top(limit)
+        ]
+    
+    @cached_payload
+    def get_top_n(self, dimension: str = 'Parâmetro', limit: int = 10, year: int = None,
+                  include_others: bool = True) -> Dict[str, Any]:
+        """Top-N keys of any dimension by emissions, with an optional "others" bucket. Shares are of
+        the total over every row; rows without a key are reported in the "missing" bucket"""
+        if dimension not in RANKING_DIMENSIONS:
+            raise ValueError(f"Unsupported ranking dimension: {dimension}")
+        
+        if self.df.empty:
+            result = {'dimension': dimension, 'total_emissions': 0.0, 'items': [],
+                      'missing': {'emissions': 0.0, 'count': 0, 'share': 0}}
+            if include_others:
+                result['others'] = {'members': 0, 'emissions': 0.0, 'count': 0, 'share': 0}
+            return {"top_n": result}
         
-        # Get top parameters
-        top_params = param_emissions.head(limit)
+        ranking = self._get_ranking(dimension, year)
+        positions = ranking.top_positions(limit)
+        total = ranking.total('Emissões (tCO2e)')
         
-        return [
+        def share(emissions: float) -> float:
+            return float(emissions / total * 100) if total > 0 else 0
+        
+        items = [
             {
-                'name': param,
-                'emissions': float(emissions),
-                'scope': self._categorize_parameter(param),
-                'count': int(self.df[self.df['Parâmetro'] == param].shape[0])
+                'name': ranking.keys[position],
+                'emissions': float(ranking.sums['Emissões (tCO2e)'][position]),
+                'count': int(ranking.counts[position]),
+                'share': share(ranking.sums['Emissões (tCO2e)'][position])
             }
-            for param, emissions in top_params.items()
+            for position in positions
         ]
+        
+        missing = ranking.missing_sums['Emissões (tCO2e)']
+        result = {
+            'dimension': dimension,
+            'total_emissions': total,
+            'items': items,
+            'missing': {'emissions': missing, 'count': ranking.missing_count, 'share': share(missing)}
+        }
+        
+        if include_others:
+            others = ranking.others(positions)
+            result['others'] = {
+                'members': others['members'],
+                'emissions': others['sums']['Emissões (tCO2e)'],
+                'count': others['count'],
+                'share': share(others['sums']['Emissões (tCO2e)'])
+            }
+        
+        return {"top_n": result}
+    
+    def get_search_suggestions(self, query: str = '', dimensions: List[str] = None, limit: int = 10) -> Dict[str, Any]:
+        """Autocomplete over dimension values (accent-insensitive token prefixes), largest emissions first"""
+        dimensions = dimensions or None
+        for dimension in dimensions or []:
+            if dimension not in SEARCH_DIMENSIONS:
+                raise ValueError(f"Unsupported search dimension: {dimension}")
+        if limit < 1 or limit > MAX_SEARCH_LIMIT:
+            raise ValueError(f"limit must be between 1 and {MAX_SEARCH_LIMIT}")
+        if self.df.empty:
+            return {"query": query, "results": []}
+        
+        # Not payload-cached: every keystroke is a new query and would evict the chart payloads
+        return {"query": query, "results": self._get_search_index().search(query, dimensions, limit)}
     
+    @cached_payload
     def get_hierarchy_treemap_data(self, level: int = 3) -> Dict[str, Any]:
         """Get hierarchy data for treemap visualization for Chart 2"""
         if self.df.empty:
@@ -194,65 +540,57 @@ class EmissionsDataService:
         if not hierarchy_cols:
             return {"hierarchy": {}}
         
-        # Build hierarchical structure
-        hierarchy_data = {}
+        # Missing levels are named after their depth
+        levels = pd.DataFrame({
+            col: self.df[col].astype(object).where(self.df[col].notna(), f"Level_{i+1}")
+            for i, col in enumerate(hierarchy_cols)
+        })
+        emissions = self.df['Emissões (tCO2e)'].to_numpy(dtype=float)
         
-        # Start with the highest level
-        for _, row in self.df.iterrows():
-            current_level = hierarchy_data
-            
-            # Navigate through hierarchy levels
-            for i, col in enumerate(hierarchy_cols):
-                level_name = row[col] if pd.notna(row[col]) else f"Level_{i+1}"
-                
-                if level_name not in current_level:
-                    current_level[level_name] = {
-                        'emissions': 0.0,
-                        'children': {}
-                    }
-                
-                current_level[level_name]['emissions'] += float(row['Emissões (tCO2e)'])
-                
-                if i < len(hierarchy_cols) - 1:  # Not the last level
-                    current_level = current_level[level_name]['children']
+        # One grouped sum per depth; groups (and so children) keep the order they first appear in
+        hierarchy_data = {}
+        children = {(): hierarchy_data}
+        for depth in range(1, len(hierarchy_cols) + 1):
+            grouped = levels.groupby(hierarchy_cols[:depth], sort=False)
+            sums = np.bincount(grouped.ngroup().to_numpy(), weights=emissions)
+            for key, total in zip(grouped.size().index, sums):
+                key = key if isinstance(key, tuple) else (key,)
+                node = {'emissions': float(total), 'children': {}}
+                children[key[:-1]][key[-1]] = node
+                children[key] = node['children']
         
         return {"hierarchy": hierarchy_data}
     
+    @cached_payload
     def get_transportation_emissions(self) -> Dict[str, Any]:
         """Get transportation emissions breakdown for Chart 3"""
         if self.df.empty:
             return {"transportation": {}}
         
-        # Filter transportation-related parameters
-        transport_mask = self.df['Parâmetro'].apply(self._categorize_transportation)
-        transport_df = self.df[transport_mask].copy()
+        # Classify each distinct parameter once rather than every row
+        parameters = self.df['Parâmetro']
+        distinct = parameters.unique()
+        transport_mask = parameters.map(dict(zip(distinct, map(self._categorize_transportation, distinct))))
+        transport_df = self.df[transport_mask.to_numpy(dtype=bool)]
         
         if transport_df.empty:
             return {"transportation": {}}
         
-        # Analyze fuel types
-        fuel_types = {}
-        for _, row in transport_df.iterrows():
-            param_lower = row['Parâmetro'].lower()
-            
-            # Categorize by fuel type
-            if 'gasolina' in param_lower:
-                fuel_type = 'gasolina'
-            elif 'diesel' in param_lower:
-                fuel_type = 'diesel'
-            elif 'etanol' in param_lower:
-                fuel_type = 'etanol'
-            else:
-                fuel_type = 'outros'
-            
-            if fuel_type not in fuel_types:
-                fuel_types[fuel_type] = {
-                    'emissions': 0.0,
-                    'distance': 0.0,
-                    'efficiency': 0.0
-                }
-            
-            fuel_types[fuel_type]['emissions'] += float(row['Emissões (tCO2e)'])
+        param_lower = transport_df['Parâmetro'].str.lower()
+        emissions = transport_df['Emissões (tCO2e)'].to_numpy(dtype=float)
+        
+        # Analyze fuel types (in the order they first appear)
+        fuel = np.select(
+            [param_lower.str.contains('gasolina', regex=False), param_lower.str.contains('diesel', regex=False),
+             param_lower.str.contains('etanol', regex=False)],
+            ['gasolina', 'diesel', 'etanol'],
+            default='outros'
+        )
+        fuel_codes, fuel_names = pd.factorize(fuel)
+        fuel_types = {
+            str(fuel_type): {'emissions': float(total), 'distance': 0.0, 'efficiency': 0.0}
+            for fuel_type, total in zip(fuel_names, np.bincount(fuel_codes, weights=emissions))
+        }
         
         # Calculate efficiency (emissions per unit distance if available)
         for fuel_type in fuel_types:
@@ -261,26 +599,18 @@ class EmissionsDataService:
                     fuel_types[fuel_type]['emissions'] / fuel_types[fuel_type]['distance']
                 )
         
-        # Categorize by vehicle/operation type
-        categories = {
-            'light_vehicles': 0.0,
-            'fleet_operations': 0.0,
-            'employee_commuting': 0.0,
-            'product_shipping': 0.0
-        }
-        
-        for _, row in transport_df.iterrows():
-            param_lower = row['Parâmetro'].lower()
-            emissions = float(row['Emissões (tCO2e)'])
-            
-            if 'veículos leves' in param_lower:
-                categories['light_vehicles'] += emissions
-            elif 'frota' in param_lower:
-                categories['fleet_operations'] += emissions
-            elif 'funcionários' in param_lower or 'colaboradores' in param_lower:
-                categories['employee_commuting'] += emissions
-            elif 'expedição' in param_lower or 'entrega' in param_lower:
-                categories['product_shipping'] += emissions
+        # Categorize by vehicle/operation type (first match wins)
+        category_names = ['light_vehicles', 'fleet_operations', 'employee_commuting', 'product_shipping']
+        category = np.select(
+            [param_lower.str.contains('veículos leves', regex=False),
+             param_lower.str.contains('frota', regex=False),
+             param_lower.str.contains('funcionários', regex=False) | param_lower.str.contains('colaboradores', regex=False),
+             param_lower.str.contains('expedição', regex=False) | param_lower.str.contains('entrega', regex=False)],
+            [0, 1, 2, 3],
+            default=len(category_names)
+        )
+        totals = np.bincount(category, weights=emissions, minlength=len(category_names) + 1)
+        categories = {name: float(total) for name, total in zip(category_names, totals)}
         
         return {
             "transportation": {
@@ -289,46 +619,44 @@ class EmissionsDataService:
             }
         }
 
+    @cached_payload
     def get_emissions_by_scope_category(self, year: int = 2023) -> Dict[str, Any]:
         """Get emissions data organized by scope and category for Chart 1"""
         if self.df.empty:
             return {"emissions_by_scope_category": {}}
         
-        # Filter by year
-        year_df = self.df[self.df['Ano'] == year].copy()
+        # Monthly series per (scope, category) are precomputed - just slice the year
+        timeseries = self._get_timeseries()
+        series = timeseries.series(('Escopo', 'Categoria'))
+        months = timeseries.month_range(year)
+        month_labels = timeseries.month_labels(months)
+        emissions = series.values['Emissões (tCO2e)'][:, months]
+        counts = series.counts[:, months]
         
-        if year_df.empty:
+        if not counts.any():
             return {"emissions_by_scope_category": {}}
         
-        # Group by scope, category, and competency period
-        grouped = year_df.groupby(['Escopo', 'Categoria', 'Competência'])['Emissões (tCO2e)'].sum().reset_index()
-        
         # Structure data for the chart
         result = {}
         
-        for _, row in grouped.iterrows():
-            scope = row['Escopo']
-            category = row['Categoria']
-            month = row['Competência']
-            emissions = float(row['Emissões (tCO2e)'])
-            
-            if scope not in result:
-                result[scope] = {}
-            
-            if category not in result[scope]:
-                result[scope][category] = []
+        for i, (scope, category) in enumerate(series.keys):
+            present = np.flatnonzero(counts[i])
+            if not len(present):
+                continue
             
             # Add target (placeholder - could be loaded from configuration)
-            target = emissions * 0.9  # 10% reduction target
-            
-            result[scope][category].append({
-                "month": month,
-                "emissions": emissions,
-                "target": target
-            })
+            result.setdefault(scope, {})[category] = [
+                {
+                    "month": month_labels[j],
+                    "emissions": float(emissions[i, j]),
+                    "target": float(emissions[i, j]) * 0.9  # 10% reduction target
+                }
+                for j in present
+            ]
         
         return {"emissions_by_scope_category": result}
 
+    @cached_payload
     def get_gas_emissions_breakdown(self, year: int = 2023) -> Dict[str, Any]:
         """Get gas emissions breakdown with conversion factors for Chart 2"""
         if self.df.empty:
@@ -359,14 +687,15 @@ class EmissionsDataService:
             }
         
         # Process individual gases
+        gas_trends = self._get_timeseries().trends('Gás', year)
         individual_gases = {}
         for _, row in individual_gas_data.iterrows():
             gas_name = row['Gás']
             individual_gases[gas_name] = {
                 "emissions": float(row['Emissões (tCO2e)']),
-                "conversion_factor": float(row['Fator de conversão']),
-                "emission_factor": float(row['Fator de emissão']),
-                "trend": "stable"  # Placeholder - could calculate from historical data
+                "conversion_factor": factor_value(row['Fator de conversão']),
+                "emission_factor": factor_value(row['Fator de emissão']),
+                "trend": gas_trends.get(gas_name, "stable")
             }
         
         return {
@@ -376,6 +705,7 @@ class EmissionsDataService:
             }
         }
 
+    @cached_payload
     def get_hierarchical_emissions_heatmap(self, year: int = 2023) -> Dict[str, Any]:
         """Get hierarchical emissions data for heatmap visualization for Chart 3"""
         if self.df.empty:
@@ -404,18 +734,10 @@ class EmissionsDataService:
             business_area = row['Hierarquia nível 2']
             operational_unit = row['Unidade operacional']
             
-            # Handle NaN and infinite values
+            # Measures are finite after schema validation
             total_emissions = float(row['Emissões (tCO2e)'])
-            if pd.isna(total_emissions) or np.isinf(total_emissions):
-                total_emissions = 0.0
-                
             operational_control = float(row['Emissões de controle operacional (tCO2e)'])
-            if pd.isna(operational_control) or np.isinf(operational_control):
-                operational_control = 0.0
-                
             equity_share = float(row['Emissões de participação acionária (tCO2e)'])
-            if pd.isna(equity_share) or np.isinf(equity_share):
-                equity_share = 0.0
             
             if business_area not in level2_breakdown:
                 level2_breakdown[business_area] = {
@@ -451,6 +773,7 @@ class EmissionsDataService:
             }
         }
     
+    @cached_payload
     def get_operational_performance(self, year: int = 2023, limit: int = 15) -> Dict[str, Any]:
         """Analyze emissions performance across operational units for Chart Proposal 1"""
         if self.df.empty:
@@ -462,22 +785,26 @@ class EmissionsDataService:
         if year_df.empty:
             return {"operational_performance": {}}
         
-        # Group by operational unit and business area
-        operational_data = year_df.groupby(['Unidade operacional', 'Hierarquia nível 2']).agg({
-            'Emissões (tCO2e)': 'sum',
-            'Emissões (tGEE)': 'sum',
-            'Valor': 'sum'  # Activity metric
-        }).reset_index()
+        # Top units by emissions: one aggregation pass, partial selection of the top `limit`
+        ranking = self._get_ranking(('Unidade operacional', 'Hierarquia nível 2'), year)
+        top_units = pd.DataFrame(
+            [
+                {'Unidade operacional': item['key'][0], 'Hierarquia nível 2': item['key'][1], **item['sums']}
+                for item in ranking.top(limit)
+            ],
+            columns=['Unidade operacional', 'Hierarquia nível 2'] + RANKING_MEASURES
+        )
         
         # Calculate efficiency metrics (emissions per unit of activity)
-        # Only calculate efficiency for units with meaningful activity values
-        operational_data['efficiency_score'] = operational_data.apply(
-            lambda row: row['Emissões (tCO2e)'] / row['Valor'] if row['Valor'] > 0 else None, 
-            axis=1
+        # Units without activity values are ranked by emissions instead (normalized by 1000)
+        has_activity = top_units['Valor'] > 0
+        top_units['efficiency_score'] = np.where(
+            has_activity,
+            top_units['Emissões (tCO2e)'] / top_units['Valor'].where(has_activity, 1.0),
+            top_units['Emissões (tCO2e)'] / 1e6
         )
-        
-        # Get top units by emissions
-        top_units = operational_data.nlargest(limit, 'Emissões (tCO2e)')
+        # Scale the efficiency score to be more meaningful (multiply by 1000)
+        top_units['efficiency_metric'] = (top_units['efficiency_score'] * 1000).round(2)
         
         # Calculate scope breakdown for each unit
         scope_breakdown = {}
@@ -495,39 +822,36 @@ class EmissionsDataService:
             # Category breakdown
             category_breakdown[unit] = unit_data.groupby('Categoria')['Emissões (tCO2e)'].sum().to_dict()
         
-        # Generate monthly trend data for top units
+        # Monthly trend data for top units from the precomputed series
+        timeseries = self._get_timeseries()
+        unit_series = timeseries.series('Unidade operacional')
+        months = timeseries.month_range(year)
+        month_labels = timeseries.month_labels(months)
+        unit_trends = timeseries.trends('Unidade operacional', year)
+        
         trend_data = {}
         for unit in top_units['Unidade operacional'].unique():
-            unit_data = year_df[year_df['Unidade operacional'] == unit]
-            monthly_trend = unit_data.groupby('Competência')['Emissões (tCO2e)'].sum().reset_index()
+            position = unit_series.positions[unit]
+            emissions = unit_series.values['Emissões (tCO2e)'][position, months]
+            activity = unit_series.values['Valor'][position, months]
+            counts = unit_series.counts[position, months]
             trend_data[unit] = [
                 {
-                    'month': str(row['Competência']),
-                    'emissions': float(row['Emissões (tCO2e)']),
-                    'efficiency': float(row['Emissões (tCO2e)'] / unit_data[unit_data['Competência'] == row['Competência']]['Valor'].sum() if unit_data[unit_data['Competência'] == row['Competência']]['Valor'].sum() > 0 else 0)
+                    'month': month_labels[j],
+                    'emissions': float(emissions[j]),
+                    'efficiency': float(emissions[j] / activity[j] if activity[j] > 0 else 0)
                 }
-                for _, row in monthly_trend.iterrows()
+                for j in np.flatnonzero(counts)
             ]
         
         # Calculate efficiency metrics
         efficiency_metrics = []
         for _, row in top_units.iterrows():
-            unit = row['Unidade operacional']
-            efficiency_score = row['efficiency_score']
-            
-            if efficiency_score is not None and not pd.isna(efficiency_score):
-                # Scale the efficiency score to be more meaningful (multiply by 1000)
-                metric = round(efficiency_score * 1000, 2)
-                target = round(metric * 0.9, 2)  # 10% improvement target
-            else:
-                # For units without activity data, use emissions-based ranking
-                metric = round(row['Emissões (tCO2e)'] / 1000, 2)  # Normalize by 1000
-                target = round(metric * 0.9, 2)
-            
+            metric = float(row['efficiency_metric'])
             efficiency_metrics.append({
-                'unit': unit,
+                'unit': row['Unidade operacional'],
                 'metric': metric,
-                'target': target
+                'target': round(metric * 0.9, 2)  # 10% improvement target
             })
         
         # Generate alerts for units with high emissions
@@ -550,8 +874,8 @@ class EmissionsDataService:
                         "total_emissions": float(row['Emissões (tCO2e)']),
                         "scope_breakdown": scope_breakdown.get(row['Unidade operacional'], {}),
                         "category_breakdown": category_breakdown.get(row['Unidade operacional'], {}),
-                        "efficiency_score": round(row['efficiency_score'] * 1000, 2) if row['efficiency_score'] is not None and not pd.isna(row['efficiency_score']) else round(row['Emissões (tCO2e)'] / 1000, 2),
-                        "trend": "decreasing" if row['efficiency_score'] < 2.0 else "stable",
+                        "efficiency_score": float(row['efficiency_metric']),
+                        "trend": unit_trends.get(row['Unidade operacional'], "stable"),
                         "target_achievement": round((1 - row['efficiency_score'] / 3.0) * 100, 1),
                         "business_area": row['Hierarquia nível 2']
                     }
@@ -563,17 +887,45 @@ class EmissionsDataService:
             }
         }
     
+    def _filter_flow_rows(self, technology: str = None, scope: str = None, year: int = None) -> pd.DataFrame:
+        """Rows matching the optional technology / scope / year filters"""
+        mask = np.ones(len(self.df), dtype=bool)
+        if technology:
+            mask &= (self.df['Tecnologia'] == technology).to_numpy()
+        if scope:
+            mask &= (self.df['parameter_category'] == scope).to_numpy()
+        if year is not None:
+            mask &= (self.df['Ano'] == year).to_numpy()
+        return self.df[mask]
+    
+    @cached_payload
+    def get_emissions_flows(self, stages: List[str] = None, technology: str = None, scope: str = None,
+                            year: int = None) -> Dict[str, Any]:
+        """Multi-stage Sankey flows (e.g. Tecnologia -> Categoria -> Escopo -> Gás) as compact arrays"""
+        stages = stages or DEFAULT_FLOW_STAGES
+        if len(stages) < 2:
+            raise ValueError("At least two flow stages are required")
+        unsupported = [stage for stage in stages if stage not in RANKING_DIMENSIONS]
+        if unsupported:
+            raise ValueError(f"Unsupported flow stages: {', '.join(unsupported)}")
+        
+        if self.df.empty:
+            return {"flows": {}}
+        
+        filtered_df = self._filter_flow_rows(technology, scope, year)
+        if filtered_df.empty:
+            return {"flows": {}}
+        
+        return {"flows": build_flows(filtered_df, stages)}
+    
+    @cached_payload
     def get_process_technology_analysis(self, technology: str = None, scope: str = None) -> Dict[str, Any]:
         """Analyze process and technology emissions for Chart Proposal 2"""
         if self.df.empty:
             return {"process_analysis": {}}
         
-        # Filter by technology and scope if specified
-        filtered_df = self.df.copy()
-        if technology:
-            filtered_df = filtered_df[filtered_df['Tecnologia'] == technology]
-        if scope:
-            filtered_df = filtered_df[filtered_df['parameter_category'] == scope]
+        # Filter by technology and scope if specified (one boolean mask, no frame copy)
+        filtered_df = self._filter_flow_rows(technology, scope)
         
         if filtered_df.empty:
             return {"process_analysis": {}}
@@ -585,38 +937,31 @@ class EmissionsDataService:
             'Emissões (tCO2e)': 'sum'
         }).reset_index()
         
-        # Create nodes for Sankey diagram
-        nodes = []
-        links = []
+        # Sankey nodes / links from the index-based flow builder
+        flows = build_flows(filtered_df, ['Tecnologia', 'Categoria'])
+        node_names = flows['nodes']['name']
         
-        # Add process nodes
-        for _, row in process_data.iterrows():
-            technology_name = row['Tecnologia']
-            category_name = row['Categoria']
-            emissions = float(row['Emissões (tCO2e)'])
-            
-            # Add technology node
-            if not any(node['id'] == technology_name for node in nodes):
-                nodes.append({
-                    'id': technology_name,
-                    'name': technology_name,
-                    'emissions': emissions
-                })
-            
-            # Add category node
-            if not any(node['id'] == category_name for node in nodes):
+        nodes = []
+        seen = set()
+        for name, emissions in zip(node_names, flows['nodes']['value']):
+            if name not in seen:
+                seen.add(name)
                 nodes.append({
-                    'id': category_name,
-                    'name': category_name,
+                    'id': name,
+                    'name': name,
                     'emissions': emissions
                 })
-            
-            # Add link
-            links.append({
-                'source': technology_name,
-                'target': category_name,
-                'value': emissions
-            })
+        
+        links = [
+            {
+                'source': node_names[source],
+                'target': node_names[target],
+                'value': value
+            }
+            for source, target, value in zip(
+                flows['links']['source'], flows['links']['target'], flows['links']['value']
+            )
+        ]
         
         # Calculate technology efficiency
         technology_efficiency = {}
@@ -625,8 +970,8 @@ class EmissionsDataService:
             if tech not in technology_efficiency:
                 technology_efficiency[tech] = {
                     'current_technology': tech,
-                    'emission_factor': float(row['Fator de emissão']),
-                    'conversion_factor': float(row['Fator de conversão']),
+                    'emission_factor': factor_value(row['Fator de emissão']),
+                    'conversion_factor': factor_value(row['Fator de conversão']),
                     'total_emissions': float(row['Emissões (tCO2e)']),
                     'alternative': 'CO2 systems' if 'refrigeração' in tech.lower() else 'Electric systems',
                     'potential_savings': 60 if 'refrigeração' in tech.lower() else 80
@@ -642,42 +987,48 @@ class EmissionsDataService:
             }
         }
     
-    def get_hierarchical_intelligence(self, level: int = 1, year: int = 2023) -> Dict[str, Any]:
-        """Build comprehensive hierarchical analysis with benchmarks for Chart Proposal 3"""
+    @cached_payload
+    def get_hierarchical_intelligence(self, level: int = 1, year: int = 2023, exact: bool = False) -> Dict[str, Any]:
+        """Build comprehensive hierarchical analysis with benchmarks for Chart Proposal 3
+        (unit counts from merged monthly sketches, or a full scan when exact)"""
         if self.df.empty:
             return {"hierarchical_intelligence": {}}
         
-        # Filter by year
-        year_df = self.df[self.df['Ano'] == year].copy()
-        
-        if year_df.empty:
-            return {"hierarchical_intelligence": {}}
-        
         # Get hierarchy columns
-        hierarchy_cols = [col for col in year_df.columns if 'Hierarquia nível' in col]
+        hierarchy_cols = [col for col in self.df.columns if 'Hierarquia nível' in col]
         
         # Group by specified hierarchy level
         if level <= len(hierarchy_cols):
             level_col = hierarchy_cols[level - 1]
-            hierarchical_data = year_df.groupby([level_col, 'Escopo']).agg({
-                'Emissões (tCO2e)': 'sum',
-                'Unidade operacional': 'nunique'
-            }).reset_index()
+            if exact:
+                year_df = self.df[self.df['Ano'] == year]
+                hierarchical_data = year_df.groupby([level_col, 'Escopo']).agg({
+                    'Emissões (tCO2e)': 'sum',
+                    'Unidade operacional': 'nunique'
+                })
+                cells = [
+                    (key, float(row['Emissões (tCO2e)']), int(row['Unidade operacional']))
+                    for key, row in hierarchical_data.iterrows()
+                ]
+            else:
+                merged = self._get_sketches((level_col, 'Escopo'), 'Unidade operacional').query(year)
+                # Same (sorted) order as the groupby
+                cells = [(key, cell.total, cell.distinct.count()) for key, cell in sorted(merged.items())]
+            
+            if not cells:
+                return {"hierarchical_intelligence": {}}
+            
+            level_trends = self._get_timeseries().trends(level_col, year)
             
             # Build tree structure
             tree_structure = {}
-            for _, row in hierarchical_data.iterrows():
-                level_name = row[level_col]
-                scope = row['Escopo']
-                emissions = float(row['Emissões (tCO2e)'])
-                units = int(row['Unidade operacional'])
-                
+            for (level_name, scope), emissions, units in cells:
                 if level_name not in tree_structure:
                     tree_structure[level_name] = {
                         'emissions': 0.0,
                         'scope_breakdown': {},
                         'units': 0,
-                        'trend': 'stable',
+                        'trend': level_trends.get(level_name, 'stable'),
                         'efficiency_score': 0.8
                     }
                 
@@ -721,6 +1072,38 @@ class EmissionsDataService:
         else:
             return {"hierarchical_intelligence": {"error": "Invalid hierarchy level"}}
     
+    @cached_payload
+    def get_time_series(self, dimension: str = 'Escopo', year: int = None, window: int = 3) -> Dict[str, Any]:
+        """Monthly series with rolling averages, YoY deltas and trends for one dimension"""
+        if self.df.empty:
+            return {"time_series": {}}
+        
+        if dimension not in SERIES_DIMENSIONS:
+            raise ValueError(f"Unsupported time-series dimension: {dimension}")
+        
+        result = self._get_timeseries().describe(dimension, year, window)
+        result['dimension'] = dimension
+        return {"time_series": result}
+    
+    def simulate_reduction_scenario(self, levers: List[Dict[str, Any]], year: int = 2023,
+                                    trials: int = 5000, seed: int = None) -> Dict[str, Any]:
+        """Monte Carlo distribution of total tCO2e under uncertain reduction levers"""
+        if self.df.empty:
+            return {"scenario": {}}
+        
+        simulator = self._scenario_simulators.get(year)
+        if simulator is None:
+            # year=None simulates the whole inventory
+            source_df = self.df if year is None else self.df[self.df['Ano'] == year]
+            if source_df.empty:
+                return {"scenario": {}}
+            simulator = ScenarioSimulator(source_df)
+            self._scenario_simulators[year] = simulator
+        
+        result = simulator.run(levers, trials, seed)
+        result['year'] = year
+        return {"scenario": result}
+    
     def _get_empty_data(self) -> Dict[str, Any]:
         """Return empty data structure when no data is available"""
         return {
@@ -739,8 +1122,11 @@ class EmissionsDataService:
             'max_emissions': 0.0,
             'unique_parameters': 0,
             'total_records': 0,
-            'year_range': 'N/A'
+            'year_range': 'N/A',
+            'emissions_percentiles': {f"p{round(q * 100)}": 0.0 for q in SUMMARY_QUANTILES},
+            'exact': True
         }
 
-# Global instance
-emissions_service = EmissionsDataService() 
\ No newline at end of file
+# Trace allocations from the first load on (ENABLE_MEMORY_TRACING=1)
+if MEMORY_TRACING_ENABLED:
+    start_tracing()
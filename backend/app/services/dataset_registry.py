@@ -0,0 +1,279 @@
+"""
+Multi-tenant dataset registry: lazy loading, memory-budgeted LRU eviction and columnar spill files
+"""
+import atexit
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+import pandas as pd
+
+from app.services.data_service import EmissionsDataService
+from app.services.factor_service import FactorRecalculationEngine
+
+DEFAULT_TENANT = os.environ.get('DEFAULT_TENANT', 'default')
+
+# Per-tenant exports: <TENANT_DATA_DIR>/<tenant>.<ext> (the default tenant uses TestData.xlsx)
+TENANT_DATA_DIR = os.environ.get('TENANT_DATA_DIR', '../data/tenants')
+TENANT_FILE_EXTENSIONS = ('.parquet', '.feather', '.csv', '.xlsx')
+
+# Loaded frames beyond this budget evict the least recently used tenants
+MEMORY_BUDGET_BYTES = int(float(os.environ.get('DATASET_MEMORY_BUDGET_MB', '1024')) * 1024 * 1024)
+
+# Spill files are per process - several workers may share the same temp directory
+SPILL_DIR = os.path.join(
+    os.environ.get('DATASET_SPILL_DIR', os.path.join(tempfile.gettempdir(), 'esg-dashboard-spill')),
+    str(os.getpid())
+)
+
+# Tenant names become file names
+TENANT_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+logger = logging.getLogger(__name__)
+
+
+def write_snapshot(df: pd.DataFrame, path_base: str) -> str:
+    """Write a cleaned frame to a Feather file (pyarrow)"""
+    df = df.reset_index(drop=True)
+    # Arrow needs one type per column: mixed-type object columns are stored as strings (missing values kept)
+    mixed = [column for column in df.columns if df[column].dtype == object and df[column].dropna().map(type).nunique() > 1]
+    if mixed:
+        logger.warning("Spill file %s stores mixed-type columns %s as strings", os.path.basename(path_base), mixed)
+        for column in mixed:
+            df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+
+    path = path_base + '.feather'
+    df.to_feather(path)
+    return path
+
+
+def read_snapshot(path: str) -> pd.DataFrame:
+    return pd.read_feather(path)
+
+
+def read_export(path: str) -> pd.DataFrame:
+    """Read a raw CLIMAS export by extension"""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    if path.endswith('.feather'):
+        return pd.read_feather(path)
+    if path.endswith('.csv'):
+        return pd.read_csv(path)
+    return pd.read_excel(path)
+
+
+class TenantEntry:
+    """Registry slot for one tenant: its source, its loaded service or its spill file"""
+
+    def __init__(self, name: str, source: Optional[str] = None):
+        self.name = name
+        self.source = source
+        self.service: Optional[EmissionsDataService] = None
+        self.spill_path: Optional[str] = None
+        self.bytes = 0
+        self.loads = 0
+        self.evictions = 0
+        self.last_access = 0.0
+        self.last_load_seconds = None
+        # Factor sets registered for the tenant outlive evictions
+        self.factor_sets: Optional[FactorRecalculationEngine] = None
+        # Spill files hold cleaned rows, so the validation report is kept alongside
+        self.quality_report: Optional[Dict[str, Any]] = None
+        self.lock = threading.Lock()
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'tenant': self.name,
+            'loaded': self.service is not None,
+            'spilled': self.spill_path is not None,
+            'source': self.source,
+            'bytes': self.bytes,
+            'loads': self.loads,
+            'evictions': self.evictions,
+            'last_load_seconds': self.last_load_seconds,
+            'dataset_version': self.service.dataset_version if self.service is not None else None
+        }
+
+
+class DatasetRegistry:
+    """Tenant -> EmissionsDataService, loaded on first access and evicted LRU over a memory budget"""
+
+    def __init__(self, memory_budget: int = MEMORY_BUDGET_BYTES, data_dir: str = TENANT_DATA_DIR,
+                 spill_dir: str = SPILL_DIR, default_tenant: str = DEFAULT_TENANT):
+        self.memory_budget = memory_budget
+        self.data_dir = data_dir
+        self.spill_dir = spill_dir
+        self.default_tenant = default_tenant
+        self._lock = threading.Lock()
+        # Insertion order doubles as recency order (most recently used last)
+        self._entries: 'OrderedDict[str, TenantEntry]' = OrderedDict()
+        self._entries[default_tenant] = TenantEntry(default_tenant)
+
+    def _source_for(self, tenant: str) -> Optional[str]:
+        for extension in TENANT_FILE_EXTENSIONS:
+            path = os.path.join(self.data_dir, tenant + extension)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _entry(self, tenant: str, create: bool = False) -> TenantEntry:
+        """Registered entry, discovering tenant files on first use; KeyError for unknown tenants"""
+        with self._lock:
+            entry = self._entries.get(tenant)
+            if entry is not None:
+                return entry
+
+        if not TENANT_NAME_PATTERN.match(tenant or ''):
+            raise KeyError(tenant)
+        source = self._source_for(tenant)
+        if source is None and not create:
+            raise KeyError(tenant)
+
+        with self._lock:
+            return self._entries.setdefault(tenant, TenantEntry(tenant, source))
+
+    def has_tenant(self, tenant: str) -> bool:
+        try:
+            self._entry(tenant)
+            return True
+        except KeyError:
+            return False
+
+    def is_loaded(self, tenant: str = None) -> bool:
+        """Whether the tenant's dataset is in memory (KeyError for unknown tenants)"""
+        return self._entry(tenant or self.default_tenant).service is not None
+
+    def tenants(self) -> List[Dict[str, Any]]:
+        """Registered tenants plus the exports found in the data directory"""
+        if os.path.isdir(self.data_dir):
+            for filename in sorted(os.listdir(self.data_dir)):
+                tenant, extension = os.path.splitext(filename)
+                if extension in TENANT_FILE_EXTENSIONS and TENANT_NAME_PATTERN.match(tenant):
+                    self._entry(tenant)
+        with self._lock:
+            entries = list(self._entries.values())
+        return [entry.describe() for entry in entries]
+
+    def loaded_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.bytes for entry in self._entries.values() if entry.service is not None)
+
+    def get(self, tenant: str = None) -> EmissionsDataService:
+        """The tenant's service, loading it (from its spill file when evicted) on first access"""
+        entry = self._entry(tenant or self.default_tenant)
+        service = entry.service
+        if service is None:
+            with entry.lock:
+                # Concurrent first requests wait for a single load
+                if entry.service is None:
+                    self._load(entry)
+                service = entry.service
+            self._enforce_budget(keep=entry.name)
+
+        with self._lock:
+            entry.last_access = time.time()
+            if entry.name in self._entries:
+                self._entries.move_to_end(entry.name)
+        return service
+
+    def activate(self, tenant: str, service: EmissionsDataService):
+        """Swap in a fully built service for a tenant (creating the tenant when needed)"""
+        entry = self._entry(tenant or self.default_tenant, create=True)
+        with entry.lock:
+            # Factor sets registered for the tenant carry over to its new dataset
+            engine = entry.service.factor_engine if entry.service is not None else entry.factor_sets
+            if engine is not None:
+                service.factor_engine.import_factor_sets(engine)
+            entry.service = service
+            entry.bytes = self._service_bytes(service)
+            self._drop_spill(entry)
+
+        with self._lock:
+            entry.last_access = time.time()
+            self._entries.move_to_end(entry.name)
+        self._enforce_budget(keep=entry.name)
+
+    def evict(self, tenant: str) -> bool:
+        """Spill a loaded tenant to disk and drop it from memory"""
+        entry = self._entry(tenant)
+        with entry.lock:
+            service = entry.service
+            if service is None:
+                return False
+            # A spill file stays valid until activate() replaces the dataset, so reloaded tenants evict for free
+            if entry.spill_path is None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                entry.spill_path = write_snapshot(service.df, os.path.join(self.spill_dir, entry.name))
+            entry.factor_sets = FactorRecalculationEngine()
+            entry.factor_sets.import_factor_sets(service.factor_engine)
+            entry.quality_report = service.quality_report
+            entry.service = None
+            entry.evictions += 1
+        return True
+
+    def _load(self, entry: TenantEntry):
+        start = time.perf_counter()
+        if entry.spill_path is not None:
+            service = EmissionsDataService(data_file_path=entry.source, df=read_snapshot(entry.spill_path), clean=False,
+                                           quality_report=entry.quality_report)
+        elif entry.name == self.default_tenant and entry.source is None:
+            service = EmissionsDataService()
+        elif entry.source is not None:
+            try:
+                raw_df = read_export(entry.source)
+            except Exception as e:
+                logger.error("Error loading data for tenant %s: %s", entry.name, e)
+                raw_df = pd.DataFrame()
+            service = EmissionsDataService(data_file_path=entry.source, df=raw_df)
+        else:
+            raise KeyError(entry.name)
+
+        if entry.factor_sets is not None:
+            service.factor_engine.import_factor_sets(entry.factor_sets)
+        entry.service = service
+        entry.bytes = self._service_bytes(service)
+        entry.loads += 1
+        entry.last_load_seconds = time.perf_counter() - start
+
+    def _enforce_budget(self, keep: str):
+        """Evict least recently used tenants until the loaded services fit the budget"""
+        with self._lock:
+            loaded = [entry for entry in self._entries.values() if entry.service is not None]
+        # Indexes and caches grow as tenants are queried, so re-measure before comparing against the budget
+        for entry in loaded:
+            service = entry.service
+            if service is not None:
+                entry.bytes = self._service_bytes(service)
+
+        candidates = [entry.name for entry in loaded if entry.name != keep]
+        for name in candidates:
+            if self.loaded_bytes() <= self.memory_budget:
+                break
+            self.evict(name)
+
+    @staticmethod
+    def _service_bytes(service: EmissionsDataService) -> int:
+        """The frame plus its derived structures and factor views, as reported on /admin/memory"""
+        frame = int(service.df.memory_usage(deep=True).sum()) if not service.df.empty else 0
+        return frame + service.describe_memory()['total_bytes']
+
+    @staticmethod
+    def _drop_spill(entry: TenantEntry):
+        if entry.spill_path is not None:
+            try:
+                os.remove(entry.spill_path)
+            except OSError:
+                pass
+            entry.spill_path = None
+
+
+# Global instance
+dataset_registry = DatasetRegistry()
+
+atexit.register(shutil.rmtree, SPILL_DIR, True)
@@ -0,0 +1,230 @@
+"""
+Emission-factor / GWP recalculation engine for what-if scenarios
+"""
+import os
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional, Tuple
+
+from app.models.data_model import FactorSet
+
+REPORTED_FACTOR_SET = "reported"
+
+# Upper bound on the GWP + emission-factor entries of one registered factor set
+MAX_FACTOR_SET_ENTRIES = int(os.environ.get('FACTOR_SET_MAX_ENTRIES', '10000'))
+
+# IPCC Fifth Assessment Report (100-year GWP) - matches the values in TestData.xlsx
+AR5_GWP = {
+    'CO2': 1.0,
+    'CO2 renovável': 1.0,
+    'CH4': 28.0,
+    'N2O': 265.0,
+    'HFC-125': 3170.0,
+    'HFC-32': 677.0,
+    'HFC-134a': 1300.0,
+    'HFC-143a': 4800.0,
+    'HCFC-22': 1760.0,
+    'HCFC-141b': 782.0
+}
+
+# IPCC Sixth Assessment Report (100-year GWP)
+AR6_GWP = {
+    'CO2': 1.0,
+    'CO2 renovável': 1.0,
+    'CH4': 27.9,
+    'N2O': 273.0,
+    'HFC-125': 3740.0,
+    'HFC-32': 771.0,
+    'HFC-134a': 1530.0,
+    'HFC-143a': 5810.0,
+    'HCFC-22': 1960.0,
+    'HCFC-141b': 860.0
+}
+
+# Operational-control / equity-share splits of each total, rescaled with it
+SHARE_COLUMNS = {
+    'Emissões (tGEE)': ['Emissões de controle operacional (tGEE)', 'Emissões de participação acionária (tGEE)'],
+    'Emissões (tCO2e)': ['Emissões de controle operacional (tCO2e)', 'Emissões de participação acionária (tCO2e)']
+}
+
+
+class FactorRecalculationEngine:
+    """Recomputes the emission measure columns of a dataset against named factor sets"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._factor_sets: Dict[str, FactorSet] = {
+            'AR5': FactorSet(name='AR5', description='IPCC AR5 100-year GWP', gwp=AR5_GWP),
+            'AR6': FactorSet(name='AR6', description='IPCC AR6 100-year GWP', gwp=AR6_GWP)
+        }
+        self._codes: Optional[Dict[str, Tuple[np.ndarray, pd.Index]]] = None
+        self._columns: Dict[Tuple[str, int], Dict[str, np.ndarray]] = {}
+
+    def bind(self, df: pd.DataFrame):
+        """Attach the engine to a (new) dataset, dropping every cached column"""
+        with self._lock:
+            self._df = df
+            self._codes = None
+            self._columns = {}
+
+    def list_factor_sets(self) -> List[Dict[str, Any]]:
+        """Describe the registered factor sets"""
+        return [
+            {
+                'name': factor_set.name,
+                'description': factor_set.description,
+                'version': factor_set.version,
+                'gases': len(factor_set.gwp),
+                'parameters': len(factor_set.emission_factors),
+                'emission_factors': sum(len(factors) for factors in factor_set.emission_factors.values())
+            }
+            for factor_set in self._factor_sets.values()
+        ]
+
+    def has_factor_set(self, name: str) -> bool:
+        return name == REPORTED_FACTOR_SET or name in self._factor_sets
+
+    def get_factor_set(self, name: str) -> FactorSet:
+        return self._factor_sets[name]
+
+    def register_factor_set(self, factor_set: FactorSet) -> FactorSet:
+        """Add or replace a factor set; replacing bumps its version so caches miss"""
+        if factor_set.name == REPORTED_FACTOR_SET:
+            raise ValueError(f"'{REPORTED_FACTOR_SET}' is reserved for the stored emissions")
+        entries = len(factor_set.gwp) + sum(len(factors) for factors in factor_set.emission_factors.values())
+        if entries > MAX_FACTOR_SET_ENTRIES:
+            raise ValueError(f"Factor set has {entries} entries, more than the limit of {MAX_FACTOR_SET_ENTRIES}")
+
+        with self._lock:
+            existing = self._factor_sets.get(factor_set.name)
+            version = existing.version + 1 if existing else 1
+            stored = factor_set.model_copy(update={'version': version})
+            self._factor_sets[factor_set.name] = stored
+
+            # Old versions can never be requested again
+            self._columns = {key: value for key, value in self._columns.items() if key[0] != factor_set.name}
+
+        return stored
+
+    def import_factor_sets(self, other: 'FactorRecalculationEngine'):
+        """Take over another engine's factor sets (and versions), e.g. when a new dataset replaces its own"""
+        with other._lock:
+            factor_sets = dict(other._factor_sets)
+        with self._lock:
+            self._factor_sets = factor_sets
+            # Columns computed for a set version that is still current remain valid
+            self._columns = {
+                key: columns for key, columns in self._columns.items()
+                if key[0] in factor_sets and factor_sets[key[0]].version == key[1]
+            }
+
+    def appended(self, df: pd.DataFrame, delta: pd.DataFrame) -> 'FactorRecalculationEngine':
+        """Engine bound to `df` (the bound rows followed by `delta`); cached columns are extended
+        by recomputing the delta rows only"""
+        engine = FactorRecalculationEngine()
+        engine.import_factor_sets(self)
+        engine.bind(df)
+
+        delta_engine = FactorRecalculationEngine()
+        delta_engine.bind(delta)
+        with self._lock:
+            cached = dict(self._columns)
+        for (name, version), columns in cached.items():
+            factor_set = engine._factor_sets.get(name)
+            if factor_set is None or factor_set.version != version:
+                continue
+            delta_columns = delta_engine._compute_columns(factor_set)
+            engine._columns[(name, version)] = {
+                col: np.concatenate([values, delta_columns[col]]) for col, values in columns.items()
+            }
+        return engine
+
+    def recalculate(self, name: str) -> Dict[str, np.ndarray]:
+        """Return the recomputed tGEE / tCO2e columns (and their share splits) for a factor set (cached per version)"""
+        factor_set = self._factor_sets[name]
+        key = (name, factor_set.version)
+
+        cached = self._columns.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            if key not in self._columns:
+                self._columns[key] = self._compute_columns(factor_set)
+            return self._columns[key]
+
+    def _category_codes(self) -> Dict[str, Tuple[np.ndarray, pd.Index]]:
+        """Integer codes for the lookup keys, computed once per dataset"""
+        if self._codes is None:
+            self._codes = {}
+            for col in ['Gás', 'Parâmetro']:
+                categorical = pd.Categorical(self._df[col])
+                self._codes[col] = (categorical.codes, categorical.categories)
+        return self._codes
+
+    @staticmethod
+    def _lookup(codes: np.ndarray, categories: pd.Index, table: Dict[str, float]) -> np.ndarray:
+        """Map a factor table onto every row through its category codes (NaN = not overridden)"""
+        values = np.array([table.get(category, np.nan) for category in categories], dtype=float)
+        # Append a NaN slot so that code -1 (missing key) falls through to the stored factor
+        values = np.append(values, np.nan)
+        return values[codes]
+
+    @staticmethod
+    def _lookup_pairs(parameters: Tuple[np.ndarray, pd.Index], gases: Tuple[np.ndarray, pd.Index],
+                      table: Dict[str, Dict[str, float]]) -> np.ndarray:
+        """Map a {parameter: {gas: factor}} table onto every row (NaN = not overridden)"""
+        parameter_codes, parameter_categories = parameters
+        gas_codes, gas_categories = gases
+        # A trailing NaN row / column so that code -1 (missing key) falls through to the stored factor
+        values = np.full((len(parameter_categories) + 1, len(gas_categories) + 1), np.nan)
+        for parameter, factors in table.items():
+            row = parameter_categories.get_indexer([parameter])[0]
+            if row < 0:
+                continue
+            columns = gas_categories.get_indexer(list(factors))
+            known = columns >= 0
+            values[row, columns[known]] = np.array(list(factors.values()), dtype=float)[known]
+        return values[parameter_codes, gas_codes]
+
+    def _compute_columns(self, factor_set: FactorSet) -> Dict[str, np.ndarray]:
+        """Vectorized Valor x conversion x emission factor x GWP over all rows"""
+        df = self._df
+        codes = self._category_codes()
+
+        valor = df['Valor'].to_numpy(dtype=float)
+        conversion = df['Fator de conversão'].to_numpy(dtype=float)
+        stored_factor = df['Fator de emissão'].to_numpy(dtype=float)
+        stored_tgee = df['Emissões (tGEE)'].to_numpy(dtype=float)
+        stored_tco2e = df['Emissões (tCO2e)'].to_numpy(dtype=float)
+
+        emission_factor = self._lookup_pairs(codes['Parâmetro'], codes['Gás'], factor_set.emission_factors)
+
+        # Only rebuild tGEE where a factor was overridden, otherwise keep the stored value. Rows whose
+        # stored factor or conversion is unknown (NaN after schema validation) keep it too
+        with np.errstate(invalid='ignore'):
+            rebuilt = valor * conversion * emission_factor
+        overridden = np.isfinite(rebuilt) & ~np.isnan(stored_factor) & (emission_factor != stored_factor)
+        tgee = np.where(overridden, rebuilt, stored_tgee)
+
+        # GWP falls back to the ratio implied by the stored data for gases the table doesn't cover
+        with np.errstate(divide='ignore', invalid='ignore'):
+            implied_gwp = np.where(stored_tgee != 0, stored_tco2e / stored_tgee, np.nan)
+        gwp = self._lookup(*codes['Gás'], factor_set.gwp)
+        gwp = np.where(np.isnan(gwp), implied_gwp, gwp)
+
+        tco2e = np.where(np.isnan(gwp), stored_tco2e, tgee * gwp)
+
+        columns = {
+            'Emissões (tGEE)': tgee,
+            'Emissões (tCO2e)': tco2e
+        }
+        # Splits keep their stored share of the total (a zero total has no share to scale)
+        for total_col, share_cols in SHARE_COLUMNS.items():
+            stored_total = df[total_col].to_numpy(dtype=float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scale = np.where(stored_total != 0, columns[total_col] / stored_total, 1.0)
+            for col in share_cols:
+                columns[col] = df[col].to_numpy(dtype=float) * scale
+        return columns
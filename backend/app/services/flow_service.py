@@ -0,0 +1,66 @@
+"""
+Multi-stage flow (Sankey) builder over categorical codes
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any
+
+DEFAULT_FLOW_STAGES = ['Tecnologia', 'Categoria', 'Escopo', 'Gás']
+
+
+def build_flows(df: pd.DataFrame, stages: List[str], measure: str = 'Emissões (tCO2e)') -> Dict[str, Any]:
+    """Nodes and links for a stage1 -> stage2 -> ... flow as compact columnar arrays
+
+    Every stage gets its own block of integer node indexes (a name appearing in two
+    stages yields two nodes), and links are aggregated once per adjacent stage pair.
+    """
+    values = df[measure].to_numpy(dtype=float)
+
+    stage_codes = []
+    node_names: List[Any] = []
+    node_stages: List[int] = []
+    node_values: List[np.ndarray] = []
+    offset = 0
+
+    for i, stage in enumerate(stages):
+        categorical = pd.Categorical(df[stage])
+        codes = categorical.codes.astype(np.int64)
+        n_categories = len(categorical.categories)
+
+        valid = codes >= 0
+        node_values.append(np.bincount(codes[valid], weights=values[valid], minlength=n_categories))
+        node_names.extend(categorical.categories.tolist())
+        node_stages.extend([i] * n_categories)
+
+        stage_codes.append(np.where(valid, codes + offset, -1))
+        offset += n_categories
+
+    n_nodes = offset
+    sources, targets, link_values = [], [], []
+
+    for source_codes, target_codes in zip(stage_codes, stage_codes[1:]):
+        valid = (source_codes >= 0) & (target_codes >= 0)
+        pairs = source_codes[valid] * n_nodes + target_codes[valid]
+        unique_pairs, inverse = np.unique(pairs, return_inverse=True)
+        sums = np.bincount(inverse.ravel(), weights=values[valid], minlength=len(unique_pairs))
+
+        sources.append(unique_pairs // n_nodes)
+        targets.append(unique_pairs % n_nodes)
+        link_values.append(sums)
+
+    def _concat(parts: List[np.ndarray], dtype) -> list:
+        return np.concatenate(parts).astype(dtype).tolist() if parts else []
+
+    return {
+        'stages': list(stages),
+        'nodes': {
+            'name': node_names,
+            'stage': node_stages,
+            'value': _concat(node_values, float)
+        },
+        'links': {
+            'source': _concat(sources, np.int64),
+            'target': _concat(targets, np.int64),
+            'value': _concat(link_values, float)
+        }
+    }
@@ -0,0 +1,271 @@
+"""
+Background ingestion of uploaded CLIMAS exports: parse, validate, clean, index, then go live
+
+Uploads either replace the dataset or append new Competência periods to it; appends only
+aggregate the new rows (see EmissionsDataService.append_rows).
+"""
+import io
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+import pandas as pd
+
+from app.services.data_service import EmissionsDataService
+from app.services.dataset_registry import dataset_registry, DatasetRegistry, TENANT_NAME_PATTERN
+from app.services.warmup_service import warmup_runner, WARMUP_ENABLED
+from app.services.schema_service import validate_frame, SchemaError
+
+INGESTION_STAGES = ['parse', 'validate', 'clean', 'index', 'warm', 'activate']
+
+INGESTION_MODES = ('replace', 'append')
+
+SUPPORTED_EXTENSIONS = ('.xlsx', '.csv')
+
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(50 * 1024 * 1024)))
+JOB_HISTORY_SIZE = int(os.environ.get('INGESTION_JOB_HISTORY', '20'))
+
+# CSV exports are parsed in chunks so the parse stage can report progress
+CSV_CHUNK_ROWS = 50_000
+
+
+class IngestionError(Exception):
+    """A stage rejected the upload - the message is reported on the job"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class IngestionJob:
+    """State of one upload as it moves through the ingestion stages"""
+
+    def __init__(self, filename: str, size: int, mode: str = 'replace', tenant: str = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.tenant = tenant
+        self.filename = filename
+        self.size = size
+        self.mode = mode
+        self.status = 'queued'
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.result: Dict[str, Any] = {}
+        self.stages = OrderedDict(
+            (name, {'status': 'pending', 'progress': 0.0, 'seconds': None, 'detail': {}})
+            for name in INGESTION_STAGES
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'size_bytes': self.size,
+            'mode': self.mode,
+            'tenant': self.tenant,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'error': self.error,
+            'result': dict(self.result),
+            'stages': [{'name': name, **dict(stage)} for name, stage in self.stages.items()]
+        }
+
+
+class IngestionManager:
+    """Runs ingestion jobs one at a time on a background thread, keeping recent job states"""
+
+    def __init__(self, registry: DatasetRegistry = dataset_registry, history: int = JOB_HISTORY_SIZE):
+        self._registry = registry
+        self._history = history
+        self._lock = threading.Lock()
+        self._jobs: 'OrderedDict[str, IngestionJob]' = OrderedDict()
+        # One worker: jobs go live in submission order and never compete for CPU / memory
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ingestion')
+
+    def submit(self, filename: str, content: bytes, mode: str = 'replace', tenant: str = None) -> Dict[str, Any]:
+        """Queue an upload for a tenant (the default one when None); raises ValueError for bad requests"""
+        tenant = tenant or self._registry.default_tenant
+        if mode not in INGESTION_MODES:
+            raise ValueError(f"Unsupported ingestion mode: {mode} (expected {', '.join(INGESTION_MODES)})")
+        if not filename or not filename.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise ValueError(f"Unsupported file type: {filename} (expected {', '.join(SUPPORTED_EXTENSIONS)})")
+        if not content:
+            raise ValueError("Uploaded file is empty")
+        if len(content) > MAX_UPLOAD_BYTES:
+            raise ValueError(f"Uploaded file exceeds {MAX_UPLOAD_BYTES:,} bytes")
+        if not TENANT_NAME_PATTERN.match(tenant):
+            raise ValueError(f"Invalid tenant name: {tenant}")
+        if mode == 'append' and not self._registry.has_tenant(tenant):
+            raise ValueError(f"Cannot append to unknown tenant: {tenant}")
+
+        job = IngestionJob(filename, len(content), mode, tenant)
+        with self._lock:
+            self._jobs[job.id] = job
+            # Forget the oldest finished jobs beyond the history size
+            for job_id in list(self._jobs):
+                if len(self._jobs) <= self._history:
+                    break
+                if self._jobs[job_id].status in ('succeeded', 'failed'):
+                    del self._jobs[job_id]
+
+        self._executor.submit(self._run, job, content)
+        return job.to_dict()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Known jobs, most recent first"""
+        with self._lock:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def _run(self, job: IngestionJob, content: bytes):
+        job.status = 'running'
+        job.started_at = _now()
+        stage_name = None
+        try:
+            stage_name = 'parse'
+            raw_df = self._stage(job, stage_name, lambda progress: self._parse(job.filename, content, progress))
+            content = None
+
+            stage_name = 'validate'
+            raw_df, report = self._stage(job, stage_name, lambda progress: self._validate(raw_df, job.stages['validate']))
+
+            if job.mode == 'append':
+                current = self._registry.get(job.tenant)
+                stage_name = 'clean'
+                delta, report = self._stage(job, stage_name, lambda progress: current.clean_rows(raw_df, report))
+                raw_df = None
+
+                stage_name = 'index'
+                service = self._stage(job, stage_name, lambda progress: self._append(current, delta, report, progress))
+                job.result['rows_appended'] = int(len(delta))
+            else:
+                stage_name = 'clean'
+                service = self._stage(job, stage_name, lambda progress: self._clean(raw_df, job.filename, report))
+                raw_df = None
+
+                stage_name = 'index'
+                self._stage(job, stage_name, service.build_indexes)
+
+            # The new dataset goes live with the default chart payloads already computed
+            stage_name = 'warm'
+            if WARMUP_ENABLED:
+                self._stage(job, stage_name, lambda progress: self._warm(service, job.stages['warm']))
+            else:
+                job.stages[stage_name]['status'] = 'skipped'
+
+            stage_name = 'activate'
+            self._stage(job, stage_name, lambda progress: self._registry.activate(job.tenant, service))
+
+            job.result.update({
+                'rows_after_cleaning': int(len(service.df)),
+                'years': sorted(int(year) for year in service.df['Ano'].unique()),
+                'dataset_version': service.dataset_version,
+                'data_quality': report
+            })
+            job.status = 'succeeded'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e) if isinstance(e, IngestionError) else f"{type(e).__name__}: {e}"
+            if stage_name:
+                job.stages[stage_name]['status'] = 'failed'
+            for stage in job.stages.values():
+                if stage['status'] == 'pending':
+                    stage['status'] = 'skipped'
+        finally:
+            job.finished_at = _now()
+
+    @staticmethod
+    def _stage(job: IngestionJob, name: str, run: Callable[[Callable[[float], None]], Any]) -> Any:
+        stage = job.stages[name]
+        stage['status'] = 'running'
+
+        def progress(fraction: float):
+            stage['progress'] = round(min(max(fraction, 0.0), 1.0), 4)
+
+        start = time.perf_counter()
+        try:
+            result = run(progress)
+        finally:
+            stage['seconds'] = time.perf_counter() - start
+        stage['status'] = 'done'
+        stage['progress'] = 1.0
+        return result
+
+    @staticmethod
+    def _parse(filename: str, content: bytes, progress: Callable[[float], None]) -> pd.DataFrame:
+        buffer = io.BytesIO(content)
+        try:
+            if filename.lower().endswith('.csv'):
+                chunks = []
+                for chunk in pd.read_csv(buffer, chunksize=CSV_CHUNK_ROWS):
+                    chunks.append(chunk)
+                    progress(buffer.tell() / len(content))
+                return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+            return pd.read_excel(buffer)
+        except Exception as e:
+            raise IngestionError(f"Could not parse {filename}: {e}")
+
+    @staticmethod
+    def _validate(raw_df: pd.DataFrame, stage: Dict[str, Any]) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        if raw_df.empty:
+            raise IngestionError("The file has no data rows")
+        try:
+            df, report = validate_frame(raw_df)
+        except SchemaError as e:
+            raise IngestionError(str(e))
+        # Invalid measures are zeroed and reported, but a row without a valid year cannot be placed
+        if report['rows']['invalid_year']:
+            raise IngestionError(f"{report['rows']['invalid_year']} rows have no valid 'Ano'")
+
+        stage['detail'] = {
+            'rows': report['rows']['input'],
+            'added_columns': report['added_columns'],
+            'coerced_columns': report['coerced_columns'],
+            'invalid_values': report['invalid_values']
+        }
+        return df, report
+
+    @staticmethod
+    def _clean(raw_df: pd.DataFrame, filename: str, report: Dict[str, Any]) -> EmissionsDataService:
+        service = EmissionsDataService(data_file_path=filename, df=raw_df, quality_report=report)
+        if service.load_error:
+            raise IngestionError(f"Cleaning failed: {service.load_error}")
+        if service.df.empty:
+            raise IngestionError("No rows with positive emissions (tCO2e) after cleaning")
+        return service
+
+    @staticmethod
+    def _append(current: EmissionsDataService, delta: pd.DataFrame, report: Dict[str, Any],
+                progress: Callable[[float], None]) -> EmissionsDataService:
+        try:
+            service = current.append_rows(delta, report)
+        except ValueError as e:
+            raise IngestionError(str(e))
+        progress(0.5)
+        # Structures the live service had not built yet are built over the merged rows
+        service.build_indexes(lambda fraction: progress(0.5 + fraction / 2))
+        return service
+
+    @staticmethod
+    def _warm(service: EmissionsDataService, stage: Dict[str, Any]):
+        state = warmup_runner.warm_service(service)
+        stage['detail'] = {
+            'payloads': len(state['targets']),
+            'failed': [target['route'] for target in state['targets'] if target['status'] == 'failed']
+        }
+
+
+# Global instance
+ingestion_manager = IngestionManager()
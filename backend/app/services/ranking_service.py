@@ -0,0 +1,112 @@
+"""
+Top-N ranking: single-pass sum/count aggregation with partial selection
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Tuple, Union
+
+RANKING_MEASURES = ['Emissões (tCO2e)', 'Emissões (tGEE)', 'Valor']
+
+RANKING_DIMENSIONS = [
+    'parameter_category', 'Escopo', 'Categoria', 'Gás', 'Família de gás', 'Superfamília de gás',
+    'Tecnologia', 'Unidade operacional', 'Parâmetro', 'Precursor', 'Unidade de medida'
+] + [f'Hierarquia nível {level}' for level in range(1, 8)]
+
+Dimension = Union[str, Tuple[str, ...]]
+
+
+class RankedAggregate:
+    """Per-key sums and row counts for one dimension, ready for repeated top-N selection"""
+
+    def __init__(self, df: pd.DataFrame, dimension: Dimension):
+        self.dimension = dimension
+        if isinstance(dimension, tuple):
+            grouped = df.groupby(list(dimension), sort=False)
+            codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+            self.keys = list(grouped.size().index)
+        else:
+            codes, uniques = pd.factorize(df[dimension])
+            self.keys = list(uniques)
+
+        # Missing keys get code -1: they are ranked nowhere, like groupby does, but totalled apart
+        valid = codes >= 0
+        n_keys = len(self.keys)
+        measures = {measure: df[measure].to_numpy(dtype=float) for measure in RANKING_MEASURES}
+
+        self.counts = np.bincount(codes[valid], minlength=n_keys)
+        self.sums = {
+            measure: np.bincount(codes[valid], weights=values[valid], minlength=n_keys)
+            for measure, values in measures.items()
+        }
+        self.missing_count = int((~valid).sum())
+        self.missing_sums = {measure: float(values[~valid].sum()) for measure, values in measures.items()}
+
+    def appended(self, delta: pd.DataFrame) -> 'RankedAggregate':
+        """Aggregate over the ranked rows plus `delta`, merging only the delta's per-key totals"""
+        if delta.empty:
+            return self
+
+        delta_aggregate = RankedAggregate(delta, self.dimension)
+        positions = {key: i for i, key in enumerate(self.keys)}
+        # New keys go last - the order factorize / ngroup(sort=False) give on the concatenated rows
+        new_keys = [key for key in delta_aggregate.keys if key not in positions]
+        for key in new_keys:
+            positions[key] = len(positions)
+        rows = np.array([positions[key] for key in delta_aggregate.keys], dtype=np.int64)
+
+        merged = RankedAggregate.__new__(RankedAggregate)
+        merged.dimension = self.dimension
+        merged.keys = self.keys + new_keys
+        merged.counts = np.zeros(len(merged.keys), dtype=np.int64)
+        merged.counts[:len(self.keys)] = self.counts
+        merged.counts[rows] += delta_aggregate.counts
+        merged.sums = {}
+        for measure, sums in self.sums.items():
+            merged.sums[measure] = np.zeros(len(merged.keys))
+            merged.sums[measure][:len(self.keys)] = sums
+            merged.sums[measure][rows] += delta_aggregate.sums[measure]
+        merged.missing_count = self.missing_count + delta_aggregate.missing_count
+        merged.missing_sums = {
+            measure: total + delta_aggregate.missing_sums[measure] for measure, total in self.missing_sums.items()
+        }
+        return merged
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def top_positions(self, limit: int, measure: str = 'Emissões (tCO2e)') -> np.ndarray:
+        """Positions of the `limit` largest keys, in descending order"""
+        if limit <= 0 or not len(self.keys):
+            return np.array([], dtype=np.int64)
+
+        values = -self.sums[measure]
+        if limit >= len(values):
+            return np.argsort(values, kind='stable')
+
+        # Partial selection first, then only the selected keys are sorted
+        selected = np.argpartition(values, limit - 1)[:limit]
+        return selected[np.argsort(values[selected], kind='stable')]
+
+    def top(self, limit: int, measure: str = 'Emissões (tCO2e)') -> List[Dict[str, Any]]:
+        return [
+            {
+                'key': self.keys[position],
+                'count': int(self.counts[position]),
+                'sums': {name: float(sums[position]) for name, sums in self.sums.items()}
+            }
+            for position in self.top_positions(limit, measure)
+        ]
+
+    def total(self, measure: str = 'Emissões (tCO2e)') -> float:
+        """Sum over every aggregated row, the ones with a missing key included"""
+        return float(self.sums[measure].sum()) + self.missing_sums[measure]
+
+    def others(self, positions: np.ndarray) -> Dict[str, Any]:
+        """Totals for every key outside `positions`"""
+        rest = np.ones(len(self.keys), dtype=bool)
+        rest[positions] = False
+        return {
+            'members': int(rest.sum()),
+            'count': int(self.counts[rest].sum()),
+            'sums': {name: float(sums[rest].sum()) for name, sums in self.sums.items()}
+        }
@@ -0,0 +1,365 @@
+"""
+Server-side report export: chart payloads rendered to PDF / PNG with matplotlib in a process pool
+
+Payloads come from the (cached) service methods in the request thread; only the drawing runs in
+the worker processes, so rendering never holds the GIL the API threads need. Rendered artifacts
+are cached by dataset version, factor set and parameters.
+"""
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Any, Tuple
+
+import numpy as np
+
+from app.utils.metrics import Histogram, LATENCY_BUCKETS, metrics
+from app.utils.payload_cache import PayloadCache, _MISSING
+
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '2'))
+# Rendered PDFs / PNGs kept in memory (typically 50-300 KB each)
+REPORT_CACHE_SIZE = int(os.environ.get('REPORT_CACHE_SIZE', '32'))
+REPORT_RENDER_TIMEOUT = float(os.environ.get('REPORT_RENDER_TIMEOUT', '60'))
+REPORT_PNG_DPI = int(os.environ.get('REPORT_PNG_DPI', '120'))
+
+REPORT_FORMATS = {'pdf': 'application/pdf', 'png': 'image/png'}
+
+# Chart -> (service method, the report parameter it takes)
+REPORT_CHARTS = {
+    'scope-category': ('get_emissions_by_scope_category', 'year'),
+    'gas-breakdown': ('get_gas_emissions_breakdown', 'year'),
+    'treemap': ('get_hierarchy_treemap_data', 'level'),
+    'heatmap': ('get_hierarchical_emissions_heatmap', 'year')
+}
+
+# Treemap tiles / heatmap units drawn before the rest are grouped or left out
+TREEMAP_MAX_TILES = 40
+HEATMAP_MAX_UNITS = 12
+
+FIGURE_SIZE = (11.69, 8.27)  # A4 landscape, inches
+
+
+def _no_data(ax):
+    ax.text(0.5, 0.5, 'No data', ha='center', va='center', fontsize=14, color='gray', transform=ax.transAxes)
+    ax.set_axis_off()
+
+
+def _short(label: str, length: int = 28) -> str:
+    label = str(label)
+    return label if len(label) <= length else label[:length - 1] + '…'
+
+
+def draw_scope_category(ax, payload: Dict[str, Any]):
+    """Monthly emissions stacked by scope, with the summed reduction target"""
+    scopes = payload.get('emissions_by_scope_category') or {}
+    months = sorted({point['month'] for categories in scopes.values()
+                     for points in categories.values() for point in points})
+    if not months:
+        _no_data(ax)
+        return
+
+    positions = {month: i for i, month in enumerate(months)}
+    bottom = [0.0] * len(months)
+    targets = [0.0] * len(months)
+    for scope in sorted(scopes):
+        totals = [0.0] * len(months)
+        for points in scopes[scope].values():
+            for point in points:
+                totals[positions[point['month']]] += point['emissions']
+                targets[positions[point['month']]] += point.get('target', 0.0)
+        ax.bar(range(len(months)), totals, bottom=bottom, label=scope)
+        bottom = [b + t for b, t in zip(bottom, totals)]
+
+    ax.plot(range(len(months)), targets, color='black', linestyle='--', marker='o', markersize=3, label='Target')
+    ax.set_xticks(range(len(months)))
+    ax.set_xticklabels(months, rotation=45, ha='right')
+    ax.set_ylabel('tCO2e')
+    ax.set_title('Monthly emissions by scope')
+    ax.legend()
+
+
+def draw_gas_breakdown(ax, payload: Dict[str, Any]):
+    """Emissions per gas family with their share of the total"""
+    families = (payload.get('gas_emissions_breakdown') or {}).get('gas_families') or {}
+    if not families:
+        _no_data(ax)
+        return
+
+    ranked = sorted(families.items(), key=lambda item: item[1]['total_emissions'])
+    bars = ax.barh([name for name, _ in ranked], [values['total_emissions'] for _, values in ranked], color='tab:green')
+    for bar, (_, values) in zip(bars, ranked):
+        ax.text(bar.get_width(), bar.get_y() + bar.get_height() / 2, f" {values['percentage']:.1f}%", va='center')
+    ax.set_xlabel('tCO2e')
+    ax.set_title('Emissions by gas family')
+
+
+def _worst_ratio(row: List[float], side: float) -> float:
+    total = sum(row)
+    return max(max(side * side * size / (total * total), total * total / (side * side * size)) for size in row)
+
+
+def squarify(sizes: List[float], x: float, y: float, width: float, height: float) -> List[Tuple[float, float, float, float]]:
+    """Squarified treemap layout: one (x, y, width, height) per size, sizes sorted descending"""
+    scale = width * height / sum(sizes)
+    remaining = [size * scale for size in sizes]
+    rects = []
+    while remaining:
+        side = min(width, height)
+        row = [remaining.pop(0)]
+        while remaining and _worst_ratio(row + [remaining[0]], side) <= _worst_ratio(row, side):
+            row.append(remaining.pop(0))
+        total = sum(row)
+        if width >= height:
+            # Lay the row out as a column on the left
+            column_width = total / height
+            offset = y
+            for size in row:
+                rects.append((x, offset, column_width, size / column_width))
+                offset += size / column_width
+            x, width = x + column_width, width - column_width
+        else:
+            row_height = total / width
+            offset = x
+            for size in row:
+                rects.append((offset, y, size / row_height, row_height))
+                offset += size / row_height
+            y, height = y + row_height, height - row_height
+    return rects
+
+
+def draw_treemap(ax, payload: Dict[str, Any]):
+    """Hierarchy nodes as tiles sized by emissions, colored by the node they belong to one level up"""
+    nodes = payload.get('hierarchy') or {}
+    # Skip single-node top levels (the company root) so the tiles show how emissions split
+    while len(nodes) == 1 and next(iter(nodes.values())).get('children'):
+        nodes = next(iter(nodes.values()))['children']
+    tiles = []
+    for parent, node in nodes.items():
+        children = node.get('children') or {parent: node}
+        tiles += [(parent, child, values['emissions']) for child, values in children.items() if values['emissions'] > 0]
+    if not tiles:
+        _no_data(ax)
+        return
+
+    tiles.sort(key=lambda tile: -tile[2])
+    if len(tiles) > TREEMAP_MAX_TILES:
+        rest = sum(tile[2] for tile in tiles[TREEMAP_MAX_TILES - 1:])
+        tiles = tiles[:TREEMAP_MAX_TILES - 1] + [('', 'Other', rest)]
+
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Rectangle
+
+    parents = list(dict.fromkeys(tile[0] for tile in tiles))
+    colors = plt.get_cmap('tab20')
+    total = sum(tile[2] for tile in tiles)
+    for (parent, child, emissions), (x, y, width, height) in zip(tiles, squarify([tile[2] for tile in tiles], 0, 0, 1, 1)):
+        color = colors(parents.index(parent) % 20) if parent else 'lightgray'
+        ax.add_patch(Rectangle((x, y), width, height, facecolor=color, edgecolor='white', linewidth=1.5))
+        if width * height > 0.012:
+            ax.text(x + width / 2, y + height / 2, f"{_short(child, 22)}\n{emissions / total:.1%}",
+                    ha='center', va='center', fontsize=7)
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1)
+    ax.set_axis_off()
+    ax.set_title('Emissions by hierarchy')
+
+
+def draw_heatmap(ax, payload: Dict[str, Any]):
+    """Business areas (rows) against their largest operational units, colored by emissions"""
+    breakdown = (payload.get('hierarchical_emissions') or {}).get('level_2_breakdown') or {}
+    if not breakdown:
+        _no_data(ax)
+        return
+
+    from matplotlib.colors import LogNorm
+
+    areas = sorted(breakdown, key=lambda area: -breakdown[area]['total_emissions'])
+    units = {
+        area: sorted(breakdown[area]['operational_units'].items(), key=lambda item: -item[1]['emissions'])[:HEATMAP_MAX_UNITS]
+        for area in areas
+    }
+    columns = max(len(area_units) for area_units in units.values())
+    grid = np.full((len(areas), columns), np.nan)
+    for row, area in enumerate(areas):
+        for column, (_, values) in enumerate(units[area]):
+            grid[row, column] = values['emissions']
+
+    positive = grid[grid > 0]
+    norm = LogNorm(vmin=positive.min(), vmax=positive.max()) if len(positive) else None
+    image = ax.imshow(np.ma.masked_invalid(np.where(grid > 0, grid, np.nan)), aspect='auto', cmap='YlOrRd', norm=norm)
+    for row, area in enumerate(areas):
+        for column, (unit, _) in enumerate(units[area]):
+            ax.text(column, row, _short(unit, 12), ha='center', va='center', fontsize=5)
+    ax.set_yticks(range(len(areas)))
+    ax.set_yticklabels([_short(area) for area in areas])
+    ax.set_xticks(range(columns))
+    ax.set_xticklabels([str(rank + 1) for rank in range(columns)])
+    ax.set_xlabel('Operational unit rank within the area')
+    ax.set_title('Emissions by business area and operational unit')
+    ax.figure.colorbar(image, ax=ax, label='tCO2e')
+
+
+CHART_RENDERERS = {
+    'scope-category': draw_scope_category,
+    'gas-breakdown': draw_gas_breakdown,
+    'treemap': draw_treemap,
+    'heatmap': draw_heatmap
+}
+
+
+def _init_worker():
+    # Headless backend, and pay the pyplot import once per worker rather than per report
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot  # noqa: F401
+
+
+def render_report(title: str, charts: List[Tuple[str, Dict[str, Any]]], fmt: str) -> bytes:
+    """Draw (chart, payload) pairs: one page each in a PDF, stacked panels in a PNG (runs in a worker process)"""
+    _init_worker()
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    buffer = io.BytesIO()
+    if fmt == 'pdf':
+        # No creation date, so the same payloads always give the same bytes
+        with PdfPages(buffer, metadata={'Title': title, 'CreationDate': None}) as pdf:
+            for chart, payload in charts:
+                figure, ax = plt.subplots(figsize=FIGURE_SIZE)
+                figure.suptitle(title)
+                CHART_RENDERERS[chart](ax, payload)
+                figure.tight_layout(rect=(0, 0, 1, 0.96))
+                pdf.savefig(figure)
+                plt.close(figure)
+    else:
+        figure, axes = plt.subplots(len(charts), 1, figsize=(FIGURE_SIZE[0], FIGURE_SIZE[1] * len(charts)), squeeze=False)
+        figure.suptitle(title)
+        for (chart, payload), ax in zip(charts, axes[:, 0]):
+            CHART_RENDERERS[chart](ax, payload)
+        # Keep ~0.4 inch at the top for the title
+        figure.tight_layout(rect=(0, 0, 1, 1 - 0.4 / figure.get_figheight()))
+        figure.savefig(buffer, format='png', dpi=REPORT_PNG_DPI)
+        plt.close(figure)
+    return buffer.getvalue()
+
+
+def parse_charts(charts: str = None) -> List[str]:
+    """Comma-separated chart names (all of them by default), validated and de-duplicated"""
+    if not charts:
+        return list(REPORT_CHARTS)
+    names = list(dict.fromkeys(name.strip() for name in charts.split(',') if name.strip()))
+    unknown = [name for name in names if name not in REPORT_CHARTS]
+    if unknown or not names:
+        raise ValueError(f"Unknown report charts: {', '.join(unknown)} (available: {', '.join(REPORT_CHARTS)})")
+    return names
+
+
+class ReportRenderer:
+    """Process pool plus a bounded cache of rendered artifacts; identical concurrent exports render once"""
+
+    def __init__(self, workers: int = REPORT_WORKERS, cache_size: int = REPORT_CACHE_SIZE):
+        self.workers = workers
+        self.artifacts = PayloadCache(cache_size)
+        self.render_duration = Histogram(
+            'report_render_seconds', 'Time to render a report in the process pool by format', LATENCY_BUCKETS
+        )
+        self._lock = threading.Lock()
+        self._pool: ProcessPoolExecutor = None
+        self._pending: Dict[tuple, Future] = {}
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn: forking a process that runs API threads can copy held locks into the child
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker
+                )
+            return self._pool
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def cache_key(service, factor_set: str, charts: List[str], fmt: str, year: int, level: int,
+                  title: str = None) -> tuple:
+        factor_version = service.factor_engine.get_factor_set(factor_set).version if factor_set else None
+        # Only the parameters the selected charts read are part of the key, so e.g. a treemap-only
+        # report is shared across years
+        used = {REPORT_CHARTS[chart][1] for chart in charts}
+        year = year if 'year' in used else None
+        level = level if 'level' in used else None
+        # Dataset versions are unique across tenants, so the tenant itself is not part of the key
+        return (service.dataset_version, factor_set, factor_version, tuple(charts), fmt, year, level, title)
+
+    def render(self, service, charts: List[str], fmt: str = 'pdf', year: int = 2023, level: int = 3,
+               factor_set: str = None, title: str = None) -> Tuple[bytes, bool]:
+        """Rendered report bytes and whether they came from the cache"""
+        if fmt not in REPORT_FORMATS:
+            raise ValueError(f"Unsupported report format: {fmt} (available: {', '.join(REPORT_FORMATS)})")
+
+        key = self.cache_key(service, factor_set, charts, fmt, year, level, title)
+        artifact = self.artifacts.get(key)
+        if artifact is not _MISSING:
+            return artifact, True
+
+        with self._lock:
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+
+        if not owner:
+            return future.result(timeout=REPORT_RENDER_TIMEOUT), False
+
+        try:
+            params = {'year': year, 'level': level}
+            payloads = []
+            for chart in charts:
+                method, param = REPORT_CHARTS[chart]
+                payloads.append((chart, getattr(service, method)(params[param])))
+            # The default title names the year only when a chart depends on it (see cache_key)
+            uses_year = any(REPORT_CHARTS[chart][1] == 'year' for chart in charts)
+            report_title = title or ("Emissions report" + (f" {year}" if uses_year else '')
+                                     + (f" ({factor_set} factors)" if factor_set else ''))
+
+            start = time.perf_counter()
+            try:
+                artifact = self._get_pool().submit(render_report, report_title, payloads, fmt).result(REPORT_RENDER_TIMEOUT)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed): start a fresh pool for the next export
+                self.shutdown()
+                raise
+            self.render_duration.observe(time.perf_counter() - start, format=fmt)
+
+            self.artifacts.put(key, artifact)
+            future.set_result(artifact)
+            return artifact, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def render_metrics(self) -> List[str]:
+        lines = [
+            "# HELP report_cache_requests_total Report exports by rendered-artifact cache result",
+            "# TYPE report_cache_requests_total counter",
+            f'report_cache_requests_total{{result="hit"}} {self.artifacts.hits}',
+            f'report_cache_requests_total{{result="miss"}} {self.artifacts.misses}',
+            "# HELP report_cache_entries Rendered reports held in memory",
+            "# TYPE report_cache_entries gauge",
+            f"report_cache_entries {len(self.artifacts)}"
+        ]
+        return lines + self.render_duration.render()
+
+
+# Global instance
+report_renderer = ReportRenderer()
+metrics.register_collector(report_renderer.render_metrics)
@@ -0,0 +1,139 @@
+"""
+Monte Carlo reduction-scenario simulator over pre-aggregated emissions
+"""
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional
+
+SCENARIO_DIMENSIONS = ['Categoria', 'Tecnologia', 'Unidade operacional']
+PERCENTILES = [5, 25, 50, 75, 95]
+
+# Upper bound on trials x groups floats materialized per batch (~16 MB)
+MAX_BATCH_ELEMENTS = 2_000_000
+
+
+class ScenarioSimulator:
+    """Samples reduction levers as batched matrix operations over emission cells"""
+
+    def __init__(self, df: pd.DataFrame):
+        # One cell per combination of lever dimensions - every lever is constant within a cell
+        self._set_cells(df.groupby(SCENARIO_DIMENSIONS)['Emissões (tCO2e)'].sum().reset_index())
+
+    def _set_cells(self, cells: pd.DataFrame):
+        self.cells = cells
+        self.emissions = self.cells['Emissões (tCO2e)'].to_numpy(dtype=float)
+        self.baseline = float(self.emissions.sum())
+
+    def appended(self, delta: pd.DataFrame) -> 'ScenarioSimulator':
+        """Simulator over the aggregated rows plus `delta` - only the cells are re-aggregated"""
+        if delta.empty:
+            return self
+
+        delta_cells = delta.groupby(SCENARIO_DIMENSIONS)['Emissões (tCO2e)'].sum().reset_index()
+        cells = pd.concat([self.cells, delta_cells], ignore_index=True)
+        simulator = ScenarioSimulator.__new__(ScenarioSimulator)
+        simulator._set_cells(cells.groupby(SCENARIO_DIMENSIONS)['Emissões (tCO2e)'].sum().reset_index())
+        return simulator
+
+    def _membership(self, levers: List[Dict[str, Any]]) -> np.ndarray:
+        """Boolean levers x cells matrix"""
+        membership = np.zeros((len(levers), len(self.cells)), dtype=bool)
+        for i, lever in enumerate(levers):
+            if lever['dimension'] not in SCENARIO_DIMENSIONS:
+                raise ValueError(f"Unsupported lever dimension: {lever['dimension']}")
+            membership[i] = self.cells[lever['dimension']].to_numpy() == lever['value']
+        return membership
+
+    @staticmethod
+    def _bounds(levers: List[Dict[str, Any]]):
+        """Low / mode / high reduction fractions per lever"""
+        low = np.array([lever['low'] for lever in levers], dtype=float) / 100
+        high = np.array([lever['high'] for lever in levers], dtype=float) / 100
+        mode = np.array([
+            lever['mode'] if lever.get('mode') is not None else np.nan for lever in levers
+        ], dtype=float) / 100
+
+        if np.any(low > high):
+            raise ValueError("Lever 'low' must not exceed 'high'")
+        triangular = ~np.isnan(mode)
+        if np.any(triangular & ((mode < low) | (mode > high))):
+            raise ValueError("Lever 'mode' must lie between 'low' and 'high'")
+
+        return low, mode, high
+
+    @staticmethod
+    def _sample(rng: np.random.Generator, n: int, low: np.ndarray, mode: np.ndarray, high: np.ndarray) -> np.ndarray:
+        """Draw an n x levers matrix of reduction fractions (uniform, or triangular when a mode is set)"""
+        u = rng.random((n, len(low)))
+        width = high - low
+        samples = low + u * width
+
+        triangular = ~np.isnan(mode)
+        if triangular.any():
+            # Inverse CDF of the triangular distribution, evaluated for all columns at once
+            with np.errstate(divide='ignore', invalid='ignore'):
+                split = np.where(width > 0, (mode - low) / width, 0.0)
+                left = low + np.sqrt(u * width * (mode - low))
+                right = high - np.sqrt((1 - u) * width * (high - mode))
+            samples = np.where(triangular, np.where(u < split, left, right), samples)
+
+        return samples
+
+    def run(self, levers: List[Dict[str, Any]], trials: int = 5000, seed: Optional[int] = None) -> Dict[str, Any]:
+        """Simulate the distribution of total tCO2e after applying the levers"""
+        if not levers:
+            raise ValueError("At least one lever is required")
+
+        low, mode, high = self._bounds(levers)
+        membership = self._membership(levers)
+
+        # Cells hit by exactly the same set of levers behave identically - sum them up front
+        signatures, inverse = np.unique(membership.T, axis=0, return_inverse=True)
+        group_emissions = np.bincount(inverse.ravel(), weights=self.emissions, minlength=len(signatures))
+        untouched = ~signatures.any(axis=1)
+        fixed_emissions = float(group_emissions[untouched].sum())
+        signatures = signatures[~untouched].T.astype(float)  # levers x groups
+        group_emissions = group_emissions[~untouched]
+
+        rng = np.random.default_rng(seed)
+        totals = np.empty(trials)
+        batch_size = max(1, MAX_BATCH_ELEMENTS // max(1, signatures.shape[1], len(levers)))
+
+        for start in range(0, trials, batch_size):
+            n = min(batch_size, trials - start)
+            fractions = self._sample(rng, n, low, mode, high)
+            # Overlapping levers compound multiplicatively: sum logs, then exponentiate
+            log_remaining = np.log1p(-np.clip(fractions, 0.0, 1.0 - 1e-12))
+            remaining = np.exp(log_remaining @ signatures)
+            totals[start:start + n] = fixed_emissions + remaining @ group_emissions
+
+        counts, edges = np.histogram(totals, bins=30)
+        expected_fraction = np.where(np.isnan(mode), (low + high) / 2, (low + mode + high) / 3)
+
+        return {
+            'baseline_emissions': self.baseline,
+            'trials': trials,
+            'total_emissions': {
+                'mean': float(totals.mean()),
+                'std': float(totals.std()),
+                **{f'p{p}': float(v) for p, v in zip(PERCENTILES, np.percentile(totals, PERCENTILES))}
+            },
+            'reduction_percentage': {
+                f'p{p}': float(v) for p, v in zip(
+                    PERCENTILES, np.percentile((1 - totals / self.baseline) * 100, PERCENTILES)
+                )
+            } if self.baseline > 0 else {},
+            'histogram': {
+                'bin_edges': edges.tolist(),
+                'counts': counts.tolist()
+            },
+            'levers': [
+                {
+                    'dimension': lever['dimension'],
+                    'value': lever['value'],
+                    'affected_emissions': float(self.emissions[membership[i]].sum()),
+                    'expected_reduction': float(self.emissions[membership[i]].sum() * expected_fraction[i])
+                }
+                for i, lever in enumerate(levers)
+            ]
+        }
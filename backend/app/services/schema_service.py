@@ -0,0 +1,198 @@
+"""
+Schema validation of CLIMAS exports, run once when a dataset is loaded or ingested
+
+Request-time code relies on what this guarantees: every schema column exists, dimensions hold
+strings (or NaN), `Ano` is an integer and the measures are finite floats. Factor columns are floats
+that stay NaN where the factor is unknown, so their consumers must skip NaN (see `factor_value`).
+"""
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+HIERARCHY_COLUMNS = [f'Hierarquia nível {level}' for level in range(1, 8)]
+
+# Columns without which an export cannot be served (uploads missing any are rejected)
+REQUIRED_COLUMNS = [
+    'Ano', 'Competência', 'Parâmetro', 'Escopo', 'Categoria', 'Gás', 'Família de gás', 'Tecnologia',
+    'Unidade operacional', 'Valor', 'Emissões (tGEE)', 'Emissões (tCO2e)'
+] + HIERARCHY_COLUMNS
+
+DIMENSION_COLUMNS = HIERARCHY_COLUMNS + [
+    'Unidade operacional', 'País', 'Parâmetro', 'Unidade de medida', 'Tecnologia', 'Precursor', 'Escopo',
+    'Categoria', 'Superfamília de gás', 'Família de gás', 'Gás', 'Competência'
+]
+
+# Dimensions read as text at request time (parameters are categorized by keyword)
+TEXT_COLUMNS = ['Parâmetro']
+
+# Activity and emission measures: missing or invalid values count as zero
+MEASURE_COLUMNS = [
+    'Valor', 'Emissões (tGEE)', 'Emissões (tCO2e)',
+    'Emissões de controle operacional (tGEE)', 'Emissões de participação acionária (tGEE)',
+    'Emissões de controle operacional (tCO2e)', 'Emissões de participação acionária (tCO2e)'
+]
+
+# Factors: an unknown factor is not zero, so invalid values stay NaN (and skip the consistency check)
+FACTOR_COLUMNS = ['Fator de conversão', 'Fator de emissão', 'PAG']
+
+# tCO2e = Valor x conversion factor x emission factor x GWP (PAG)
+CONSISTENCY_RELATIVE_TOLERANCE = 0.01
+# Exports round tGEE to 6 decimals before applying the GWP
+TGEE_ROUNDING = 1e-6
+CONSISTENCY_SAMPLES = 5
+
+
+def factor_value(value: float) -> Optional[float]:
+    """A factor (or an aggregate of factors) for a payload: None when it is unknown"""
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+class SchemaError(ValueError):
+    """The frame cannot be validated (e.g. required columns are missing)"""
+
+
+def _empty_report(rows: int) -> Dict[str, Any]:
+    return {
+        'rows': {'input': rows, 'invalid_year': 0, 'non_positive_emissions': 0, 'clean': 0},
+        'added_columns': [],
+        'coerced_columns': {},
+        'invalid_values': {},
+        'filled_values': {},
+        'consistency': {
+            'checked': 0, 'inconsistent': 0, 'relative_tolerance': CONSISTENCY_RELATIVE_TOLERANCE,
+            'max_relative_error': 0.0, 'samples': []
+        }
+    }
+
+
+def validate_frame(raw_df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """Check presence and dtypes of the schema columns and repair invalid values column-wise
+
+    Returns the validated frame and its data-quality report; raises SchemaError when required
+    columns are missing. Rows whose `Ano` is not a valid year are dropped (and counted).
+    """
+    missing = [col for col in REQUIRED_COLUMNS if col not in raw_df.columns]
+    if missing:
+        raise SchemaError(f"Missing required columns: {', '.join(missing)}")
+
+    report = _empty_report(int(len(raw_df)))
+    columns = {}
+
+    # Optional columns are added so request-time code never has to check for them
+    for col in DIMENSION_COLUMNS + FACTOR_COLUMNS + MEASURE_COLUMNS:
+        if col not in raw_df.columns:
+            report['added_columns'].append(col)
+            columns[col] = 0.0 if col in MEASURE_COLUMNS else np.nan
+
+    for col in DIMENSION_COLUMNS:
+        if col in columns:
+            continue
+        values = raw_df[col]
+        inferred = pd.api.types.infer_dtype(values, skipna=True)
+        if inferred not in ('string', 'empty'):
+            # Numeric codes, dates or mixed cells become their string form (missing stays missing)
+            report['coerced_columns'][col] = inferred
+            values = values.where(values.isna(), values.astype(str))
+            columns[col] = values
+        if col in TEXT_COLUMNS:
+            filled = int(values.isna().sum())
+            if filled:
+                report['filled_values'][col] = filled
+                columns[col] = values.fillna('')
+
+    for col in FACTOR_COLUMNS + MEASURE_COLUMNS:
+        if col in columns:
+            continue
+        values = raw_df[col]
+        numeric = pd.to_numeric(values, errors='coerce').astype(float)
+        if values.dtype.kind not in 'iuf':
+            report['coerced_columns'][col] = pd.api.types.infer_dtype(values, skipna=True)
+        numeric = numeric.mask(np.isinf(numeric))
+        invalid = int((numeric.isna() & values.notna()).sum())
+        if invalid:
+            report['invalid_values'][col] = invalid
+        if col in MEASURE_COLUMNS:
+            filled = int(numeric.isna().sum())
+            if filled:
+                report['filled_values'][col] = filled
+                numeric = numeric.fillna(0.0)
+        columns[col] = numeric
+
+    years = pd.to_numeric(raw_df['Ano'], errors='coerce')
+    valid_year = (years.notna() & (years % 1 == 0)).to_numpy()
+    if raw_df['Ano'].dtype.kind not in 'iu':
+        report['coerced_columns']['Ano'] = pd.api.types.infer_dtype(raw_df['Ano'], skipna=True)
+    columns['Ano'] = years.where(valid_year, 0).astype(np.int64)
+
+    df = raw_df.assign(**columns)
+    invalid_years = int((~valid_year).sum())
+    if invalid_years:
+        report['rows']['invalid_year'] = invalid_years
+        df = df[valid_year]
+    return df, report
+
+
+def check_consistency(df: pd.DataFrame, relative_tolerance: float = CONSISTENCY_RELATIVE_TOLERANCE) -> Dict[str, Any]:
+    """Compare `Emissões (tCO2e)` with Valor x conversion factor x emission factor x PAG on every row with known factors"""
+    valor = df['Valor'].to_numpy(dtype=float)
+    gwp = df['PAG'].to_numpy(dtype=float)
+    expected = valor * df['Fator de conversão'].to_numpy(dtype=float) * df['Fator de emissão'].to_numpy(dtype=float) * gwp
+    reported = df['Emissões (tCO2e)'].to_numpy(dtype=float)
+
+    checked = ~np.isnan(expected)
+    error = np.abs(reported - expected)
+    inconsistent = checked & (error > relative_tolerance * np.abs(expected) + TGEE_ROUNDING * np.abs(gwp))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative_error = np.where(checked & (expected != 0), error / np.abs(expected), 0.0)
+
+    positions = np.flatnonzero(inconsistent)
+    # Largest deviations first
+    positions = positions[np.argsort(-relative_error[positions], kind='stable')][:CONSISTENCY_SAMPLES]
+    return {
+        'checked': int(checked.sum()),
+        'inconsistent': int(inconsistent.sum()),
+        'relative_tolerance': relative_tolerance,
+        'max_relative_error': float(relative_error[inconsistent].max()) if len(positions) else 0.0,
+        'samples': [
+            {
+                'row': int(df.index[position]),
+                'parameter': str(df['Parâmetro'].iloc[position]),
+                'period': str(df['Competência'].iloc[position]),
+                'expected_tco2e': float(expected[position]),
+                'reported_tco2e': float(reported[position])
+            }
+            for position in positions
+        ]
+    }
+
+
+def combine_reports(current: Dict[str, Any], added: Dict[str, Any]) -> Dict[str, Any]:
+    """Report of a dataset built from `current` plus appended rows validated as `added`"""
+    if current is None:
+        return added
+    if added is None:
+        return current
+
+    def summed(a: Dict[str, int], b: Dict[str, int]) -> Dict[str, int]:
+        return {key: a.get(key, 0) + b.get(key, 0) for key in list(a) + [key for key in b if key not in a]}
+
+    consistency = {
+        'checked': current['consistency']['checked'] + added['consistency']['checked'],
+        'inconsistent': current['consistency']['inconsistent'] + added['consistency']['inconsistent'],
+        'relative_tolerance': added['consistency']['relative_tolerance'],
+        'max_relative_error': max(current['consistency']['max_relative_error'], added['consistency']['max_relative_error']),
+        'samples': (current['consistency']['samples'] + added['consistency']['samples'])[:CONSISTENCY_SAMPLES]
+    }
+    added_columns: List[str] = current['added_columns'] + [
+        col for col in added['added_columns'] if col not in current['added_columns']
+    ]
+    return {
+        'rows': summed(current['rows'], added['rows']),
+        'added_columns': added_columns,
+        'coerced_columns': {**current['coerced_columns'], **added['coerced_columns']},
+        'invalid_values': summed(current['invalid_values'], added['invalid_values']),
+        'filled_values': summed(current['filled_values'], added['filled_values']),
+        'consistency': consistency
+    }
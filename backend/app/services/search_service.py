@@ -0,0 +1,92 @@
+"""
+Autocomplete index over the string dimensions: accent-insensitive token prefix matching ranked by emissions
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, List, Any
+
+import numpy as np
+
+from app.services.ranking_service import RankedAggregate, RANKING_DIMENSIONS
+
+# Every string dimension the filter widgets can pick from
+SEARCH_DIMENSIONS = [dimension for dimension in RANKING_DIMENSIONS if dimension != 'parameter_category']
+
+MAX_SEARCH_LIMIT = 100
+
+_TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+# Sorts after every character a normalized token can hold, closing a prefix range
+_PREFIX_END = '\U0010ffff'
+
+
+def normalize_text(text: str) -> str:
+    """Case- and accent-folded text ("Emissões" -> "emissoes", "Ônibus" -> "onibus")"""
+    decomposed = unicodedata.normalize('NFKD', str(text).casefold())
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(normalize_text(text))
+
+
+class SearchIndex:
+    """Distinct dimension values ordered by emissions, looked up through a sorted token table
+
+    Entry ids are ranks (0 = largest emissions), so the matches of a query only need
+    intersecting and sorting by id. A query matches an entry when each of its tokens is a
+    prefix of one of the entry's tokens ("cons dies" finds "Consumo de diesel...").
+    """
+
+    def __init__(self, aggregates: Dict[str, RankedAggregate]):
+        entries = []
+        for dimension, aggregate in aggregates.items():
+            emissions = aggregate.sums['Emissões (tCO2e)']
+            for position, value in enumerate(aggregate.keys):
+                entries.append((dimension, str(value), float(emissions[position]), int(aggregate.counts[position])))
+        entries.sort(key=lambda entry: -entry[2])
+
+        self.dimensions = list(aggregates)
+        self.entries = entries
+        dimension_codes = {dimension: code for code, dimension in enumerate(self.dimensions)}
+        self._entry_dimensions = np.array([dimension_codes[entry[0]] for entry in entries], dtype=np.int32)
+
+        postings = sorted(
+            (token, entry_id)
+            for entry_id, entry in enumerate(entries)
+            for token in set(tokenize(entry[1]))
+        )
+        self._tokens = [token for token, _ in postings]
+        self._entry_ids = np.array([entry_id for _, entry_id in postings], dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _prefix_matches(self, prefix: str) -> np.ndarray:
+        start = bisect_left(self._tokens, prefix)
+        end = bisect_left(self._tokens, prefix + _PREFIX_END, start)
+        return self._entry_ids[start:end]
+
+    def search(self, query: str, dimensions: List[str] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """Entries matching every query token, largest emissions first (an empty query gives the top entries)"""
+        tokens = sorted(set(tokenize(query or '')), key=len, reverse=True)
+        if tokens:
+            # Longest tokens first - they select the fewest entries
+            matches = np.unique(self._prefix_matches(tokens[0]))
+            for token in tokens[1:]:
+                if not len(matches):
+                    break
+                matches = np.intersect1d(matches, self._prefix_matches(token), assume_unique=False)
+        else:
+            matches = np.arange(len(self.entries), dtype=np.int32)
+
+        if dimensions:
+            codes = [self.dimensions.index(dimension) for dimension in dimensions]
+            matches = matches[np.isin(self._entry_dimensions[matches], codes)]
+
+        results = []
+        for entry_id in matches[:limit]:
+            dimension, value, emissions, count = self.entries[entry_id]
+            results.append({'dimension': dimension, 'value': value, 'emissions': emissions, 'count': count})
+        return results
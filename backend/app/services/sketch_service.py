@@ -0,0 +1,281 @@
+"""
+Mergeable sketches: HyperLogLog distinct counts and relative-error quantiles, stored per cube cell and month
+
+Cells are partitioned by `month_index`, so a year (or any set of periods) is answered by merging
+its cells, appended periods only add cells, and nothing has to rescan the rows.
+"""
+import copy
+import math
+from typing import Dict, List, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# 2^12 registers: ~1.6% standard error once a sketch leaves its exact (sparse) mode
+HLL_PRECISION = 12
+# Quantiles are within 1% of the true value (DDSketch-style log buckets)
+QUANTILE_RELATIVE_ACCURACY = 0.01
+
+SUMMARY_QUANTILES = [0.5, 0.9, 0.99]
+
+MEASURE = 'Emissões (tCO2e)'
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    """64-bit hashes of the non-missing values (stable across processes)"""
+    values = values[values.notna()]
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+class HyperLogLog:
+    """Distinct-count sketch; exact (a sorted hash set) while small, registers beyond that"""
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        # The register rank is computed through float64, exact for the 64 - precision <= 53 remaining bits
+        if not 11 <= precision <= 18:
+            raise ValueError("HyperLogLog precision must be between 11 and 18")
+        self.precision = precision
+        self.hashes: Optional[np.ndarray] = np.empty(0, dtype=np.uint64)
+        self.registers: Optional[np.ndarray] = None
+
+    @property
+    def sparse_limit(self) -> int:
+        # Past this many hashes the registers take less memory than the exact set
+        return (1 << self.precision) // 8
+
+    @classmethod
+    def from_hashes(cls, hashes: np.ndarray, precision: int = HLL_PRECISION) -> 'HyperLogLog':
+        sketch = cls(precision)
+        sketch.add(hashes)
+        return sketch
+
+    def add(self, hashes: np.ndarray):
+        if self.registers is None:
+            self.hashes = np.union1d(self.hashes, hashes)
+            if len(self.hashes) > self.sparse_limit:
+                self._densify()
+        else:
+            self._update_registers(hashes)
+
+    def _densify(self):
+        self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+        self._update_registers(self.hashes)
+        self.hashes = None
+
+    def _update_registers(self, hashes: np.ndarray):
+        if not len(hashes):
+            return
+        remaining_bits = 64 - self.precision
+        index = (hashes >> np.uint64(remaining_bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << remaining_bits) - 1)
+        # Rank = position of the leftmost 1 bit in the remaining bits (remaining_bits + 1 when all zero)
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = (remaining_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Union of both sketches (neither is modified)"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        merged = HyperLogLog(self.precision)
+        if self.registers is None and other.registers is None:
+            merged.add(np.union1d(self.hashes, other.hashes))
+            return merged
+
+        merged._densify()
+        for sketch in (self, other):
+            if sketch.registers is None:
+                merged._update_registers(sketch.hashes)
+            else:
+                np.maximum(merged.registers, sketch.registers, out=merged.registers)
+        return merged
+
+    def count(self) -> int:
+        if self.registers is None:
+            return int(len(self.hashes))
+
+        m = float(len(self.registers))
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class QuantileSketch:
+    """Quantiles with bounded relative error from logarithmic bucket counts (mergeable by adding counts)"""
+
+    def __init__(self, relative_accuracy: float = QUANTILE_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.offset = 0
+        self.bins = np.zeros(0, dtype=np.int64)
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def from_values(cls, values: np.ndarray, relative_accuracy: float = QUANTILE_RELATIVE_ACCURACY) -> 'QuantileSketch':
+        sketch = cls(relative_accuracy)
+        sketch.add(values)
+        return sketch
+
+    def bucket_index(self, values: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+
+    def add(self, values: np.ndarray):
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+        positive = values[values > 0]
+        self.zero_count += int(len(values) - len(positive))
+        self.count += int(len(values))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        if len(positive):
+            indexes = self.bucket_index(positive)
+            low = int(indexes.min())
+            self._add_bins(low, np.bincount(indexes - low))
+
+    def _add_bins(self, offset: int, bins: np.ndarray):
+        if not len(self.bins):
+            self.offset, self.bins = offset, bins.astype(np.int64)
+            return
+        low = min(self.offset, offset)
+        high = max(self.offset + len(self.bins), offset + len(bins))
+        merged = np.zeros(high - low, dtype=np.int64)
+        merged[self.offset - low:self.offset - low + len(self.bins)] += self.bins
+        merged[offset - low:offset - low + len(bins)] += bins
+        self.offset, self.bins = low, merged
+
+    def merge(self, other: 'QuantileSketch') -> 'QuantileSketch':
+        """Sketch of both inputs (neither is modified)"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge quantile sketches of different accuracy")
+        merged = copy.copy(self)
+        merged.bins = self.bins.copy()
+        if len(other.bins):
+            merged._add_bins(other.offset, other.bins)
+        merged.zero_count += other.zero_count
+        merged.count += other.count
+        merged.min = min(self.min, other.min)
+        merged.max = max(self.max, other.max)
+        return merged
+
+    def quantiles(self, qs: Iterable[float]) -> List[float]:
+        """Estimated value at each quantile (values <= 0 count as 0)"""
+        qs = list(qs)
+        if not self.count:
+            return [0.0 for _ in qs]
+        cumulative = np.cumsum(self.bins)
+        results = []
+        for q in qs:
+            rank = q * (self.count - 1)
+            if rank < self.zero_count:
+                results.append(0.0)
+                continue
+            position = int(np.searchsorted(cumulative, rank - self.zero_count, side='right'))
+            value = 2 * self.gamma ** (self.offset + position) / (self.gamma + 1)
+            results.append(float(min(max(value, self.min), self.max)))
+        return results
+
+
+class CellSketch:
+    """Row count, emission sum / max, distinct count and (optionally) quantiles of one cube cell"""
+
+    def __init__(self, rows: int, total: float, maximum: float, distinct: HyperLogLog,
+                 quantiles: Optional[QuantileSketch] = None):
+        self.rows = rows
+        self.total = total
+        self.maximum = maximum
+        self.distinct = distinct
+        self.quantiles = quantiles
+
+    def merge(self, other: 'CellSketch') -> 'CellSketch':
+        return CellSketch(
+            self.rows + other.rows,
+            self.total + other.total,
+            max(self.maximum, other.maximum),
+            self.distinct.merge(other.distinct),
+            self.quantiles.merge(other.quantiles) if self.quantiles is not None and other.quantiles is not None else None
+        )
+
+
+class PartitionedSketches:
+    """Cells keyed by (dimension values..., month_index), each summarizing `distinct_column` and the emissions"""
+
+    def __init__(self, df: pd.DataFrame, dimension: Tuple[str, ...], distinct_column: str, quantiles: bool = False):
+        self.dimension = tuple(dimension)
+        self.distinct_column = distinct_column
+        self.with_quantiles = quantiles
+        self.cells: Dict[tuple, CellSketch] = self._build(df) if not df.empty else {}
+
+    def _build(self, df: pd.DataFrame) -> Dict[tuple, CellSketch]:
+        grouped = df.groupby(list(self.dimension) + ['month_index'], sort=False)
+        codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        keys = [key if isinstance(key, tuple) else (key,) for key in grouped.size().index]
+
+        # Rows with a missing dimension value have code -1 and are left out, like groupby does
+        valid = codes >= 0
+        codes = codes[valid]
+        emissions = df[MEASURE].to_numpy(dtype=float)[valid]
+        rows = np.bincount(codes, minlength=len(keys))
+        totals = np.bincount(codes, weights=emissions, minlength=len(keys))
+        maxima = np.full(len(keys), -np.inf)
+        np.maximum.at(maxima, codes, emissions)
+
+        # Distinct hashes per cell: unique (cell, hash) pairs sorted by cell, sliced per cell
+        distinct_values = df[self.distinct_column][valid]
+        present = distinct_values.notna().to_numpy()
+        pairs = pd.DataFrame({'cell': codes[present], 'hash': hash_values(distinct_values)}).drop_duplicates()
+        pairs = pairs.sort_values(['cell', 'hash'], kind='stable')
+        hash_bounds = np.searchsorted(pairs['cell'].to_numpy(), np.arange(len(keys) + 1))
+        cell_hashes = pairs['hash'].to_numpy(dtype=np.uint64)
+
+        if self.with_quantiles:
+            order = np.argsort(codes, kind='stable')
+            value_bounds = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+            sorted_emissions = emissions[order]
+
+        cells = {}
+        for i, key in enumerate(keys):
+            quantile_sketch = None
+            if self.with_quantiles:
+                quantile_sketch = QuantileSketch.from_values(sorted_emissions[value_bounds[i]:value_bounds[i + 1]])
+            cells[key] = CellSketch(
+                int(rows[i]), float(totals[i]), float(maxima[i]),
+                HyperLogLog.from_hashes(cell_hashes[hash_bounds[i]:hash_bounds[i + 1]]),
+                quantile_sketch
+            )
+        return cells
+
+    def appended(self, delta: pd.DataFrame) -> 'PartitionedSketches':
+        """Sketches over the rows plus `delta`, merging the delta's cells into the existing ones"""
+        if delta.empty:
+            return self
+        delta_sketches = PartitionedSketches(delta, self.dimension, self.distinct_column, self.with_quantiles)
+        merged = copy.copy(self)
+        merged.cells = dict(self.cells)
+        for key, cell in delta_sketches.cells.items():
+            merged.cells[key] = merged.cells[key].merge(cell) if key in merged.cells else cell
+        return merged
+
+    def months(self) -> List[int]:
+        return sorted({key[-1] for key in self.cells})
+
+    def query(self, year: int = None) -> Dict[tuple, CellSketch]:
+        """Cells merged over the months (of one year, or all of them) per dimension key"""
+        merged: Dict[tuple, CellSketch] = {}
+        for key, cell in self.cells.items():
+            if year is not None and key[-1] // 12 != year:
+                continue
+            group = key[:-1]
+            merged[group] = merged[group].merge(cell) if group in merged else cell
+        return merged
+
+    def __len__(self) -> int:
+        return len(self.cells)
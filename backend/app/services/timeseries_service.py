@@ -0,0 +1,233 @@
+"""
+Time-series layer: dense monthly series per dimension with YoY, rolling and trend operations
+"""
+import copy
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Any, Optional, Tuple, Union
+
+MEASURES = ['Emissões (tCO2e)', 'Valor']
+
+SERIES_DIMENSIONS = [
+    'parameter_category', 'Escopo', 'Categoria', 'Gás', 'Família de gás',
+    'Tecnologia', 'Unidade operacional', 'Parâmetro'
+] + [f'Hierarquia nível {level}' for level in range(1, 8)]
+
+# Relative monthly slope (fraction of the mean) beyond which a series counts as moving
+TREND_THRESHOLD = 0.01
+
+Dimension = Union[str, Tuple[str, ...]]
+
+
+def parse_month_index(periods: pd.Series, years: pd.Series) -> np.ndarray:
+    """Parse 'YYYY-MM' periods into integer month indexes (year * 12 + month - 1)"""
+    # Only the distinct periods are parsed - there are a handful per year
+    categorical = pd.Categorical(periods.astype(str))
+    parts = pd.Series(categorical.categories).str.extract(r'^(\d{4})-(\d{1,2})')
+    parsed = (pd.to_numeric(parts[0], errors='coerce') * 12 + pd.to_numeric(parts[1], errors='coerce') - 1).to_numpy()
+
+    month_index = np.append(parsed, np.nan)[categorical.codes]
+    # Unparseable periods fall back to January of 'Ano'
+    fallback = years.to_numpy(dtype=float) * 12
+    return np.where(np.isnan(month_index), fallback, month_index).astype(np.int64)
+
+
+def format_month(month_index: int) -> str:
+    return f"{month_index // 12:04d}-{month_index % 12 + 1:02d}"
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing rolling mean along the month axis (partial windows at the start)"""
+    window = max(1, window)
+    cumulative = np.cumsum(values, axis=-1)
+    shifted = np.zeros_like(cumulative)
+    shifted[..., window:] = cumulative[..., :-window]
+    periods = np.minimum(np.arange(1, values.shape[-1] + 1), window)
+    return (cumulative - shifted) / periods
+
+
+def year_over_year(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Absolute and % change against the same month one year earlier (NaN for the first year)"""
+    delta = np.full(values.shape, np.nan)
+    pct = np.full(values.shape, np.nan)
+    delta[..., 12:] = values[..., 12:] - values[..., :-12]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct[..., 12:] = np.where(values[..., :-12] != 0, delta[..., 12:] / values[..., :-12] * 100, np.nan)
+    return delta, pct
+
+
+def classify_trend(values: np.ndarray, threshold: float = TREND_THRESHOLD) -> np.ndarray:
+    """Least-squares slope per row, classified relative to the row mean"""
+    n = values.shape[-1]
+    if n < 2:
+        return np.full(values.shape[:-1], 'stable', dtype=object)
+
+    t = np.arange(n) - (n - 1) / 2
+    mean = values.mean(axis=-1)
+    slope = (values - mean[..., None]) @ t / (t @ t)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relative = np.where(mean > 0, slope / mean, 0.0)
+
+    return np.where(relative > threshold, 'increasing', np.where(relative < -threshold, 'decreasing', 'stable'))
+
+
+class MonthlySeries:
+    """Dense keys x months matrices for one dimension"""
+
+    def __init__(self, keys: List[Any], values: Dict[str, np.ndarray], counts: np.ndarray):
+        self.keys = keys
+        self.values = values
+        self.counts = counts
+        self.positions = {key: i for i, key in enumerate(keys)}
+
+
+class TimeSeriesIndex:
+    """Precomputed monthly series over the dataset's integer month index"""
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+        self._months = df['month_index'].to_numpy()
+        self.first_month = int(self._months.min()) if len(self._months) else 0
+        self.n_months = int(self._months.max()) - self.first_month + 1 if len(self._months) else 0
+        self._series: Dict[Dimension, MonthlySeries] = {}
+
+    def series(self, dimension: Dimension) -> MonthlySeries:
+        """Dense monthly series per key of a dimension (or tuple of dimensions), built once"""
+        if dimension not in self._series:
+            self._series[dimension] = self._build(dimension)
+        return self._series[dimension]
+
+    def built_dimensions(self) -> List[Dimension]:
+        return list(self._series)
+
+    def _build(self, dimension: Dimension) -> MonthlySeries:
+        cols = list(dimension) if isinstance(dimension, tuple) else [dimension]
+        grouped = self._df.groupby(cols, sort=True)
+        codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        keys = list(grouped.size().index)
+
+        valid = codes >= 0
+        flat = codes[valid] * self.n_months + (self._months[valid] - self.first_month)
+        size = len(keys) * self.n_months
+
+        values = {
+            measure: np.bincount(
+                flat, weights=self._df[measure].to_numpy(dtype=float)[valid], minlength=size
+            ).reshape(len(keys), self.n_months)
+            for measure in MEASURES
+        }
+        counts = np.bincount(flat, minlength=size).reshape(len(keys), self.n_months)
+        return MonthlySeries(keys, values, counts)
+
+    def appended(self, df: pd.DataFrame, delta: pd.DataFrame) -> 'TimeSeriesIndex':
+        """Index over `df` (the indexed rows followed by `delta`) with every built series updated from the delta"""
+        if not self.n_months:
+            return TimeSeriesIndex(df)
+        if delta.empty:
+            index = copy.copy(self)
+            index._df = df
+            index._months = df['month_index'].to_numpy()
+            return index
+
+        delta_index = TimeSeriesIndex(delta)
+        index = copy.copy(self)
+        index._df = df
+        index._months = df['month_index'].to_numpy()
+        index.first_month = min(self.first_month, delta_index.first_month)
+        last_month = max(self.first_month + self.n_months, delta_index.first_month + delta_index.n_months)
+        index.n_months = last_month - index.first_month
+        index._series = {
+            dimension: index._merge_series(
+                (series, self.first_month), (delta_index.series(dimension), delta_index.first_month)
+            )
+            for dimension, series in self._series.items()
+        }
+        return index
+
+    def _merge_series(self, *parts: Tuple[MonthlySeries, int]) -> MonthlySeries:
+        """Sum (series, first month) parts onto this index's month axis; keys stay sorted like _build"""
+        keys = list(dict.fromkeys(key for series, _ in parts for key in series.keys))
+        try:
+            keys = sorted(keys)
+        except TypeError:
+            pass  # mixed key types keep first-appearance order
+        positions = {key: i for i, key in enumerate(keys)}
+
+        values = {measure: np.zeros((len(keys), self.n_months)) for measure in MEASURES}
+        counts = np.zeros((len(keys), self.n_months), dtype=np.int64)
+        for series, first_month in parts:
+            rows = np.array([positions[key] for key in series.keys], dtype=np.int64)
+            start = first_month - self.first_month
+            columns = slice(start, start + series.counts.shape[1])
+            for measure in MEASURES:
+                values[measure][rows, columns] += series.values[measure]
+            counts[rows, columns] += series.counts
+        return MonthlySeries(keys, values, counts)
+
+    def month_range(self, year: Optional[int] = None) -> slice:
+        """Column slice covering a calendar year (or every month when year is None)"""
+        if year is None:
+            return slice(0, self.n_months)
+        start = min(max(year * 12 - self.first_month, 0), self.n_months)
+        stop = min(max(year * 12 + 12 - self.first_month, 0), self.n_months)
+        return slice(start, stop)
+
+    def month_labels(self, months: slice = None) -> List[str]:
+        months = months or self.month_range()
+        return [format_month(self.first_month + i) for i in range(months.start, months.stop)]
+
+    def years(self) -> List[int]:
+        first_year = self.first_month // 12
+        last_year = (self.first_month + self.n_months - 1) // 12
+        return list(range(first_year, last_year + 1)) if self.n_months else []
+
+    def totals(self, dimension: Dimension, year: Optional[int] = None,
+               measure: str = 'Emissões (tCO2e)') -> Dict[Any, float]:
+        series = self.series(dimension)
+        sums = series.values[measure][:, self.month_range(year)].sum(axis=1)
+        return {key: float(total) for key, total in zip(series.keys, sums)}
+
+    def trends(self, dimension: Dimension, year: Optional[int] = None,
+               measure: str = 'Emissões (tCO2e)') -> Dict[Any, str]:
+        """Slope-based trend classification for every key of a dimension"""
+        series = self.series(dimension)
+        labels = classify_trend(series.values[measure][:, self.month_range(year)])
+        return dict(zip(series.keys, labels.tolist()))
+
+    def describe(self, dimension: Dimension, year: Optional[int] = None, window: int = 3,
+                 measure: str = 'Emissões (tCO2e)') -> Dict[str, Any]:
+        """Monthly values, rolling average, YoY deltas and trend for every key"""
+        series = self.series(dimension)
+        months = self.month_range(year)
+
+        # YoY needs the previous year even when only one year is requested
+        full = series.values[measure]
+        rolling = rolling_mean(full, window)[:, months]
+        delta, pct = year_over_year(full)
+        delta, pct = delta[:, months], pct[:, months]
+        values = full[:, months]
+        trends = classify_trend(values)
+
+        total = values.sum(axis=0)
+        return {
+            'periods': self.month_labels(months),
+            'series': {
+                str(key): {
+                    'values': values[i].tolist(),
+                    'rolling_average': rolling[i].tolist(),
+                    'yoy_delta': _nan_to_none(delta[i]),
+                    'yoy_percentage': _nan_to_none(pct[i]),
+                    'trend': trends[i]
+                }
+                for i, key in enumerate(series.keys)
+            },
+            'total': {
+                'values': total.tolist(),
+                'rolling_average': rolling_mean(full.sum(axis=0), window)[months].tolist(),
+                'trend': str(classify_trend(total))
+            }
+        }
+
+
+def _nan_to_none(values: np.ndarray) -> List[Optional[float]]:
+    return [None if np.isnan(value) else value for value in values.tolist()]
@@ -0,0 +1,224 @@
+"""
+Startup warm-up: load the datasets and precompute the default chart payloads in the background
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Any, Optional
+
+from app.services.data_service import EmissionsDataService
+from app.services.dataset_registry import dataset_registry, DatasetRegistry, DEFAULT_TENANT
+from app.utils.metrics import metrics
+
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1').lower() in ('1', 'true', 'yes')
+# /ready reports 503 until warm-up has finished (otherwise only until the default dataset is loaded)
+READINESS_WAITS_FOR_WARMUP = os.environ.get('READINESS_WAITS_FOR_WARMUP', '').lower() in ('1', 'true', 'yes')
+WARMUP_TENANTS = [tenant.strip() for tenant in os.environ.get('WARMUP_TENANTS', DEFAULT_TENANT).split(',') if tenant.strip()]
+# Optional JSON list of {"route": ..., "params": {...}} replacing DEFAULT_WARMUP_TARGETS
+WARMUP_TARGETS_FILE = os.environ.get('WARMUP_TARGETS_FILE')
+# Route request counts are kept across restarts so the first warm-up after a deploy is prioritized too
+WARMUP_FREQUENCY_FILE = os.environ.get('WARMUP_FREQUENCY_FILE', '.warmup_frequencies.json')
+
+ROUTE_PREFIX = '/api/data'
+
+# Route -> (service method, query parameter -> method argument renames)
+ROUTE_METHODS = {
+    '/api/data/emissions': ('get_emissions_by_scope', {}),
+    '/api/data/emissions/parameters': ('get_emissions_by_parameter', {}),
+    '/api/data/emissions/hierarchy': ('get_emissions_by_hierarchy', {}),
+    '/api/data/summary': ('get_summary_stats', {}),
+    '/api/data/emissions/top-parameters': ('get_top_emission_parameters', {}),
+    '/api/data/emissions/top': ('get_top_n', {'others': 'include_others'}),
+    '/api/data/emissions/time-series': ('get_time_series', {}),
+    '/api/data/emissions/hierarchy-treemap': ('get_hierarchy_treemap_data', {}),
+    '/api/data/emissions/transportation': ('get_transportation_emissions', {}),
+    '/api/data/emissions/scope-category': ('get_emissions_by_scope_category', {}),
+    '/api/data/emissions/gas-breakdown': ('get_gas_emissions_breakdown', {}),
+    '/api/data/emissions/hierarchical-heatmap': ('get_hierarchical_emissions_heatmap', {}),
+    '/api/data/emissions/operational-performance': ('get_operational_performance', {}),
+    '/api/data/emissions/process-technology-analysis': ('get_process_technology_analysis', {}),
+    '/api/data/emissions/flows': ('get_emissions_flows', {}),
+    '/api/data/emissions/hierarchical-intelligence': ('get_hierarchical_intelligence', {})
+}
+
+# The variants the dashboard pages request on load (ChartProposals.js, Dashboard.js, EnvironmentalTab.js)
+DEFAULT_WARMUP_TARGETS = [
+    {'route': '/api/data/summary', 'params': {}},
+    {'route': '/api/data/emissions/operational-performance', 'params': {'year': 2023, 'limit': 15}},
+    {'route': '/api/data/emissions/process-technology-analysis', 'params': {}},
+    {'route': '/api/data/emissions/hierarchical-intelligence', 'params': {'level': 1, 'year': 2023}},
+    {'route': '/api/data/emissions/scope-category', 'params': {'year': 2023}},
+    {'route': '/api/data/emissions/gas-breakdown', 'params': {'year': 2023}},
+    {'route': '/api/data/emissions/hierarchical-heatmap', 'params': {'year': 2023}},
+    {'route': '/api/data/emissions/top-parameters', 'params': {'limit': 15}},
+    {'route': '/api/data/emissions/hierarchy-treemap', 'params': {'level': 3}},
+    {'route': '/api/data/emissions/transportation', 'params': {}},
+    {'route': '/api/data/emissions', 'params': {}},
+    {'route': '/api/data/emissions/parameters', 'params': {'limit': 10}}
+]
+
+
+def load_targets(path: Optional[str] = WARMUP_TARGETS_FILE) -> List[Dict[str, Any]]:
+    """Declared warm-up targets (file override or the defaults), unknown routes dropped"""
+    targets = DEFAULT_WARMUP_TARGETS
+    if path:
+        try:
+            with open(path, encoding='utf-8') as f:
+                targets = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not read warm-up targets from {path}: {e}")
+    valid = []
+    for target in targets:
+        if target.get('route') in ROUTE_METHODS:
+            valid.append({'route': target['route'], 'params': dict(target.get('params') or {})})
+        else:
+            print(f"Warning: skipping warm-up target for unknown route {target.get('route')}")
+    return valid
+
+
+def _route_count(frequencies: Dict[str, int], route: str) -> int:
+    # Route labels are the matched route templates, which newer FastAPI releases report relative to the router prefix
+    relative = route[len(ROUTE_PREFIX):] or '/'
+    return frequencies.get(route, 0) + (frequencies.get(relative, 0) if relative != route else 0)
+
+
+def _service_call(service: EmissionsDataService, target: Dict[str, Any]) -> Any:
+    method, renames = ROUTE_METHODS[target['route']]
+    params = {renames.get(name, name): value for name, value in target['params'].items()}
+    if method == 'get_emissions_flows' and isinstance(params.get('stages'), str):
+        params['stages'] = [stage.strip() for stage in params['stages'].split(',') if stage.strip()]
+    return getattr(service, method)(**params)
+
+
+class WarmupRunner:
+    """Background thread computing the declared payloads per tenant, most requested routes first"""
+
+    def __init__(self, registry: DatasetRegistry = dataset_registry, tenants: List[str] = None,
+                 frequency_file: Optional[str] = WARMUP_FREQUENCY_FILE):
+        self.registry = registry
+        self.tenants = tenants or WARMUP_TENANTS
+        self.frequency_file = frequency_file
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._state: Dict[str, Any] = {'status': 'idle', 'tenants': {}}
+
+    def start(self, targets: List[Dict[str, Any]] = None) -> bool:
+        """Start a warm-up run unless one is already running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._state = {'status': 'running', 'started_at': time.time(), 'tenants': {}}
+            self._thread = threading.Thread(
+                target=self._run, args=(targets or load_targets(),), name='warmup', daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return json.loads(json.dumps(self._state, default=str))
+
+    def is_finished(self) -> bool:
+        with self._lock:
+            return self._state['status'] in ('done', 'failed')
+
+    def is_warming(self, tenant: str) -> bool:
+        """Whether a running warm-up has yet to finish the tenant (queued, loading, indexing or warming it)"""
+        with self._lock:
+            if self._state['status'] != 'running' or tenant not in self.tenants:
+                return False
+            state = self._state['tenants'].get(tenant)
+            return state is None or state['status'] not in ('done', 'failed')
+
+    def is_data_ready(self) -> bool:
+        """The first warm-up tenant (the default) has its dataset loaded"""
+        tenant = self.tenants[0] if self.tenants else self.registry.default_tenant
+        with self._lock:
+            state = self._state['tenants'].get(tenant)
+        return bool(state and state.get('load_seconds') is not None)
+
+    def prioritized(self, targets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Targets ordered by observed request frequency (saved + this process), declared order on ties"""
+        frequencies = self.saved_frequencies()
+        for route, count in metrics.route_frequencies().items():
+            frequencies[route] = frequencies.get(route, 0) + count
+        ranked = sorted(
+            enumerate(targets), key=lambda item: (-_route_count(frequencies, item[1]['route']), item[0])
+        )
+        return [target for _, target in ranked]
+
+    def warm_service(self, service: EmissionsDataService, targets: List[Dict[str, Any]] = None,
+                     tenant_state: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Compute every target payload on a service (also used by ingestion before go-live)"""
+        state = tenant_state if tenant_state is not None else {}
+        state.setdefault('targets', [])
+        for target in self.prioritized(targets if targets is not None else load_targets()):
+            result = {'route': target['route'], 'params': target['params']}
+            start = time.perf_counter()
+            try:
+                _service_call(service, target)
+                result['status'] = 'cached'
+            except Exception as e:
+                result['status'] = 'failed'
+                result['error'] = f"{type(e).__name__}: {e}"
+            result['seconds'] = time.perf_counter() - start
+            with self._lock:
+                state['targets'].append(result)
+        return state
+
+    def _run(self, targets: List[Dict[str, Any]]):
+        failed = False
+        for tenant in self.tenants:
+            tenant_state: Dict[str, Any] = {'status': 'loading', 'load_seconds': None, 'targets': []}
+            with self._lock:
+                self._state['tenants'][tenant] = tenant_state
+            try:
+                start = time.perf_counter()
+                service = self.registry.get(tenant)
+                with self._lock:
+                    tenant_state['load_seconds'] = time.perf_counter() - start
+                    tenant_state['status'] = 'indexing'
+                start = time.perf_counter()
+                service.build_indexes()
+                with self._lock:
+                    tenant_state['index_seconds'] = time.perf_counter() - start
+                    tenant_state['status'] = 'warming'
+                self.warm_service(service, targets, tenant_state)
+                status = 'done'
+            except Exception as e:
+                failed = True
+                status = 'failed'
+                tenant_state['error'] = f"{type(e).__name__}: {e}"
+            with self._lock:
+                tenant_state['status'] = status
+
+        with self._lock:
+            self._state['status'] = 'failed' if failed else 'done'
+            self._state['seconds'] = time.time() - self._state['started_at']
+
+    def saved_frequencies(self) -> Dict[str, int]:
+        if not self.frequency_file:
+            return {}
+        try:
+            with open(self.frequency_file, encoding='utf-8') as f:
+                return {str(route): int(count) for route, count in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def save_frequencies(self):
+        """Add this process' route counts to the saved ones (called at shutdown)"""
+        if not self.frequency_file:
+            return
+        frequencies = self.saved_frequencies()
+        for route, count in metrics.route_frequencies().items():
+            frequencies[route] = frequencies.get(route, 0) + count
+        try:
+            with open(self.frequency_file, 'w', encoding='utf-8') as f:
+                json.dump(frequencies, f, indent=2, ensure_ascii=False)
+        except OSError as e:
+            print(f"Warning: could not save route frequencies to {self.frequency_file}: {e}")
+
+
+# Global instance
+warmup_runner = WarmupRunner()
@@ -0,0 +1 @@
+# Utilities package for ESG Dashboard 
\ No newline at end of file
@@ -0,0 +1,287 @@
+"""
+Admission control: per-endpoint cost classes with concurrency caps, bounded queues and deadline-aware shedding
+"""
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.metrics import Histogram, LATENCY_BUCKETS, metrics
+
+ADMISSION_ENABLED = os.environ.get('ADMISSION_CONTROL', '1').lower() in ('1', 'true', 'yes')
+
+# Time a request may spend queued + running unless it sends X-Request-Budget (seconds)
+DEFAULT_REQUEST_BUDGET = float(os.environ.get('REQUEST_BUDGET_SECONDS', '10'))
+
+# Weight of the latest duration in the per-class running estimate
+DURATION_SMOOTHING = 0.2
+
+# Longest a gated request waits for its tenant's dataset to load and warm - outside its slot and its budget
+DATASET_LOAD_WAIT = float(os.environ.get('ADMISSION_LOAD_WAIT_SECONDS', '120'))
+READY_POLL_SECONDS = 0.05
+
+# Chart endpoints that scan or group the full frame when their payload is not cached
+HEAVY_ROUTES = {
+    '/api/data/emissions/hierarchy-treemap',
+    '/api/data/emissions/hierarchical-heatmap',
+    '/api/data/emissions/operational-performance',
+    '/api/data/emissions/process-technology-analysis',
+    '/api/data/emissions/transportation',
+    '/api/data/emissions/flows',
+    '/api/data/scenarios/simulate',
+    '/api/data/reports/export'
+}
+
+# Cheap routes are never queued: they must answer while the heavy ones are saturated
+CHEAP_ROUTES = {
+    '/api/data/summary',
+    '/api/data/health',
+    '/api/data/search',
+    '/api/data/factor-sets'
+}
+
+GATED_PREFIX = '/api/data/'
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+class CostClass:
+    """Concurrency cap plus a bounded FIFO of waiting requests for one class of endpoints"""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, expected_seconds: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        # Running estimate of how long an admitted request holds its slot
+        self.expected_seconds = expected_seconds
+        self.active = 0
+        self.admitted = 0
+        self.rejected: Dict[str, int] = {'queue_full': 0, 'deadline': 0, 'timeout': 0}
+        self._waiters: deque = deque()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self) -> float:
+        """Seconds a request arriving now would wait for a slot"""
+        if self.active < self.concurrency and not self._waiters:
+            return 0.0
+        return (len(self._waiters) // self.concurrency + 1) * self.expected_seconds
+
+    async def acquire(self, budget: float) -> Optional[float]:
+        """Take a slot, waiting at most `budget` seconds; returns None when admitted, else a retry-after delay"""
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return None
+
+        wait = self.estimated_wait()
+        if len(self._waiters) >= self.queue_size:
+            self.rejected['queue_full'] += 1
+            return wait
+        if wait > budget:
+            # Fail fast instead of holding the request until the client gives up
+            self.rejected['deadline'] += 1
+            return wait
+
+        slot = asyncio.get_running_loop().create_future()
+        self._waiters.append(slot)
+        try:
+            await asyncio.wait({slot}, timeout=budget)
+        except asyncio.CancelledError:
+            self._abandon(slot)
+            raise
+        if slot.done():
+            self.admitted += 1
+            return None
+        self._abandon(slot)
+        self.rejected['timeout'] += 1
+        return self.estimated_wait()
+
+    def _abandon(self, slot: asyncio.Future):
+        if slot.done() and not slot.cancelled():
+            # The slot was handed over just as the waiter gave up - pass it on
+            self.release()
+            return
+        slot.cancel()
+        try:
+            self._waiters.remove(slot)
+        except ValueError:
+            pass
+
+    def release(self, duration: float = None):
+        """Free a slot, handing it straight to the oldest waiter"""
+        if duration is not None:
+            self.expected_seconds += DURATION_SMOOTHING * (duration - self.expected_seconds)
+        self.active -= 1
+        while self._waiters:
+            slot = self._waiters.popleft()
+            if not slot.done():
+                self.active += 1
+                slot.set_result(True)
+                break
+
+    def describe(self) -> Dict[str, object]:
+        return {
+            'class': self.name,
+            'concurrency': self.concurrency,
+            'queue_size': self.queue_size,
+            'active': self.active,
+            'queue_depth': self.queue_depth,
+            'expected_seconds': round(self.expected_seconds, 4),
+            'admitted': self.admitted,
+            'rejected': dict(self.rejected)
+        }
+
+
+class AdmissionController:
+    """Routes requests to their cost class (None = cheap, never queued) and exports queue metrics"""
+
+    def __init__(self):
+        self.classes = {
+            'heavy': CostClass('heavy', _env_int('ADMISSION_HEAVY_CONCURRENCY', 2), _env_int('ADMISSION_HEAVY_QUEUE', 16), 1.0),
+            'standard': CostClass('standard', _env_int('ADMISSION_STANDARD_CONCURRENCY', 8), _env_int('ADMISSION_STANDARD_QUEUE', 64), 0.2)
+        }
+        self.queue_wait = Histogram(
+            'admission_queue_wait_seconds', 'Time admitted requests waited for a slot by cost class', LATENCY_BUCKETS
+        )
+
+    def classify(self, path: str) -> Optional[CostClass]:
+        path = path.rstrip('/') or '/'
+        if path in HEAVY_ROUTES:
+            return self.classes['heavy']
+        if path in CHEAP_ROUTES or not path.startswith(GATED_PREFIX):
+            return None
+        return self.classes['standard']
+
+    def describe(self) -> List[Dict[str, object]]:
+        return [cost.describe() for cost in self.classes.values()]
+
+    def render_metrics(self) -> List[str]:
+        """Exposition lines for the metrics registry (queue depth, active, limits, rejections, waits)"""
+        gauges = [
+            ('admission_queue_depth', 'Requests waiting for a slot by cost class', lambda cost: cost.queue_depth),
+            ('admission_active_requests', 'Requests holding a slot by cost class', lambda cost: cost.active),
+            ('admission_concurrency_limit', 'Slots per cost class', lambda cost: cost.concurrency),
+            ('admission_queue_limit', 'Queue capacity per cost class', lambda cost: cost.queue_size),
+            ('admission_expected_seconds', 'Running estimate of slot hold time by cost class', lambda cost: cost.expected_seconds)
+        ]
+        lines = []
+        for name, help_text, value in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            lines += [f'{name}{{class="{cost.name}"}} {value(cost)}' for cost in self.classes.values()]
+        lines += ["# HELP admission_rejected_total Requests shed with 503 by cost class and reason",
+                  "# TYPE admission_rejected_total counter"]
+        for cost in self.classes.values():
+            lines += [
+                f'admission_rejected_total{{class="{cost.name}",reason="{reason}"}} {count}'
+                for reason, count in cost.rejected.items()
+            ]
+        return lines + self.queue_wait.render()
+
+
+def _request_budget(scope) -> float:
+    for name, value in scope.get('headers', []):
+        if name == b'x-request-budget':
+            try:
+                return max(float(value), 0.0)
+            except ValueError:
+                break
+    return DEFAULT_REQUEST_BUDGET
+
+
+def _tenant(scope) -> Optional[str]:
+    values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('tenant')
+    return values[0] if values else None
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware queueing gated routes per cost class and shedding with 503 + Retry-After
+
+    With a dataset `registry`, a gated request is held until its tenant is ready - warmed when
+    `warming(tenant)` says a warm-up is on it, else loaded (the load starts here) - before it takes
+    a slot, so neither the load nor the warm-up counts toward its budget or the hold-time estimates.
+    """
+
+    def __init__(self, app, controller: 'AdmissionController' = None, enabled: bool = ADMISSION_ENABLED,
+                 registry=None, warming: Callable[[str], bool] = None):
+        self.app = app
+        self.controller = controller or admission_controller
+        self.enabled = enabled
+        self.registry = registry
+        self.warming = warming
+        self._loads: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        cost = self.controller.classify(scope['path']) if self.enabled and scope['type'] == 'http' else None
+        if cost is None:
+            await self.app(scope, receive, send)
+            return
+
+        if self.registry is not None:
+            await self._wait_until_ready(_tenant(scope) or self.registry.default_tenant)
+
+        start = time.perf_counter()
+        retry_after = await cost.acquire(_request_budget(scope))
+        if retry_after is not None:
+            await self._reject(send, cost, retry_after)
+            return
+
+        admitted = time.perf_counter()
+        self.controller.queue_wait.observe(admitted - start, **{'class': cost.name})
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            cost.release(time.perf_counter() - admitted)
+
+    async def _wait_until_ready(self, tenant: str):
+        deadline = time.perf_counter() + DATASET_LOAD_WAIT
+        # The warm-up precomputes the default payloads in about a second once loaded - wait rather than race it
+        while self.warming is not None and self.warming(tenant) and time.perf_counter() < deadline:
+            await asyncio.sleep(READY_POLL_SECONDS)
+
+        try:
+            if self.registry.is_loaded(tenant):
+                return
+        except KeyError:
+            # Unknown tenant: the route answers 404
+            return
+
+        load = self._loads.get(tenant)
+        if load is None:
+            # One load per tenant; the registry also serializes it against a concurrent warm-up
+            load = self._loads[tenant] = asyncio.ensure_future(run_in_threadpool(self.registry.get, tenant))
+            load.add_done_callback(lambda _: self._loads.pop(tenant, None))
+        try:
+            await asyncio.wait_for(asyncio.shield(load), max(deadline - time.perf_counter(), 0.0))
+        except Exception:
+            # A failed or slow load surfaces through the route itself
+            pass
+
+    @staticmethod
+    async def _reject(send, cost: CostClass, retry_after: float):
+        body = json.dumps({'detail': f"Server busy ({cost.name} requests), retry later"}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(max(1, math.ceil(retry_after))).encode())
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+
+# Global instance
+admission_controller = AdmissionController()
+metrics.register_collector(admission_controller.render_metrics)
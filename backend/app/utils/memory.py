@@ -0,0 +1,303 @@
+"""
+Memory accounting: byte counts for the dataset and derived structures, tracemalloc allocation tracing
+"""
+import contextlib
+import functools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Any, Callable, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+MEMORY_TRACING_ENABLED = os.environ.get('ENABLE_MEMORY_TRACING', '').lower() in ('1', 'true', 'yes')
+
+# One frame per allocation keeps the tracemalloc overhead low - only totals are reported
+TRACEMALLOC_FRAMES = 1
+
+
+def start_tracing():
+    """Start tracemalloc (no-op when it is already running)"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+
+def is_tracing() -> bool:
+    return tracemalloc.is_tracing()
+
+
+class AllocationStats:
+    """Allocation totals of traced load phases and service methods"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases: Dict[str, Dict[str, Any]] = {}
+        self._methods: Dict[str, Dict[str, Any]] = {}
+
+    def record_phase(self, name: str, trace: Dict[str, Any]):
+        if not trace:
+            return
+        with self._lock:
+            self._phases[name] = dict(trace)
+
+    def record_method(self, name: str, trace: Dict[str, Any]):
+        with self._lock:
+            stats = self._methods.get(name)
+            if stats is None:
+                stats = self._methods[name] = {
+                    'calls': 0, 'skipped': 0, 'net_bytes_total': 0, 'net_bytes_max': 0, 'peak_bytes_max': 0,
+                    'last': None
+                }
+            if not trace:
+                # Another thread was measuring - see trace_allocations
+                stats['skipped'] += 1
+                return
+            stats['calls'] += 1
+            stats['net_bytes_total'] += trace['net_bytes']
+            stats['net_bytes_max'] = max(stats['net_bytes_max'], trace['net_bytes'])
+            stats['peak_bytes_max'] = max(stats['peak_bytes_max'], trace['peak_bytes'])
+            stats['last'] = dict(trace)
+
+    def phases(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: dict(trace) for name, trace in self._phases.items()}
+
+    def methods(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            methods = {name: dict(stats) for name, stats in self._methods.items()}
+        return dict(sorted(methods.items(), key=lambda item: -item[1]['peak_bytes_max']))
+
+    def clear_methods(self):
+        with self._lock:
+            self._methods = {}
+
+
+allocation_stats = AllocationStats()
+
+_trace_frames = threading.local()
+# tracemalloc's peak counter is process-wide: one thread measures at a time (held without blocking, see below)
+_trace_owner = threading.Lock()
+
+
+@contextlib.contextmanager
+def trace_allocations():
+    """Measure net and peak traced allocation of a block, relative to its start
+
+    Yields a dict that is filled on exit with 'net_bytes' (still allocated at the end - caches and
+    returned payloads), 'peak_bytes' (highest point above the start) and 'seconds'. Nested blocks keep
+    the enclosing block's peak intact. tracemalloc counters (and reset_peak) are process-wide, so only one
+    thread measures at a time: a block that starts while another thread is measuring runs unmeasured
+    (the dict stays empty) rather than waiting or resetting the other block's peak. Allocations by
+    untraced code running concurrently are still included.
+    """
+    trace: Dict[str, Any] = {}
+    if not tracemalloc.is_tracing():
+        yield trace
+        return
+
+    if getattr(_trace_frames, 'stack', None):
+        # Nested in a block this thread is already measuring
+        yield from _traced_block(trace)
+        return
+
+    if not _trace_owner.acquire(blocking=False):
+        yield trace
+        return
+    try:
+        yield from _traced_block(trace)
+    finally:
+        _trace_owner.release()
+
+
+def _traced_block(trace: Dict[str, Any]):
+    stack = getattr(_trace_frames, 'stack', None)
+    if stack is None:
+        stack = _trace_frames.stack = []
+
+    current, peak = tracemalloc.get_traced_memory()
+    if stack:
+        # reset_peak() below would lose the enclosing block's peak so far
+        stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+    tracemalloc.reset_peak()
+    frame = {'start': current, 'peak': current}
+    stack.append(frame)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        stack.pop()
+        current, peak = tracemalloc.get_traced_memory()
+        peak = max(peak, frame['peak'])
+        trace.update({
+            'net_bytes': current - frame['start'],
+            'peak_bytes': peak - frame['start'],
+            'seconds': time.perf_counter() - start
+        })
+        if stack:
+            stack[-1]['peak'] = max(stack[-1]['peak'], peak)
+
+
+def traced_phase(func: Callable) -> Callable:
+    """Record the allocation trace of each call as a named phase (latest call wins)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not tracemalloc.is_tracing():
+            return func(*args, **kwargs)
+        with trace_allocations() as trace:
+            result = func(*args, **kwargs)
+        allocation_stats.record_phase(func.__name__, trace)
+        return result
+
+    return wrapper
+
+
+def traced_service_method(func: Callable) -> Callable:
+    """Accumulate per-call allocation deltas of a service method while tracing is on"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not tracemalloc.is_tracing():
+            return func(*args, **kwargs)
+        with trace_allocations() as trace:
+            result = func(*args, **kwargs)
+        allocation_stats.record_method(func.__name__, trace)
+        return result
+
+    return wrapper
+
+
+def trace_methods(*prefixes: str):
+    """Class decorator tracing allocations of every method whose name starts with one of `prefixes`"""
+    def decorator(cls):
+        for name, attribute in list(vars(cls).items()):
+            if callable(attribute) and name.startswith(prefixes):
+                setattr(cls, name, traced_service_method(attribute))
+        return cls
+    return decorator
+
+
+def dataframe_memory(df: pd.DataFrame) -> Dict[str, Any]:
+    """Deep byte count per column (largest first), plus the index"""
+    usage = df.memory_usage(deep=True)
+    columns = {
+        str(col): {'dtype': str(df[col].dtype), 'bytes': int(usage[col])}
+        for col in sorted(df.columns, key=lambda col: -usage[col])
+    }
+    return {
+        'rows': int(len(df)),
+        'total_bytes': int(usage.sum()),
+        'index_bytes': int(usage['Index']),
+        'columns': columns
+    }
+
+
+def _arrow_buffers(values) -> Set[int]:
+    """Addresses of the Arrow buffers behind an Arrow-backed array (e.g. pandas 3 string columns)"""
+    chunks = values._pa_array.chunks
+    return {buffer.address for chunk in chunks for buffer in chunk.buffers() if buffer is not None and buffer.size}
+
+
+def _shares_memory(left: pd.Series, right: pd.Series) -> bool:
+    """Whether two columns are backed by the same buffer (e.g. lazy copies under copy-on-write)"""
+    try:
+        if hasattr(left.array, '_pa_array') and hasattr(right.array, '_pa_array'):
+            # np.asarray would convert (copy) Arrow data
+            return bool(_arrow_buffers(left.array) & _arrow_buffers(right.array))
+        return np.may_share_memory(np.asarray(left.array), np.asarray(right.array))
+    except Exception:
+        return False
+
+
+def _root_array(array: np.ndarray) -> np.ndarray:
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def frame_buffers(df: pd.DataFrame) -> Set[int]:
+    """Ids of the arrays owning a frame's column buffers, to pre-seed `deep_size`"""
+    buffers = {id(df)}
+    for col in df.columns:
+        try:
+            array = np.asarray(df[col].array)
+        except Exception:
+            continue
+        # Only views point at a buffer the frame keeps alive - a fresh conversion would be freed
+        if array.base is not None:
+            buffers.add(id(_root_array(array)))
+    return buffers
+
+
+def frame_bytes(df: pd.DataFrame, base: pd.DataFrame = None) -> int:
+    """Deep size of a frame, leaving out columns whose buffers are shared with `base`"""
+    usage = df.memory_usage(deep=True)
+    total = int(usage['Index'])
+    for col in df.columns:
+        if base is not None and col in base.columns and _shares_memory(df[col], base[col]):
+            continue
+        total += int(usage[col])
+    return total
+
+
+def deep_size(obj: Any, seen: Optional[Set[int]] = None) -> int:
+    """Approximate retained bytes of an object graph; objects in `seen` are not counted again"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, pd.DataFrame):
+        return frame_bytes(obj)
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        # Views are charged once, to the array that owns the buffer
+        root = _root_array(obj)
+        if root is not obj:
+            if id(root) in seen:
+                return 0
+            seen.add(id(root))
+        size = root.nbytes
+        if root.dtype == object:
+            size += sum(deep_size(item, seen) for item in root.ravel())
+        return size
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(item, seen) for item in obj)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        size += deep_size(vars(obj), seen)
+    return size
+
+
+def process_memory() -> Dict[str, Any]:
+    """Process-level figures: peak RSS and the current / peak traced totals"""
+    info: Dict[str, Any] = {'tracing': tracemalloc.is_tracing()}
+    if resource is not None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        info['max_rss_bytes'] = int(max_rss if sys.platform == 'darwin' else max_rss * 1024)
+    if tracemalloc.is_tracing():
+        info['traced_current_bytes'] = tracemalloc.get_traced_memory()[0]
+        info['traced_overhead_bytes'] = tracemalloc.get_tracemalloc_memory()
+    return info
+
+
+def memory_report(service) -> Dict[str, Any]:
+    """Dataset columns, derived structures, load phases and per-method allocation deltas"""
+    return {
+        'process': process_memory(),
+        'dataset': dataframe_memory(service.df),
+        'structures': service.describe_memory(),
+        'load': allocation_stats.phases(),
+        'methods': allocation_stats.methods()
+    }
@@ -0,0 +1,262 @@
+"""
+Low-overhead request / service metrics exposed in Prometheus text format
+"""
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from typing import Dict, List, Tuple, Callable, Optional
+
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+SIZE_BUCKETS = [100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Prometheus-style histogram keyed by label set"""
+
+    def __init__(self, name: str, help_text: str, buckets: List[float]):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series: Dict[LabelKey, List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[LabelKey, Tuple[List[int], float, int]]:
+        with self._lock:
+            return {key: (list(series[0]), series[1], series[2]) for key, series in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + [float('inf')], counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+
+class Gauge:
+    """Gauge keyed by label set"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def set_all(self, values: Dict[LabelKey, float]):
+        """Replace every series at once; series missing from `values` drop to 0 (not removed)"""
+        with self._lock:
+            self._values = {**dict.fromkeys(self._values, 0), **values}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(key)} {value}" for key, value in values)
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(key: LabelKey) -> str:
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in key) + '}'
+
+
+class MetricsRegistry:
+    """All application metrics"""
+
+    def __init__(self):
+        self.request_duration = Histogram(
+            'http_request_duration_seconds', 'HTTP request latency by route and status', LATENCY_BUCKETS
+        )
+        self.request_size = Histogram(
+            'http_request_size_bytes', 'HTTP request body size by route', SIZE_BUCKETS
+        )
+        self.response_size = Histogram(
+            'http_response_size_bytes', 'HTTP response body size by route and status', SIZE_BUCKETS
+        )
+        self.request_overhead = Histogram(
+            'http_request_overhead_seconds',
+            'Request time spent outside data service methods (validation, serialization, framework)',
+            LATENCY_BUCKETS
+        )
+        self.service_duration = Histogram(
+            'service_method_duration_seconds', 'Time spent inside EmissionsDataService methods', LATENCY_BUCKETS
+        )
+        self.in_flight = Gauge('http_requests_in_flight', 'Requests currently being processed by route')
+        self._collectors: List[Callable[[], List[str]]] = []
+        # Scopes of the requests in flight: the router fills in their route once it has matched one
+        self._active_lock = threading.Lock()
+        self._active: Dict[int, dict] = {}
+
+    def track(self, scope: dict):
+        with self._active_lock:
+            self._active[id(scope)] = scope
+
+    def untrack(self, scope: dict):
+        with self._active_lock:
+            self._active.pop(id(scope), None)
+
+    def _update_in_flight(self):
+        with self._active_lock:
+            scopes = list(self._active.values())
+        counts: Dict[LabelKey, float] = {}
+        for scope in scopes:
+            # Not routed yet: e.g. still held by admission control
+            key = (('route', route_label(scope, default='pending')),)
+            counts[key] = counts.get(key, 0) + 1
+        self.in_flight.set_all(counts)
+
+    def register_collector(self, collector: Callable[[], List[str]]):
+        """Add a callable returning extra exposition lines (rendered on every scrape)"""
+        self._collectors.append(collector)
+
+    def route_frequencies(self) -> Dict[str, int]:
+        """Observed request count per route template"""
+        frequencies: Dict[str, int] = {}
+        for key, (_, _, count) in self.request_duration.snapshot().items():
+            route = dict(key).get('route')
+            frequencies[route] = frequencies.get(route, 0) + count
+        return frequencies
+
+    def render(self) -> str:
+        self._update_in_flight()
+        lines: List[str] = []
+        for metric in [self.request_duration, self.request_size, self.response_size,
+                       self.request_overhead, self.service_duration, self.in_flight]:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+# Seconds spent in service methods during the current request ([total, nesting depth])
+_service_time: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar('service_time', default=None)
+
+
+def timed_service_method(func: Callable) -> Callable:
+    """Record the duration of a service method (only the outermost call when methods nest)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        tracker = _service_time.get()
+        if tracker is not None and tracker[1] > 0:
+            return func(*args, **kwargs)
+
+        start = time.perf_counter()
+        if tracker is not None:
+            tracker[1] += 1
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            if tracker is not None:
+                tracker[0] += elapsed
+                tracker[1] -= 1
+            metrics.service_duration.observe(elapsed, method=func.__name__)
+
+    return wrapper
+
+
+def instrument_methods(*prefixes: str):
+    """Class decorator timing every public method whose name starts with one of `prefixes`"""
+    def decorator(cls):
+        for name, attribute in list(vars(cls).items()):
+            if callable(attribute) and name.startswith(prefixes):
+                setattr(cls, name, timed_service_method(attribute))
+        return cls
+    return decorator
+
+
+def route_label(scope, default: str = 'unmatched') -> str:
+    """Path template of the route the router matched (`default` when none did)"""
+    return getattr(scope.get('route'), 'path', None) or default
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, sizes and in-flight requests per route"""
+
+    def __init__(self, app, registry: MetricsRegistry = metrics):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        method = scope['method']
+        request_size = 0
+        for name, value in scope.get('headers', []):
+            if name == b'content-length':
+                try:
+                    request_size = max(int(value or 0), 0)
+                except ValueError:
+                    # A malformed header must not break the request it belongs to
+                    pass
+                break
+
+        response = {'status': 500, 'size': 0}
+        tracker = [0.0, 0]
+        token = _service_time.set(tracker)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+            elif message['type'] == 'http.response.body':
+                response['size'] += len(message.get('body', b''))
+            await send(message)
+
+        self.registry.track(scope)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.untrack(scope)
+            _service_time.reset(token)
+
+            elapsed = time.perf_counter() - start
+            # Route templates keep label cardinality bounded; unknown paths share one label
+            route = route_label(scope)
+            status = str(response['status'])
+
+            self.registry.request_duration.observe(elapsed, method=method, route=route, status=status)
+            self.registry.request_size.observe(request_size, method=method, route=route)
+            self.registry.response_size.observe(response['size'], method=method, route=route, status=status)
+            self.registry.request_overhead.observe(max(elapsed - tracker[0], 0.0), route=route)
@@ -0,0 +1,82 @@
+"""
+Per-service memoization of chart payloads (a service instance is one dataset version / factor set)
+"""
+import functools
+import inspect
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Tuple
+
+PAYLOAD_CACHE_SIZE = int(os.environ.get('PAYLOAD_CACHE_SIZE', '64'))
+
+_MISSING = object()
+
+
+class PayloadCache:
+    """Bounded LRU of computed payloads"""
+
+    def __init__(self, size: int = PAYLOAD_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._payloads: 'OrderedDict[Hashable, Any]' = OrderedDict()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            payload = self._payloads.get(key, _MISSING)
+            if payload is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._payloads.move_to_end(key)
+            return payload
+
+    def put(self, key: Hashable, payload: Any):
+        with self._lock:
+            self._payloads[key] = payload
+            self._payloads.move_to_end(key)
+            while len(self._payloads) > self.size:
+                self._payloads.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+
+def _freeze(value: Any) -> Hashable:
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def payload_key(func: Callable, signature: inspect.Signature, args: Tuple, kwargs: dict) -> Hashable:
+    """Key a call by method name and its arguments with defaults applied, so that
+    f(2023, 15), f(year=2023) and f() share an entry when they mean the same thing"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = list(bound.arguments.items())[1:]  # drop self
+    return (func.__name__,) + tuple((name, _freeze(value)) for name, value in arguments)
+
+
+def cached_payload(func: Callable) -> Callable:
+    """Serve repeated calls from the instance's `_payloads` cache (payloads must not be mutated by callers)"""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        try:
+            key = payload_key(func, signature, (self,) + args, kwargs)
+            hash(key)
+        except TypeError:
+            return func(self, *args, **kwargs)
+
+        payload = self._payloads.get(key)
+        if payload is _MISSING:
+            payload = func(self, *args, **kwargs)
+            self._payloads.put(key, payload)
+        return payload
+
+    return wrapper
@@ -0,0 +1,262 @@
+"""
+On-demand request profiling (cProfile) with a bounded in-memory ring buffer of reports
+"""
+import contextvars
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Dict, List, Any, Callable, Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+
+PROFILING_ENABLED = os.environ.get('ENABLE_PROFILING', '').lower() in ('1', 'true', 'yes')
+PROFILE_BUFFER_SIZE = int(os.environ.get('PROFILE_BUFFER_SIZE', '20'))
+
+# Call-tree limits keep stored reports small
+TREE_DEPTH = 6
+TREE_CHILDREN = 8
+TOP_FUNCTIONS = 40
+
+FunctionKey = Tuple[str, int, str]
+
+
+def _label(key: FunctionKey) -> str:
+    filename, line, name = key
+    if filename == '~':
+        return name  # built-in
+    return f"{_short_path(filename)}:{line}({name})"
+
+
+def _short_path(filename: str) -> str:
+    """Trim site-packages / repo prefixes so pandas internals read as pandas/core/..."""
+    for marker in ('site-packages' + os.sep, 'backend' + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return filename
+
+
+def _is_service_method(key: FunctionKey) -> bool:
+    return key[0].endswith(os.path.join('services', 'data_service.py')) and not key[2].startswith('<')
+
+
+class ProfileStore:
+    """Ring buffer of the most recent profile reports"""
+
+    def __init__(self, size: int = PROFILE_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._profiles: deque = deque(maxlen=size)
+
+    def add(self, profile: Dict[str, Any]):
+        with self._lock:
+            self._profiles.append(profile)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            profiles = list(self._profiles)
+        return [
+            {key: value for key, value in profile.items() if key not in ('report', 'text')}
+            for profile in reversed(profiles)
+        ]
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((profile for profile in self._profiles if profile['id'] == profile_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore()
+
+# Profiles of work the profiled request ran on threadpool threads ([loop thread id, profilers])
+_thread_profiles: contextvars.ContextVar[Optional[List]] = contextvars.ContextVar('thread_profiles', default=None)
+_profiling_thread = threading.local()
+
+
+def profiled_in_thread(func: Callable) -> Callable:
+    """Profile calls a profiled request makes off the event loop thread (sync endpoints run in a threadpool)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        request = _thread_profiles.get()
+        if request is None or request[0] == threading.get_ident() or getattr(_profiling_thread, 'active', False):
+            return func(*args, **kwargs)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from the request's profiler (one sys.monitoring tool)
+            return func(*args, **kwargs)
+        _profiling_thread.active = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            _profiling_thread.active = False
+            request[1].append(profiler)
+
+    return wrapper
+
+
+def profile_methods(*prefixes: str):
+    """Class decorator applying profiled_in_thread to every method whose name starts with one of `prefixes`"""
+    def decorator(cls):
+        for name, attribute in list(vars(cls).items()):
+            if callable(attribute) and name.startswith(prefixes):
+                setattr(cls, name, profiled_in_thread(attribute))
+        return cls
+    return decorator
+
+
+def _stats(profilers: List[cProfile.Profile], stream=None) -> pstats.Stats:
+    stats = pstats.Stats(profilers[0], stream=stream)
+    for profiler in profilers[1:]:
+        stats.add(profiler)
+    return stats
+
+
+def build_report(profiler: cProfile.Profile, *thread_profilers: cProfile.Profile) -> Tuple[Dict[str, Any], str]:
+    """Structured report (top functions + call trees under each data_service method) and pstats text"""
+    profilers = [profiler] + list(thread_profilers)
+    stats = _stats(profilers)
+    stats.calc_callees()
+    raw = stats.stats  # key -> (primitive calls, total calls, tottime, cumtime, callers)
+
+    top_functions = [
+        {
+            'function': _label(key),
+            'calls': values[1],
+            'tottime': round(values[2], 6),
+            'cumtime': round(values[3], 6)
+        }
+        for key, values in sorted(raw.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    ]
+
+    def tree(key: FunctionKey, depth: int, path: frozenset) -> Dict[str, Any]:
+        values = raw[key]
+        node = {
+            'function': _label(key),
+            'calls': values[1],
+            'tottime': round(values[2], 6),
+            'cumtime': round(values[3], 6)
+        }
+        if depth < TREE_DEPTH:
+            callees = [
+                callee for callee in stats.all_callees.get(key, {})
+                if callee in raw and callee not in path
+            ]
+            callees.sort(key=lambda callee: raw[callee][3], reverse=True)
+            children = [tree(callee, depth + 1, path | {callee}) for callee in callees[:TREE_CHILDREN]]
+            if children:
+                node['children'] = children
+        return node
+
+    service_methods = [
+        tree(key, 0, frozenset([key]))
+        for key in sorted((key for key in raw if _is_service_method(key)), key=lambda key: raw[key][3], reverse=True)
+    ]
+
+    text = io.StringIO()
+    _stats(profilers, stream=text).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+
+    return {'top_functions': top_functions, 'service_methods': service_methods}, text.getvalue()
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope.get('headers', []):
+        if name == b'x-profile' and value.lower() in (b'1', b'true', b'yes'):
+            return True
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    return query.get('profile', [''])[0].lower() in ('1', 'true', 'yes')
+
+
+class ProfilingMiddleware:
+    """Profiles requests that ask for it (X-Profile header or ?profile=1) when ENABLE_PROFILING is set.
+
+    The event loop thread is shared, so a profile also holds the async work of requests that overlapped
+    it; reports count those in `concurrent_requests`. Sync endpoints and service methods are profiled on
+    their own threadpool thread."""
+
+    def __init__(self, app, enabled: bool = PROFILING_ENABLED, store: ProfileStore = profile_store):
+        self.app = app
+        self.enabled = enabled
+        self.store = store
+        # cProfile can only have one active profiler - concurrent profile requests are served unprofiled
+        self._active = threading.Lock()
+        # Requests in flight, and how many ran alongside the current profile (event loop only, no lock needed)
+        self._in_flight = 0
+        self._overlapping = 0
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        self._in_flight += 1
+        if self._active.locked():
+            self._overlapping += 1
+        try:
+            if not _wants_profile(scope):
+                await self.app(scope, receive, send)
+            elif not self._active.acquire(blocking=False):
+                await self.app(scope, receive, _with_header(send, b'x-profile-skipped', b'busy'))
+            else:
+                await self._profile(scope, receive, send)
+        finally:
+            self._in_flight -= 1
+
+    async def _profile(self, scope, receive, send):
+        profile_id = uuid.uuid4().hex[:12]
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+
+        profiler = cProfile.Profile()
+        thread_profilers: List[cProfile.Profile] = []
+        token = _thread_profiles.set([threading.get_ident(), thread_profilers])
+        self._overlapping = self._in_flight - 1
+        start = time.perf_counter()
+        try:
+            # Profiles every coroutine scheduled on this thread while the request runs
+            profiler.enable()
+            try:
+                await self.app(scope, receive, _with_header(send_wrapper, b'x-profile-id', profile_id.encode()))
+            finally:
+                profiler.disable()
+        finally:
+            _thread_profiles.reset(token)
+            concurrent = self._overlapping
+            self._active.release()
+            duration = time.perf_counter() - start
+            report, text = await run_in_threadpool(build_report, profiler, *thread_profilers)
+            self.store.add({
+                'id': profile_id,
+                'timestamp': time.time(),
+                'method': scope['method'],
+                'path': scope['path'],
+                'query': scope.get('query_string', b'').decode('latin-1'),
+                'status': status['code'],
+                'duration': round(duration, 6),
+                'concurrent_requests': concurrent,
+                'report': report,
+                'text': text
+            })
+
+
+def _with_header(send, name: bytes, value: bytes):
+    async def wrapper(message):
+        if message['type'] == 'http.response.start':
+            message = {**message, 'headers': list(message.get('headers', [])) + [(name, value)]}
+        await send(message)
+    return wrapper
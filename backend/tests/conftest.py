@@ -0,0 +1,38 @@
+"""
+Shared fixtures: TestData.xlsx is loaded and cleaned once per test session
+"""
+import os
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.data_service import EmissionsDataService
+from app.services.dataset_registry import dataset_registry
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'TestData.xlsx')
+
+# Tenant the API tests query (?tenant=pytest), so the default dataset is never loaded
+TEST_TENANT = 'pytest'
+
+
+@pytest.fixture(scope='session')
+def test_data() -> EmissionsDataService:
+    """Service over TestData.xlsx - treat it as read-only (derive new services from `clean_frame`)"""
+    service = EmissionsDataService(data_file_path=DATA_FILE)
+    assert service.load_error is None, service.load_error
+    return service
+
+
+@pytest.fixture
+def clean_frame(test_data) -> pd.DataFrame:
+    """A private copy of the cleaned TestData rows"""
+    return test_data.df.copy()
+
+
+@pytest.fixture(scope='session')
+def client(test_data) -> TestClient:
+    """Client for the app with TestData registered as TEST_TENANT"""
+    dataset_registry.activate(TEST_TENANT, test_data)
+    return TestClient(app)
@@ -0,0 +1,214 @@
+"""
+Admission control: cost-class routing, FIFO queueing and 503 + Retry-After shedding
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+import httpx
+import pytest
+
+from app.services.dataset_registry import dataset_registry, TenantEntry
+from app.services.warmup_service import warmup_runner
+from app.utils.admission import AdmissionController, AdmissionMiddleware, CostClass
+from tests.conftest import DATA_FILE
+from tools.load_test import run_load_test, DEFAULT_PAGES
+
+HEAVY = '/api/data/emissions/hierarchy-treemap'
+STANDARD = '/api/data/emissions/top-parameters'
+CHEAP = '/api/data/summary'
+
+
+class BlockingApp:
+    """Answers 200, holding gated requests until `release` is set"""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.order = []
+
+    async def __call__(self, scope, receive, send):
+        if scope['path'] != CHEAP:
+            await self.release.wait()
+        self.order.append(scope['query_string'].decode())
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'{}'})
+
+
+def _controller(concurrency: int = 1, queue_size: int = 2, expected_seconds: float = 1.0) -> AdmissionController:
+    controller = AdmissionController()
+    controller.classes['heavy'] = CostClass('heavy', concurrency, queue_size, expected_seconds)
+    return controller
+
+
+def _client(app, controller: AdmissionController, enabled: bool = True, **kwargs) -> httpx.AsyncClient:
+    middleware = AdmissionMiddleware(app, controller, enabled=enabled, **kwargs)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url='http://test')
+
+
+async def _until(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.001)
+
+
+def test_routes_are_classified_by_cost():
+    controller = AdmissionController()
+    assert controller.classify(HEAVY) is controller.classes['heavy']
+    assert controller.classify(HEAVY + '/') is controller.classes['heavy']
+    assert controller.classify(STANDARD) is controller.classes['standard']
+    assert controller.classify(CHEAP) is None
+    assert controller.classify('/health') is None
+    assert controller.classify('/admin/memory') is None
+
+
+def test_requests_queue_in_order_and_shed_when_the_queue_is_full():
+    async def scenario():
+        app = BlockingApp()
+        controller = _controller(concurrency=1, queue_size=2)
+        heavy = controller.classes['heavy']
+        async with _client(app, controller) as client:
+            requests = [asyncio.create_task(client.get(HEAVY, params={'n': i})) for i in range(3)]
+            await _until(lambda: heavy.active == 1 and heavy.queue_depth == 2)
+
+            # Queue full: rejected at once with a Retry-After of at least the estimated wait
+            rejected = await client.get(HEAVY, params={'n': 3})
+            assert rejected.status_code == 503
+            assert int(rejected.headers['retry-after']) >= 1
+            assert 'heavy' in rejected.json()['detail']
+            assert heavy.rejected['queue_full'] == 1
+
+            # Cheap routes are never queued behind the heavy ones
+            assert (await client.get(CHEAP)).status_code == 200
+
+            app.release.set()
+            responses = await asyncio.gather(*requests)
+
+        assert [response.status_code for response in responses] == [200, 200, 200]
+        assert app.order == ['', 'n=0', 'n=1', 'n=2']
+        assert heavy.active == 0 and heavy.queue_depth == 0 and heavy.admitted == 3
+
+    asyncio.run(scenario())
+
+
+def test_requests_that_cannot_start_within_their_budget_are_shed():
+    async def scenario():
+        app = BlockingApp()
+        controller = _controller(concurrency=1, queue_size=8, expected_seconds=2.0)
+        heavy = controller.classes['heavy']
+        async with _client(app, controller) as client:
+            running = asyncio.create_task(client.get(HEAVY))
+            await _until(lambda: heavy.active == 1)
+
+            # The estimated wait (2s) exceeds the budget: fail fast instead of queueing
+            response = await client.get(HEAVY, headers={'X-Request-Budget': '0.5'})
+            assert response.status_code == 503
+            assert response.headers['retry-after'] == '2'
+            assert heavy.rejected['deadline'] == 1 and heavy.queue_depth == 0
+
+            # Queued within budget, but the slot is not freed in time
+            heavy.expected_seconds = 0.01
+            response = await client.get(HEAVY, headers={'X-Request-Budget': '0.05'})
+            assert response.status_code == 503
+            assert heavy.rejected['timeout'] == 1 and heavy.queue_depth == 0
+
+            app.release.set()
+            assert (await running).status_code == 200
+        assert heavy.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_disabled_admission_passes_everything_through():
+    async def scenario():
+        app = BlockingApp()
+        app.release.set()
+        controller = _controller(concurrency=1, queue_size=0)
+        async with _client(app, controller, enabled=False) as client:
+            responses = await asyncio.gather(*(client.get(HEAVY) for _ in range(4)))
+        assert [response.status_code for response in responses] == [200] * 4
+        assert controller.classes['heavy'].admitted == 0
+
+    asyncio.run(scenario())
+
+
+class SlowRegistry:
+    """Registry whose tenants take `load_seconds` to load on first access"""
+
+    default_tenant = 'default'
+
+    def __init__(self, load_seconds: float):
+        self.load_seconds = load_seconds
+        self.loaded = set()
+        self.loads = 0
+
+    def is_loaded(self, tenant: str) -> bool:
+        if tenant == 'unknown':
+            raise KeyError(tenant)
+        return tenant in self.loaded
+
+    def get(self, tenant: str):
+        self.loads += 1
+        time.sleep(self.load_seconds)
+        self.loaded.add(tenant)
+
+
+def test_dataset_load_is_outside_the_request_budget():
+    async def scenario():
+        app = BlockingApp()
+        app.release.set()
+        registry = SlowRegistry(load_seconds=0.3)
+        controller = _controller(concurrency=1, queue_size=8, expected_seconds=0.01)
+        async with _client(app, controller, registry=registry) as client:
+            responses = await asyncio.gather(*(
+                client.get(HEAVY, headers={'X-Request-Budget': '0.1'}) for _ in range(4)
+            ))
+            # Unknown tenants are not waited for - the route answers them
+            assert (await client.get(HEAVY, params={'tenant': 'unknown'})).status_code == 200
+        assert [response.status_code for response in responses] == [200] * 4
+        assert registry.loads == 1
+        # The load did not feed the hold-time estimate
+        assert controller.classes['heavy'].expected_seconds < 0.1
+
+    asyncio.run(scenario())
+
+
+def test_requests_wait_for_the_warm_up():
+    async def scenario():
+        app = BlockingApp()
+        app.release.set()
+        registry = SlowRegistry(load_seconds=0.0)
+        registry.loaded.add('default')
+        warming = {'default': True}
+        controller = _controller()
+        async with _client(app, controller, registry=registry, warming=lambda tenant: warming.get(tenant, False)) as client:
+            held = asyncio.create_task(client.get(HEAVY))
+            other_tenant = await client.get(HEAVY, params={'tenant': 'other'})
+            assert other_tenant.status_code == 200 and not held.done()
+
+            warming['default'] = False
+            assert (await held).status_code == 200
+
+    asyncio.run(scenario())
+
+
+def test_cold_start_of_the_real_app_is_held_not_shed(monkeypatch):
+    """The page mix against the app from a cold start: requests arriving while the default dataset
+    loads and warms wait for it instead of running out their budget in the queue"""
+    tenant = dataset_registry.default_tenant
+    monkeypatch.setattr(dataset_registry, '_entries', OrderedDict({tenant: TenantEntry(tenant, DATA_FILE)}))
+    monkeypatch.setattr(warmup_runner, 'frequency_file', None)
+
+    report = asyncio.run(run_load_test(DEFAULT_PAGES, concurrency=4, duration=0, think_time=0, iterations=2))
+
+    assert sum(page['loads'] for page in report['pages'].values()) == 4 * 2
+    assert report['total']['errors'] == 0, report['endpoints']
+    assert dataset_registry.is_loaded(tenant)
+
+
+@pytest.mark.parametrize('line', [
+    'admission_queue_limit{class="heavy"} 2',
+    'admission_rejected_total{class="heavy",reason="queue_full"} 0'
+])
+def test_metrics_exposition(line):
+    assert line in _controller().render_metrics()
@@ -0,0 +1,82 @@
+"""
+Appending periods must give the same payloads as loading the combined frame from scratch
+"""
+import math
+
+import pandas as pd
+import pytest
+
+from app.services.data_service import EmissionsDataService
+
+# Payloads read from the structures append_rows carries over: monthly series, rankings,
+# partitioned sketches (summary / hierarchical intelligence) and the search index
+PAYLOADS = [
+    ('get_time_series', {'dimension': 'Escopo'}),
+    ('get_time_series', {'dimension': 'Hierarquia nível 2', 'year': 2023, 'window': 2}),
+    ('get_emissions_by_scope', {}),
+    ('get_top_n', {'dimension': 'Parâmetro', 'limit': 10}),
+    ('get_top_n', {'dimension': 'Gás', 'year': 2023}),
+    ('get_top_emission_parameters', {'limit': 15}),
+    ('get_summary_stats', {}),
+    ('get_hierarchical_intelligence', {'level': 1, 'year': 2023}),
+    ('get_hierarchical_intelligence', {'level': 2, 'year': 2023}),
+    ('get_search_suggestions', {'query': '', 'limit': 50}),
+    ('get_search_suggestions', {'query': 'cons dies', 'limit': 20}),
+]
+
+
+def assert_same_payload(actual, expected, path='payload'):
+    """Equal structure and values, floats up to summation-order rounding"""
+    if isinstance(expected, dict):
+        assert isinstance(actual, dict) and list(actual) == list(expected), path
+        for key in expected:
+            assert_same_payload(actual[key], expected[key], f"{path}[{key!r}]")
+    elif isinstance(expected, (list, tuple)):
+        assert isinstance(actual, (list, tuple)) and len(actual) == len(expected), path
+        for i, (a, e) in enumerate(zip(actual, expected)):
+            assert_same_payload(a, e, f"{path}[{i}]")
+    elif isinstance(expected, float):
+        assert math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9), f"{path}: {actual} != {expected}"
+    else:
+        assert actual == expected, path
+
+
+@pytest.fixture
+def split_frame(clean_frame):
+    """TestData split into its first half-year and the months after it"""
+    months = sorted(clean_frame['month_index'].unique())
+    first = clean_frame['month_index'] < months[len(months) // 2]
+    return clean_frame[first].reset_index(drop=True), clean_frame[~first].reset_index(drop=True)
+
+
+def test_append_matches_combined_load(split_frame):
+    base, delta = split_frame
+    service = EmissionsDataService(df=base, clean=False)
+    service.build_indexes()
+    # Build every structure the payloads use, so the appended service updates them instead of rebuilding
+    for method, kwargs in PAYLOADS:
+        getattr(service, method)(**kwargs)
+
+    appended = service.append_rows(delta)
+    assert appended._timeseries is not None and appended._rankings and appended._sketches
+    combined = EmissionsDataService(df=pd.concat([base, delta], ignore_index=True), clean=False)
+
+    for method, kwargs in PAYLOADS:
+        assert_same_payload(getattr(appended, method)(**kwargs), getattr(combined, method)(**kwargs), method)
+
+
+def test_append_leaves_the_original_service_untouched(split_frame):
+    base, delta = split_frame
+    service = EmissionsDataService(df=base, clean=False)
+    before = service.get_summary_stats()
+
+    service.append_rows(delta)
+    assert service.get_summary_stats() == before
+    assert len(service.df) == len(base)
+
+
+def test_append_rejects_loaded_periods(split_frame):
+    base, delta = split_frame
+    service = EmissionsDataService(df=base, clean=False)
+    with pytest.raises(ValueError, match='Periods already loaded'):
+        service.append_rows(base.head(10))
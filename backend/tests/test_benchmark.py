@@ -0,0 +1,58 @@
+"""
+Benchmark suite: scaled datasets, a quick run over the cases and regression detection against a baseline
+"""
+import numpy as np
+import pytest
+
+from tools.benchmark import REGRESSION_FLOOR_SECONDS, compare, run_benchmarks, scale_dataset
+
+
+@pytest.fixture
+def sample(clean_frame):
+    return clean_frame.head(1500).reset_index(drop=True)
+
+
+def test_scaled_dataset_spreads_copies_over_years(sample):
+    scaled = scale_dataset(sample, 6, max_years=3)
+
+    assert len(scaled) == 6 * len(sample)
+    assert sorted(scaled['Ano'].unique()) == [2021, 2022, 2023]
+    assert (scaled['Competência'].str[:4].astype(int) == scaled['Ano']).all()
+    # Copies beyond the first per year add new units, so cardinality grows with the data
+    assert scaled['Unidade operacional'].nunique() == 2 * sample['Unidade operacional'].nunique()
+
+    # The same noise on every measure keeps tCO2e proportional to Valor
+    ratio = scaled['Emissões (tCO2e)'] / scaled['Valor']
+    expected = np.tile((sample['Emissões (tCO2e)'] / sample['Valor']).to_numpy(), 6)
+    np.testing.assert_allclose(ratio[np.isfinite(expected)], expected[np.isfinite(expected)])
+
+    assert scale_dataset(sample, 1) is sample
+
+
+def test_quick_run_reports_every_selected_case(sample):
+    results = run_benchmarks(sample, [1, 2], repeat=2, max_seconds=5.0, case_filter='get_top_n')
+
+    assert list(results) == ['1x', '2x']
+    assert results['2x']['rows'] == 2 * len(sample)
+    cases = results['1x']['cases']
+    assert list(cases) == ['get_top_n[Parâmetro]', 'get_top_n[Hierarquia nível 3]']
+    for case in cases.values():
+        assert case['cold']['runs'] == case['warm']['runs'] == 2
+        assert case['cold']['min'] <= case['cold']['median'] <= case['cold']['max']
+        assert case['peak_memory_bytes'] > 0
+
+
+def _results(**medians):
+    return {'results': {'1x': {'cases': {name: {'cold': {'median': median}} for name, median in medians.items()}}}}
+
+
+def test_regressions_need_the_ratio_and_the_absolute_floor():
+    baseline = _results(slow=0.100, tiny=0.0001, steady=0.100)
+    current = _results(slow=0.200, tiny=0.0010, steady=0.110, new=1.0)
+
+    regressions = compare(current, baseline, ratio=1.25)
+    assert [regression['case'] for regression in regressions] == ['slow']
+    assert regressions[0]['ratio'] == pytest.approx(2.0)
+
+    # A 10x slowdown below the floor is noise
+    assert 0.0010 - 0.0001 < REGRESSION_FLOOR_SECONDS
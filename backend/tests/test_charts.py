@@ -0,0 +1,45 @@
+"""
+Grouped chart payloads against straightforward row-by-row references
+"""
+import pandas as pd
+import pytest
+
+
+def _reference_tree(df: pd.DataFrame, columns):
+    tree = {}
+    for values, emissions in zip(zip(*(df[column] for column in columns)), df['Emissões (tCO2e)']):
+        level = tree
+        for depth, value in enumerate(values):
+            name = value if pd.notna(value) else f"Level_{depth + 1}"
+            node = level.setdefault(name, {'emissions': 0.0, 'children': {}})
+            node['emissions'] += float(emissions)
+            level = node['children']
+    return tree
+
+
+@pytest.mark.parametrize('level', [1, 3, 7])
+def test_hierarchy_treemap(test_data, level):
+    columns = [f'Hierarquia nível {depth}' for depth in range(1, level + 1)]
+    assert test_data.get_hierarchy_treemap_data(level)['hierarchy'] == _reference_tree(test_data.df, columns)
+
+
+def test_transportation_emissions(test_data):
+    df = test_data.df
+    transport = df[df['Parâmetro'].map(test_data._categorize_transportation)]
+    fuel_types, categories = {}, dict.fromkeys(['light_vehicles', 'fleet_operations', 'employee_commuting', 'product_shipping'], 0.0)
+    for parameter, emissions in zip(transport['Parâmetro'].str.lower(), transport['Emissões (tCO2e)']):
+        fuel = next((name for name in ('gasolina', 'diesel', 'etanol') if name in parameter), 'outros')
+        fuel_types.setdefault(fuel, {'emissions': 0.0, 'distance': 0.0, 'efficiency': 0.0})['emissions'] += emissions
+        if 'veículos leves' in parameter:
+            categories['light_vehicles'] += emissions
+        elif 'frota' in parameter:
+            categories['fleet_operations'] += emissions
+        elif 'funcionários' in parameter or 'colaboradores' in parameter:
+            categories['employee_commuting'] += emissions
+        elif 'expedição' in parameter or 'entrega' in parameter:
+            categories['product_shipping'] += emissions
+
+    transportation = test_data.get_transportation_emissions()['transportation']
+    assert transportation['fuel_types'] == fuel_types
+    assert list(transportation['fuel_types']) == list(fuel_types)
+    assert transportation['categories'] == categories
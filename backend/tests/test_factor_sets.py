@@ -0,0 +1,111 @@
+"""
+Factor-set recomputation: (Parâmetro, Gás) emission-factor overrides, GWP tables and share columns
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.data_model import FactorSet
+from app.services.data_service import EmissionsDataService
+from app.services import factor_service
+from app.services.factor_service import AR6_GWP, FactorRecalculationEngine
+from tests.conftest import TEST_TENANT
+
+
+def _frame() -> pd.DataFrame:
+    # One parameter emitting two gases, and a row whose stored factor failed validation (NaN)
+    return pd.DataFrame({
+        'Parâmetro': ['Diesel', 'Diesel', 'Gasolina'],
+        'Gás': ['CO2', 'CH4', 'CO2'],
+        'Valor': [100.0, 100.0, 50.0],
+        'Fator de conversão': [1.0, 1.0, 1.0],
+        'Fator de emissão': [2.0, 0.01, np.nan],
+        'Emissões (tGEE)': [200.0, 1.0, 120.0],
+        'Emissões (tCO2e)': [200.0, 28.0, 120.0],
+        'Emissões de controle operacional (tGEE)': [50.0, 0.0, 0.0],
+        'Emissões de participação acionária (tGEE)': [150.0, 1.0, 0.0],
+        'Emissões de controle operacional (tCO2e)': [50.0, 0.0, 0.0],
+        'Emissões de participação acionária (tCO2e)': [150.0, 28.0, 0.0]
+    })
+
+
+def _recalculate(factor_set: FactorSet):
+    engine = FactorRecalculationEngine()
+    engine.bind(_frame())
+    engine.register_factor_set(factor_set)
+    return engine.recalculate(factor_set.name)
+
+
+def test_override_applies_to_its_gas_only():
+    columns = _recalculate(FactorSet(name='diesel', emission_factors={'Diesel': {'CO2': 3.0}}))
+
+    np.testing.assert_allclose(columns['Emissões (tGEE)'], [300.0, 1.0, 120.0])
+    # GWP implied by the stored rows (1 for CO2, 28 for CH4)
+    np.testing.assert_allclose(columns['Emissões (tCO2e)'], [300.0, 28.0, 120.0])
+
+
+def test_unknown_factors_keep_stored_emissions():
+    # A NaN override and a NaN stored factor both mean "not overridden"
+    columns = _recalculate(FactorSet(name='unknown', emission_factors={
+        'Diesel': {'CO2': float('nan')},
+        'Gasolina': {'CO2': 5.0}
+    }))
+
+    np.testing.assert_allclose(columns['Emissões (tGEE)'], [200.0, 1.0, 120.0])
+    assert np.isfinite(columns['Emissões (tCO2e)']).all()
+
+
+def test_gwp_table_recomputes_co2e():
+    columns = _recalculate(FactorSet(name='AR6-test', gwp=AR6_GWP))
+
+    np.testing.assert_allclose(columns['Emissões (tCO2e)'], [200.0, 1.0 * AR6_GWP['CH4'], 120.0])
+
+
+def test_share_columns_keep_their_share_of_the_total():
+    columns = _recalculate(FactorSet(name='diesel', emission_factors={'Diesel': {'CO2': 3.0}}, gwp=AR6_GWP))
+
+    np.testing.assert_allclose(columns['Emissões de controle operacional (tGEE)'], [75.0, 0.0, 0.0])
+    np.testing.assert_allclose(columns['Emissões de participação acionária (tGEE)'], [225.0, 1.0, 0.0])
+    np.testing.assert_allclose(columns['Emissões de participação acionária (tCO2e)'], [225.0, AR6_GWP['CH4'], 0.0])
+
+
+def test_factor_view_over_test_data(clean_frame):
+    parameter = 'Consumo de diesel na frota'
+    rows = clean_frame[(clean_frame['Parâmetro'] == parameter) & (clean_frame['Gás'] == 'CO2')]
+    stored_factor = float(rows['Fator de emissão'].iloc[0])
+    service = EmissionsDataService(df=clean_frame, clean=False)
+    service.factor_engine.register_factor_set(FactorSet(
+        name='double-diesel-co2', emission_factors={parameter: {'CO2': stored_factor * 2}}
+    ))
+
+    view = service.with_factor_set('double-diesel-co2')
+    expected = (rows['Valor'] * rows['Fator de conversão'] * stored_factor * 2).sum()
+    changed = view.df.loc[rows.index, 'Emissões (tGEE)'].sum()
+    assert changed == pytest.approx(expected)
+
+    # Rows of the other gases and parameters are untouched
+    others = clean_frame.index.difference(rows.index)
+    np.testing.assert_array_equal(view.df.loc[others, 'Emissões (tGEE)'], clean_frame.loc[others, 'Emissões (tGEE)'])
+
+
+def test_oversized_factor_sets_are_refused(monkeypatch):
+    monkeypatch.setattr(factor_service, 'MAX_FACTOR_SET_ENTRIES', 3)
+    engine = FactorRecalculationEngine()
+    engine.register_factor_set(FactorSet(name='small', gwp={'CH4': 27.9}, emission_factors={'Diesel': {'CO2': 3.0, 'CH4': 0.1}}))
+    with pytest.raises(ValueError, match='more than the limit of 3'):
+        engine.register_factor_set(FactorSet(name='large', gwp=AR6_GWP))
+    assert [factor_set['name'] for factor_set in engine.list_factor_sets()] == ['AR5', 'AR6', 'small']
+
+
+def test_registering_a_factor_set_requires_the_admin_token(client, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    body = {'name': 'api-test', 'gwp': {'CH4': 30.0}}
+    params = {'tenant': TEST_TENANT}
+
+    assert client.post('/api/data/factor-sets', json=body, params=params).status_code == 403
+    assert client.post('/api/data/factor-sets', json=body, params=params, headers={'X-Admin-Token': 'wrong'}).status_code == 403
+
+    response = client.post('/api/data/factor-sets', json=body, params=params, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 200 and response.json() == {'name': 'api-test', 'version': 1}
+    # Listing stays public
+    assert 'api-test' in [factor_set['name'] for factor_set in client.get('/api/data/factor-sets', params=params).json()]
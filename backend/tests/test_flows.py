@@ -0,0 +1,74 @@
+"""
+Sankey flows: node and link values against groupby, and flow conservation through every stage
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.flow_service import DEFAULT_FLOW_STAGES, build_flows
+
+
+def _by_node(flows, ends: str):
+    """Link values summed per node at the `source` or `target` end"""
+    totals = np.zeros(len(flows['nodes']['name']))
+    np.add.at(totals, flows['links'][ends], flows['links']['value'])
+    return totals
+
+
+def test_nodes_and_links_match_groupby(test_data):
+    df = test_data.df
+    flows = build_flows(df, DEFAULT_FLOW_STAGES)
+    nodes, links = flows['nodes'], flows['links']
+
+    for i, stage in enumerate(DEFAULT_FLOW_STAGES):
+        expected = df.groupby(stage)['Emissões (tCO2e)'].sum()
+        names = [name for name, node_stage in zip(nodes['name'], nodes['stage']) if node_stage == i]
+        values = [value for value, node_stage in zip(nodes['value'], nodes['stage']) if node_stage == i]
+        assert names == list(expected.index)
+        np.testing.assert_allclose(values, expected.to_numpy())
+
+    actual = {
+        (nodes['name'][source], nodes['name'][target]): value
+        for source, target, value in zip(links['source'], links['target'], links['value'])
+    }
+    expected = {}
+    for source_stage, target_stage in zip(DEFAULT_FLOW_STAGES, DEFAULT_FLOW_STAGES[1:]):
+        expected.update(df.groupby([source_stage, target_stage])['Emissões (tCO2e)'].sum().to_dict())
+    assert actual.keys() == expected.keys()
+    for pair, value in expected.items():
+        assert actual[pair] == pytest.approx(value), pair
+
+
+def test_flow_is_conserved_through_every_stage(test_data):
+    flows = build_flows(test_data.df, DEFAULT_FLOW_STAGES)
+    node_values = np.array(flows['nodes']['value'])
+    stages = np.array(flows['nodes']['stage'])
+    inflow, outflow = _by_node(flows, 'target'), _by_node(flows, 'source')
+
+    # Without missing keys every node passes on all it receives
+    first, last = stages == 0, stages == len(DEFAULT_FLOW_STAGES) - 1
+    np.testing.assert_allclose(outflow[~last], node_values[~last])
+    np.testing.assert_allclose(inflow[~first], node_values[~first])
+
+    total = test_data.df['Emissões (tCO2e)'].sum()
+    for stage in range(len(DEFAULT_FLOW_STAGES)):
+        assert node_values[stages == stage].sum() == pytest.approx(total)
+
+
+def test_rows_missing_a_stage_leave_the_flow_there():
+    df = pd.DataFrame({
+        'Escopo': ['Escopo 1', 'Escopo 1', 'Escopo 2'],
+        'Gás': ['CO2', None, 'CO2'],
+        'Emissões (tCO2e)': [10.0, 5.0, 2.0]
+    })
+    flows = build_flows(df, ['Escopo', 'Gás'])
+
+    assert flows['nodes'] == {'name': ['Escopo 1', 'Escopo 2', 'CO2'], 'stage': [0, 0, 1], 'value': [15.0, 2.0, 12.0]}
+    assert flows['links'] == {'source': [0, 1], 'target': [2, 2], 'value': [10.0, 2.0]}
+
+
+def test_flow_stages_are_validated(test_data):
+    with pytest.raises(ValueError, match='At least two'):
+        test_data.get_emissions_flows(['Escopo'])
+    with pytest.raises(ValueError, match='Unsupported flow stages: Valor'):
+        test_data.get_emissions_flows(['Escopo', 'Valor'])
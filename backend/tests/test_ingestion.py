@@ -0,0 +1,115 @@
+"""
+Dataset uploads: job lifecycle for replace and append uploads, failures that leave the live dataset untouched
+"""
+import time
+
+import pytest
+
+from app.services import ingestion_service
+from app.services.dataset_registry import DatasetRegistry
+from app.services.ingestion_service import INGESTION_STAGES, IngestionManager
+from tests.conftest import TEST_TENANT
+
+TENANT = 'uploads'
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch) -> IngestionManager:
+    # Skip the warm stage: it computes every default chart payload per job
+    monkeypatch.setattr(ingestion_service, 'WARMUP_ENABLED', False)
+    registry = DatasetRegistry(data_dir=str(tmp_path / 'tenants'), spill_dir=str(tmp_path / 'spill'))
+    return IngestionManager(registry=registry, history=3)
+
+
+@pytest.fixture
+def halves(clean_frame):
+    """TestData as two CSV exports: the first half-year and the months after it"""
+    months = sorted(clean_frame['month_index'].unique())
+    first = clean_frame['month_index'] < months[len(months) // 2]
+    return clean_frame[first].to_csv(index=False).encode(), clean_frame[~first].to_csv(index=False).encode()
+
+
+def _finished(manager: IngestionManager, job: dict) -> dict:
+    deadline = time.monotonic() + 60
+    while job['status'] not in ('succeeded', 'failed'):
+        assert time.monotonic() < deadline, job
+        time.sleep(0.02)
+        job = manager.get(job['id'])
+    return job
+
+
+def _stages(job: dict) -> dict:
+    return {stage['name']: stage['status'] for stage in job['stages']}
+
+
+def test_replace_then_append(manager, halves, clean_frame):
+    first, rest = halves
+    job = _finished(manager, manager.submit('first.csv', first, tenant=TENANT))
+
+    assert job['status'] == 'succeeded', job['error']
+    assert [stage['name'] for stage in job['stages']] == INGESTION_STAGES
+    assert _stages(job) == {**dict.fromkeys(INGESTION_STAGES, 'done'), 'warm': 'skipped'}
+    assert job['result']['data_quality']['rows']['input'] == job['result']['rows_after_cleaning']
+    replaced = manager._registry.get(TENANT)
+
+    job = _finished(manager, manager.submit('rest.csv', rest, mode='append', tenant=TENANT))
+    assert job['status'] == 'succeeded', job['error']
+    assert job['result']['rows_appended'] == job['result']['rows_after_cleaning'] - len(replaced.df)
+
+    live = manager._registry.get(TENANT)
+    assert len(live.df) == len(clean_frame)
+    assert live.get_summary_stats(exact=True)['total_emissions'] == pytest.approx(clean_frame['Emissões (tCO2e)'].sum())
+    assert [listed['id'] for listed in manager.list()][0] == job['id']
+
+
+def test_failed_jobs_leave_the_live_dataset_untouched(manager, halves):
+    first, _ = halves
+    assert _finished(manager, manager.submit('first.csv', first, tenant=TENANT))['status'] == 'succeeded'
+    live = manager._registry.get(TENANT)
+
+    # Appending periods that are already loaded fails in the index stage
+    job = _finished(manager, manager.submit('again.csv', first, mode='append', tenant=TENANT))
+    assert job['status'] == 'failed' and 'Periods already loaded' in job['error']
+    assert _stages(job) == {'parse': 'done', 'validate': 'done', 'clean': 'done', 'index': 'failed',
+                            'warm': 'skipped', 'activate': 'skipped'}
+
+    # A file without the CLIMAS columns fails validation
+    job = _finished(manager, manager.submit('other.csv', b'a,b\n1,2\n', tenant=TENANT))
+    assert job['status'] == 'failed'
+    assert _stages(job)['parse'] == 'done' and _stages(job)['validate'] == 'failed'
+
+    job = _finished(manager, manager.submit('broken.xlsx', b'not a workbook', tenant=TENANT))
+    assert job['status'] == 'failed' and job['error'].startswith('Could not parse broken.xlsx')
+
+    assert manager._registry.get(TENANT) is live
+
+
+def test_history_keeps_the_most_recent_finished_jobs(manager):
+    jobs = [_finished(manager, manager.submit(f'{i}.csv', b'a\n1\n', tenant=TENANT)) for i in range(5)]
+    assert [job['id'] for job in manager.list()] == [job['id'] for job in reversed(jobs[-3:])]
+    assert manager.get(jobs[0]['id']) is None
+
+
+@pytest.mark.parametrize('kwargs, message', [
+    ({'filename': 'data.json'}, 'Unsupported file type'),
+    ({'content': b''}, 'empty'),
+    ({'mode': 'merge'}, 'Unsupported ingestion mode'),
+    ({'tenant': '../etc'}, 'Invalid tenant name'),
+    ({'mode': 'append', 'tenant': 'nobody'}, 'Cannot append to unknown tenant')
+])
+def test_bad_uploads_are_rejected_up_front(manager, kwargs, message):
+    upload = {'filename': 'data.csv', 'content': b'a\n1\n', 'mode': 'replace', 'tenant': TENANT, **kwargs}
+    with pytest.raises(ValueError, match=message):
+        manager.submit(**upload)
+    assert manager.list() == []
+
+
+def test_upload_endpoint_requires_the_admin_token(client, monkeypatch):
+    files = {'file': ('data.csv', b'a\n1\n', 'text/csv')}
+    monkeypatch.delenv('ADMIN_TOKEN', raising=False)
+    assert client.post('/admin/datasets', files=files, params={'tenant': TEST_TENANT}).status_code == 403
+
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    response = client.post('/admin/datasets', files={'file': ('data.json', b'{}', 'application/json')},
+                           headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 400 and 'Unsupported file type' in response.json()['detail']
@@ -0,0 +1,66 @@
+"""
+Load-test harness: page mixes, in-process runs through the app lifespan and the summary report
+"""
+import asyncio
+
+import pytest
+
+from app import main
+from app.main import app
+from tools import load_test
+from tools.load_test import PAGE_PROFILES, LoadTestResults, run_load_test, summarize
+from tests.conftest import TEST_TENANT
+
+
+def test_page_profiles_request_existing_routes():
+    paths = set(app.openapi()['paths'])
+    for page, urls in PAGE_PROFILES.items():
+        for url in urls:
+            assert url.split('?')[0] in paths, (page, url)
+
+
+def test_in_process_run(client, monkeypatch):
+    # The startup warm-up would load the default dataset
+    monkeypatch.setattr(main, 'WARMUP_ENABLED', False)
+    monkeypatch.setitem(PAGE_PROFILES, 'pytest', [
+        f'/api/data/summary?tenant={TEST_TENANT}',
+        f'/api/data/emissions/top?dimension=Gás&tenant={TEST_TENANT}',
+        '/api/data/summary?tenant=unknown-tenant'
+    ])
+
+    report = asyncio.run(run_load_test(['pytest', 'health'], concurrency=3, duration=0, think_time=0,
+                                       iterations=4, seed=1))
+
+    assert report['config']['target'] == 'in-process'
+    assert sum(page['loads'] for page in report['pages'].values()) == 3 * 4
+    summary = report['endpoints']['/api/data/summary']
+    assert summary['statuses'] == {'200': summary['requests'] // 2, '404': summary['requests'] // 2}
+    assert summary['error_rate'] == 0.5
+    assert report['endpoints']['/api/data/emissions/top']['errors'] == 0
+
+
+def test_summary_statistics():
+    results = LoadTestResults()
+    for i, status in enumerate([200] * 7 + [503, 500]):
+        results.record_request('/api/data/summary', (i + 1) / 100, status)
+    results.record_request('/health', 0.5, None)
+    results.record_failure('/health', ConnectionError())
+    results.record_page('dashboard', 0.2)
+
+    report = summarize(results, elapsed=2.0, config={})
+
+    summary = report['endpoints']['/api/data/summary']
+    assert summary['requests'] == 9 and summary['errors'] == 2
+    assert summary['statuses'] == {'200': 7, '503': 1, '500': 1}
+    assert summary['p50_ms'] == pytest.approx(50) and summary['max_ms'] == pytest.approx(90)
+    assert summary['throughput_rps'] == 4.5
+    assert report['endpoints']['/health']['statuses'] == {'transport_error': 1}
+    assert report['total']['requests'] == 10 and report['total']['error_rate'] == pytest.approx(0.3)
+    assert report['total']['page_loads_per_second'] == 0.5
+    assert report['failures'] == {'/health: ConnectionError': 1}
+
+
+def test_command_line_rejects_unknown_pages(capsys):
+    assert load_test.main(['--pages', 'dashboard,nope']) == 1
+    assert "unknown pages ['nope']" in capsys.readouterr().err
+    assert load_test.main(['--duration', '0']) == 1
@@ -0,0 +1,92 @@
+"""
+Memory accounting: traced allocation deltas, one measuring thread at a time, and retained-size counting
+"""
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from app.utils.memory import AllocationStats, deep_size, frame_bytes, trace_allocations
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def tracing():
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(1)
+    yield
+    if started:
+        tracemalloc.stop()
+
+
+def test_net_and_peak_allocation(tracing):
+    with trace_allocations() as trace:
+        kept = np.ones(4 * MB, dtype=np.uint8)
+        freed = np.ones(8 * MB, dtype=np.uint8)
+        del freed
+
+    assert trace['net_bytes'] == pytest.approx(4 * MB, rel=0.05)
+    assert trace['peak_bytes'] == pytest.approx(12 * MB, rel=0.05)
+    del kept
+
+
+def test_nested_blocks_keep_the_outer_peak(tracing):
+    with trace_allocations() as outer:
+        freed = np.ones(8 * MB, dtype=np.uint8)
+        del freed
+        with trace_allocations() as inner:
+            kept = np.ones(MB, dtype=np.uint8)
+
+    assert inner['net_bytes'] == pytest.approx(MB, rel=0.05)
+    assert outer['peak_bytes'] == pytest.approx(8 * MB, rel=0.05)
+    del kept
+
+
+def test_concurrent_blocks_run_unmeasured_instead_of_waiting(tracing):
+    measuring, release = threading.Event(), threading.Event()
+
+    def measured():
+        with trace_allocations():
+            measuring.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=measured)
+    thread.start()
+    try:
+        assert measuring.wait(5)
+        # Returns at once, without a measurement, while the other thread holds the peak counter
+        with trace_allocations() as trace:
+            pass
+        assert trace == {}
+    finally:
+        release.set()
+        thread.join()
+
+    stats = AllocationStats()
+    stats.record_method('get_top_n', trace)
+    stats.record_method('get_top_n', {'net_bytes': 10, 'peak_bytes': 20, 'seconds': 0.1})
+    assert stats.methods()['get_top_n']['skipped'] == 1
+    assert stats.methods()['get_top_n']['calls'] == 1
+
+
+def test_untraced_blocks_are_not_measured():
+    if tracemalloc.is_tracing():
+        pytest.skip("tracemalloc already running")
+    with trace_allocations() as trace:
+        pass
+    assert trace == {}
+
+
+def test_views_and_shared_columns_are_counted_once(clean_frame):
+    array = np.ones(1000)
+    assert deep_size([array, array[:10], array[500:]]) == deep_size([]) + array.nbytes + 3 * 8
+
+    # A frame sharing its columns with the base only owns the columns it replaced
+    view = clean_frame.copy(deep=False)
+    view['Emissões (tCO2e)'] = view['Emissões (tCO2e)'] * 2
+    replaced = int(view['Emissões (tCO2e)'].memory_usage(deep=True, index=False))
+    index = int(view.index.memory_usage(deep=True))
+    assert frame_bytes(view, base=clean_frame) == index + replaced
@@ -0,0 +1,77 @@
+"""
+Request metrics: histogram buckets and exposition, route-template labels and in-flight requests per route
+"""
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+
+from app.utils.metrics import Histogram, MetricsMiddleware, MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency_seconds', 'Latency', [0.1, 1.0])
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, route='/a')
+    histogram.observe(0.2, route='/b')
+
+    lines = histogram.render()
+    assert lines[:2] == ['# HELP latency_seconds Latency', '# TYPE latency_seconds histogram']
+    assert lines[2:7] == [
+        'latency_seconds_bucket{route="/a",le="0.1"} 2',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4',
+        'latency_seconds_sum{route="/a"} 3.65',
+        'latency_seconds_count{route="/a"} 4'
+    ]
+    assert 'latency_seconds_count{route="/b"} 1' in lines
+
+
+def _app(release: asyncio.Event) -> FastAPI:
+    app = FastAPI()
+
+    @app.get('/items/{item_id}')
+    async def get_item(item_id: int):
+        if item_id == 0:
+            await release.wait()
+        return {'item': item_id}
+
+    return app
+
+
+def test_requests_are_labelled_by_route_template():
+    async def scenario():
+        registry = MetricsRegistry()
+        release = asyncio.Event()
+        release.set()
+        transport = httpx.ASGITransport(app=MetricsMiddleware(_app(release), registry))
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            for item_id in (1, 2, 3):
+                await client.get(f'/items/{item_id}', headers={'Content-Length': 'not-a-number'})
+            await client.get('/missing')
+        return registry
+
+    text = asyncio.run(scenario()).render()
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 3' in text
+    assert 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"} 1' in text
+    assert 'http_response_size_bytes_sum{method="GET",route="/items/{item_id}",status="200"} 30.0' in text
+    assert 'http_request_size_bytes_count{method="GET",route="/items/{item_id}"} 3' in text
+
+
+def test_in_flight_requests_are_counted_per_route():
+    async def scenario():
+        registry = MetricsRegistry()
+        release = asyncio.Event()
+        transport = httpx.ASGITransport(app=MetricsMiddleware(_app(release), registry))
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            held = [asyncio.create_task(client.get('/items/0')) for _ in range(2)]
+            deadline = asyncio.get_running_loop().time() + 5
+            while 'http_requests_in_flight{route="/items/{item_id}"} 2' not in registry.render():
+                assert asyncio.get_running_loop().time() < deadline, registry.in_flight.render()
+                await asyncio.sleep(0.001)
+            release.set()
+            await asyncio.gather(*held)
+        return registry
+
+    # The series stays, back at zero
+    assert 'http_requests_in_flight{route="/items/{item_id}"} 0' in asyncio.run(scenario()).render()
@@ -0,0 +1,96 @@
+"""
+Request profiling: ring buffer of reports, opt-in per request, overlap with concurrent requests
+"""
+import asyncio
+import time
+
+import httpx
+
+from app.services.data_service import EmissionsDataService
+from app.utils.profiling import ProfileStore, ProfilingMiddleware
+
+
+def _profile(profile_id: str):
+    return {'id': profile_id, 'report': {}, 'text': ''}
+
+
+def test_store_keeps_the_most_recent_profiles():
+    store = ProfileStore(size=2)
+    for profile_id in ('a', 'b', 'c'):
+        store.add(_profile(profile_id))
+
+    assert [profile['id'] for profile in store.list()] == ['c', 'b']
+    assert 'report' not in store.list()[0]
+    assert store.get('a') is None and store.get('b')['id'] == 'b'
+
+    store.clear()
+    assert store.list() == []
+
+
+class ServiceApp:
+    """Answers after a service call on a worker thread, holding requests for ?hold=1 until `release` is set"""
+
+    def __init__(self, service: EmissionsDataService):
+        self.service = service
+        self.release = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        if b'hold=1' in scope['query_string']:
+            await self.release.wait()
+        await asyncio.to_thread(self.service.get_top_n, 'Parâmetro')
+        await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b'{}'})
+
+
+def _client(app, store: ProfileStore) -> httpx.AsyncClient:
+    middleware = ProfilingMiddleware(app, enabled=True, store=store)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url='http://test')
+
+
+async def _stored(store: ProfileStore, count: int):
+    # Reports are built in the threadpool after the response is sent
+    deadline = time.monotonic() + 5
+    while len(store.list()) < count:
+        assert time.monotonic() < deadline, "profile not stored"
+        await asyncio.sleep(0.01)
+
+
+def test_only_requests_that_ask_are_profiled(clean_frame):
+    async def scenario():
+        store = ProfileStore()
+        # A fresh service, so the profiled call computes its payload instead of reading it from the cache
+        service = EmissionsDataService(df=clean_frame, clean=False)
+        async with _client(ServiceApp(service), store) as client:
+            profiled = await client.get('/chart', params={'profile': '1'})
+            plain = await client.get('/chart')
+            await _stored(store, 1)
+
+        assert 'x-profile-id' not in plain.headers
+        profile = store.get(profiled.headers['x-profile-id'])
+        assert profile['status'] == 200 and profile['query'] == 'profile=1'
+        assert profile['concurrent_requests'] == 0
+        assert any('get_top_n' in method['function'] for method in profile['report']['service_methods'])
+        assert 'get_top_n' in profile['text']
+
+    asyncio.run(scenario())
+
+
+def test_profiles_count_the_requests_that_overlapped_them(test_data):
+    async def scenario():
+        store = ProfileStore()
+        app = ServiceApp(test_data)
+        async with _client(app, store) as client:
+            profiled = asyncio.create_task(client.get('/chart', params={'profile': '1', 'hold': '1'}))
+            await asyncio.sleep(0.05)
+            # A second profile request while one runs is served unprofiled
+            skipped = await client.get('/chart', headers={'X-Profile': '1'})
+            other = await client.get('/chart')
+            app.release.set()
+            response = await profiled
+            await _stored(store, 1)
+
+        assert skipped.headers['x-profile-skipped'] == 'busy' and other.status_code == 200
+        assert store.get(response.headers['x-profile-id'])['concurrent_requests'] == 2
+        assert len(store.list()) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,87 @@
+"""
+Dataset registry: LRU eviction over the memory budget, reload from spill files and what survives it
+"""
+import pandas as pd
+import pytest
+
+from app.models.data_model import FactorSet
+from app.services.data_service import EmissionsDataService
+from app.services.dataset_registry import DatasetRegistry, read_snapshot, write_snapshot
+
+
+@pytest.fixture
+def make_service(clean_frame):
+    def make() -> EmissionsDataService:
+        return EmissionsDataService(df=clean_frame.copy(), clean=False, quality_report={'rows': len(clean_frame)})
+    return make
+
+
+@pytest.fixture
+def registry(tmp_path) -> DatasetRegistry:
+    return DatasetRegistry(memory_budget=0, data_dir=str(tmp_path / 'tenants'), spill_dir=str(tmp_path / 'spill'))
+
+
+def _loaded(registry: DatasetRegistry):
+    return [tenant['tenant'] for tenant in registry.tenants() if tenant['loaded']]
+
+
+def test_least_recently_used_tenant_is_spilled(registry, make_service):
+    registry.activate('a', make_service())
+    registry.memory_budget = int(registry.loaded_bytes() * 1.5)
+    registry.activate('b', make_service())
+
+    assert _loaded(registry) == ['b']
+    a = next(tenant for tenant in registry.tenants() if tenant['tenant'] == 'a')
+    assert a['spilled'] and a['evictions'] == 1
+
+    # Touching `a` reloads it from its spill file and spills `b` in turn
+    registry.get('a')
+    assert _loaded(registry) == ['a']
+    assert registry.loaded_bytes() <= registry.memory_budget
+
+
+def test_reload_from_spill_serves_the_same_payloads(registry, make_service):
+    service = make_service()
+    service.factor_engine.register_factor_set(FactorSet(name='ar6-like', gwp={'CH4': 27.9}))
+    expected = (service.get_summary_stats(exact=True), service.get_top_n('Parâmetro', limit=10))
+    registry.memory_budget = 1 << 40
+    registry.activate('a', service)
+
+    assert registry.evict('a') and not registry.is_loaded('a')
+    reloaded = registry.get('a')
+
+    assert reloaded is not service
+    assert (reloaded.get_summary_stats(exact=True), reloaded.get_top_n('Parâmetro', limit=10)) == expected
+    # Factor sets and the validation report are kept across the eviction
+    assert reloaded.factor_engine.has_factor_set('ar6-like')
+    assert reloaded.quality_report == service.quality_report
+
+
+def test_budget_counts_derived_structures(registry, make_service):
+    registry.activate('a', make_service())
+    frame_only = registry.loaded_bytes()
+    registry.memory_budget = 1 << 40
+
+    # The measured size grows once indexes and cached payloads exist
+    service = registry.get('a')
+    service.build_indexes()
+    service.get_hierarchy_treemap_data()
+    structures = service.describe_memory()['total_bytes']
+    assert structures > 0
+
+    # Two bare frames fit; the first tenant's indexes do not
+    registry.memory_budget = 2 * frame_only + structures // 2
+    registry.activate('b', make_service())
+    assert _loaded(registry) == ['b']
+
+
+def test_spill_files_store_mixed_type_columns_as_strings(tmp_path):
+    df = pd.DataFrame({'code': [1, 'A2', None], 'value': [1.0, 2.0, 3.0]}, index=[5, 6, 7])
+    df['code'] = df['code'].astype(object)
+
+    path = write_snapshot(df, str(tmp_path / 'mixed'))
+    restored = read_snapshot(path)
+
+    assert path.endswith('.feather')
+    assert restored['code'].tolist()[:2] == ['1', 'A2'] and pd.isna(restored['code'].iloc[2])
+    assert restored['value'].tolist() == [1.0, 2.0, 3.0]
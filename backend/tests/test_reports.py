@@ -0,0 +1,99 @@
+"""
+Report export: chart selection, PDF / PNG rendering in the process pool and the rendered-artifact cache
+"""
+import pytest
+
+from app.services.report_service import (
+    REPORT_CHARTS, ReportRenderer, parse_charts, render_report, report_renderer, squarify
+)
+from tests.conftest import TEST_TENANT
+
+PDF_MAGIC = b'%PDF-'
+PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
+
+
+@pytest.fixture(scope='module')
+def renderer():
+    renderer = ReportRenderer(workers=1, cache_size=4)
+    yield renderer
+    renderer.shutdown()
+
+
+@pytest.fixture(scope='module')
+def exports():
+    """The shared renderer the endpoint uses, with its pool stopped afterwards"""
+    yield report_renderer
+    report_renderer.shutdown()
+
+
+def test_charts_are_parsed_and_validated():
+    assert parse_charts() == list(REPORT_CHARTS)
+    assert parse_charts(' treemap,gas-breakdown, treemap ') == ['treemap', 'gas-breakdown']
+    with pytest.raises(ValueError, match='Unknown report charts: pie'):
+        parse_charts('treemap,pie')
+    with pytest.raises(ValueError, match='Unknown report charts'):
+        parse_charts(' , ')
+
+
+def test_squarified_tiles_cover_the_area():
+    sizes = [6, 6, 4, 3, 2, 2, 1]
+    rects = squarify(sizes, 0, 0, 1, 1)
+
+    assert len(rects) == len(sizes)
+    for size, (x, y, width, height) in zip(sizes, rects):
+        assert width * height == pytest.approx(size / sum(sizes))
+        assert 0 <= x and 0 <= y and x + width <= 1 + 1e-9 and y + height <= 1 + 1e-9
+
+
+def test_every_chart_renders_to_pdf_and_png(test_data):
+    charts = [('scope-category', test_data.get_emissions_by_scope_category(2023)),
+              ('gas-breakdown', test_data.get_gas_emissions_breakdown(2023)),
+              ('treemap', test_data.get_hierarchy_treemap_data(3)),
+              ('heatmap', test_data.get_hierarchical_emissions_heatmap(2023))]
+
+    pdf = render_report('Emissions report 2023', charts, 'pdf')
+    # One page per chart
+    assert pdf.startswith(PDF_MAGIC) and pdf.count(b'/Type /Page') - pdf.count(b'/Type /Pages') == len(charts)
+    # Without a creation date the same payloads give the same bytes
+    assert render_report('Emissions report 2023', charts, 'pdf') == pdf
+
+    assert render_report('Emissions report 2023', charts, 'png').startswith(PNG_MAGIC)
+
+
+def test_empty_payloads_render_a_placeholder():
+    charts = [(chart, {}) for chart in REPORT_CHARTS]
+    assert render_report('Empty', charts, 'png').startswith(PNG_MAGIC)
+
+
+def test_renders_in_the_pool_once_per_key(renderer, test_data):
+    report, cached = renderer.render(test_data, ['gas-breakdown'], 'pdf', year=2023)
+    assert report.startswith(PDF_MAGIC) and not cached
+
+    again, cached = renderer.render(test_data, ['gas-breakdown'], 'pdf', year=2023)
+    assert cached and again == report
+    assert renderer.artifacts.hits == 1 and renderer.artifacts.misses == 1
+
+    # A treemap-only report does not depend on the year
+    png, cached = renderer.render(test_data, ['treemap'], 'png', year=2022)
+    assert png.startswith(PNG_MAGIC) and not cached
+    assert renderer.render(test_data, ['treemap'], 'png', year=2023)[1]
+
+    with pytest.raises(ValueError, match='Unsupported report format: svg'):
+        renderer.render(test_data, ['treemap'], 'svg')
+
+
+def test_export_endpoint(client, exports):
+    params = {'tenant': TEST_TENANT, 'charts': 'gas-breakdown,scope-category', 'format': 'png', 'year': 2023}
+
+    response = client.get('/api/data/reports/export', params=params)
+    assert response.status_code == 200 and response.headers['content-type'] == 'image/png'
+    assert response.content.startswith(PNG_MAGIC)
+    assert response.headers['x-report-cache'] == 'miss'
+    assert 'emissions-report-2023.png' in response.headers['content-disposition']
+
+    cached = client.get('/api/data/reports/export', params=params)
+    assert cached.headers['x-report-cache'] == 'hit' and cached.content == response.content
+    assert 'report_cache_requests_total{result="hit"}' in client.get('/metrics').text
+
+    assert client.get('/api/data/reports/export', params={**params, 'format': 'svg'}).status_code == 400
+    assert client.get('/api/data/reports/export', params={**params, 'charts': 'pie'}).status_code == 400
@@ -0,0 +1,63 @@
+"""
+Reduction scenarios: request validation and the simulated distribution
+"""
+import pytest
+
+from tests.conftest import TEST_TENANT
+
+SIMULATE = f'/api/data/scenarios/simulate?tenant={TEST_TENANT}'
+
+
+def _lever(**overrides):
+    lever = {'dimension': 'Categoria', 'value': 'Combustão móvel', 'low': 10, 'high': 30}
+    lever.update(overrides)
+    return lever
+
+
+def test_simulation(client, test_data):
+    response = client.post(SIMULATE, json={'levers': [_lever(mode=20)], 'trials': 2000, 'seed': 7})
+    assert response.status_code == 200
+    scenario = response.json()['scenario']
+
+    year_total = test_data.df.loc[test_data.df['Ano'] == 2023, 'Emissões (tCO2e)'].sum()
+    assert scenario['baseline_emissions'] == pytest.approx(year_total)
+    totals = scenario['total_emissions']
+    assert totals['p5'] <= totals['p50'] <= totals['p95'] < scenario['baseline_emissions']
+    affected = scenario['levers'][0]['affected_emissions']
+    assert 0 < affected <= scenario['baseline_emissions']
+    # Reductions of 10-30% on the affected emissions only
+    assert scenario['baseline_emissions'] - 0.3 * affected <= totals['p5']
+    assert totals['p95'] <= scenario['baseline_emissions'] - 0.1 * affected
+
+    # Seeded runs are reproducible
+    again = client.post(SIMULATE, json={'levers': [_lever(mode=20)], 'trials': 2000, 'seed': 7}).json()
+    assert again['scenario']['total_emissions'] == totals
+
+
+@pytest.mark.parametrize('body, message', [
+    ({'levers': []}, 'At least one lever'),
+    ({'levers': [_lever(low=40, high=20)]}, "'low' must not exceed 'high'"),
+    ({'levers': [_lever(mode=50)]}, "'mode' must lie between"),
+    ({'levers': [_lever(dimension='Gás', value='CO2')]}, 'Unsupported lever dimension'),
+])
+def test_invalid_levers_are_bad_requests(client, body, message):
+    response = client.post(SIMULATE, json=body)
+    assert response.status_code == 400
+    assert message in response.json()['detail']
+
+
+@pytest.mark.parametrize('body', [
+    {'levers': [_lever(high=120)]},
+    {'levers': [_lever(low=-5)]},
+    {'levers': [_lever()], 'trials': 0},
+    {'levers': [_lever()], 'trials': 1_000_000},
+    {'levers': [{'dimension': 'Categoria', 'low': 10, 'high': 30}]},
+])
+def test_out_of_range_requests_fail_validation(client, body):
+    assert client.post(SIMULATE, json=body).status_code == 422
+
+
+def test_unknown_year_has_no_scenario(client):
+    response = client.post(SIMULATE, json={'levers': [_lever()], 'year': 1990})
+    assert response.status_code == 200
+    assert response.json() == {'scenario': {}}
@@ -0,0 +1,113 @@
+"""
+Schema validation: required and added columns, coerced dtypes, repaired measures, invalid years and tCO2e consistency
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.data_service import EmissionsDataService
+from app.services.schema_service import SchemaError, check_consistency, combine_reports, validate_frame
+from tests.conftest import TEST_TENANT
+
+
+@pytest.fixture
+def raw(clean_frame) -> pd.DataFrame:
+    """Twelve TestData rows in the export layout"""
+    return clean_frame.head(12).drop(columns=['parameter_category', 'month_index']).reset_index(drop=True)
+
+
+def test_clean_export_passes_unchanged(raw, test_data):
+    validated, report = validate_frame(raw)
+
+    pd.testing.assert_frame_equal(validated, raw)
+    assert report['rows']['input'] == 12 and report['rows']['invalid_year'] == 0
+    assert report['added_columns'] == [] and report['coerced_columns'] == {}
+    assert report['invalid_values'] == {} and report['filled_values'] == {}
+
+    # TestData itself is consistent: every row has known factors within tolerance
+    consistency = test_data.quality_report['consistency']
+    assert consistency['checked'] == len(test_data.df) and consistency['inconsistent'] == 0
+
+
+def test_missing_required_columns_are_refused(raw):
+    with pytest.raises(SchemaError, match='Missing required columns: Gás, Valor'):
+        validate_frame(raw.drop(columns=['Gás', 'Valor']))
+    assert issubclass(SchemaError, ValueError)
+
+
+def test_invalid_values_are_repaired_column_wise(raw):
+    raw = raw.drop(columns=['País', 'PAG'])
+    raw['Valor'] = raw['Valor'].astype(object)
+    raw.loc[0, 'Valor'] = 'n/a'
+    raw.loc[1, 'Valor'] = np.inf
+    raw.loc[2, 'Valor'] = None
+    raw['Unidade operacional'] = np.arange(len(raw))
+    raw.loc[3, 'Parâmetro'] = None
+    raw['Fator de emissão'] = raw['Fator de emissão'].astype(object)
+    raw.loc[4, 'Fator de emissão'] = 'unknown'
+
+    validated, report = validate_frame(raw)
+
+    assert report['added_columns'] == ['País', 'PAG']
+    assert validated['País'].isna().all() and validated['PAG'].isna().all()
+    assert report['coerced_columns'] == {'Unidade operacional': 'integer', 'Valor': 'mixed',
+                                         'Fator de emissão': 'mixed'}
+    assert validated['Unidade operacional'].tolist() == [str(i) for i in range(len(raw))]
+    assert report['invalid_values'] == {'Valor': 2, 'Fator de emissão': 1}
+
+    # Measures count missing values as zero, factors stay unknown and text dimensions become empty
+    assert report['filled_values'] == {'Parâmetro': 1, 'Valor': 3}
+    assert validated['Valor'].dtype == float and validated['Valor'].iloc[:3].tolist() == [0.0, 0.0, 0.0]
+    assert np.isnan(validated['Fator de emissão'].iloc[4]) and validated['Parâmetro'].iloc[3] == ''
+
+
+def test_rows_without_a_valid_year_are_dropped(raw):
+    raw['Ano'] = raw['Ano'].astype(object)
+    raw.loc[0, 'Ano'] = 'x'
+    raw.loc[1, 'Ano'] = 2023.5
+    raw.loc[2, 'Ano'] = None
+    raw.loc[3, 'Ano'] = '2023'
+
+    validated, report = validate_frame(raw)
+
+    assert report['rows']['invalid_year'] == 3 and report['coerced_columns']['Ano'] == 'mixed-integer'
+    assert validated.index.tolist() == list(range(3, 12))
+    assert validated['Ano'].dtype == np.int64 and (validated['Ano'] == 2023).all()
+
+
+def test_inconsistent_emissions_are_reported(raw):
+    raw.loc[5, 'Emissões (tCO2e)'] *= 2
+    raw.loc[7, 'Emissões (tCO2e)'] *= 1.005
+    raw.loc[8, 'Fator de conversão'] = np.nan
+
+    consistency = check_consistency(raw)
+
+    assert consistency['checked'] == 11 and consistency['inconsistent'] == 1
+    assert consistency['max_relative_error'] == pytest.approx(1.0)
+    sample, = consistency['samples']
+    assert sample['row'] == 5 and sample['reported_tco2e'] == pytest.approx(2 * sample['expected_tco2e'])
+
+
+def test_report_covers_cleaning_and_appends(raw):
+    raw.loc[0, 'Emissões (tCO2e)'] = 0.0
+    raw.loc[1, 'Ano'] = np.nan
+    service = EmissionsDataService(df=raw)
+
+    assert service.quality_report['rows'] == {'input': 12, 'invalid_year': 1, 'non_positive_emissions': 1, 'clean': 10}
+    assert len(service.df) == 10
+
+    combined = combine_reports(service.quality_report, service.quality_report)
+    assert combined['rows']['clean'] == 20 and combined['consistency']['checked'] == 20
+    assert combine_reports(None, service.quality_report) is service.quality_report
+
+
+def test_data_quality_endpoint(client, monkeypatch, test_data):
+    monkeypatch.setenv('ADMIN_TOKEN', 'secret')
+    headers = {'X-Admin-Token': 'secret'}
+
+    response = client.get('/admin/data-quality', params={'tenant': TEST_TENANT}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()['tenant'] == TEST_TENANT
+    assert response.json()['report'] == test_data.quality_report
+
+    assert client.get('/admin/data-quality', params={'tenant': 'nobody'}, headers=headers).status_code == 404
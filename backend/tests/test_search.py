@@ -0,0 +1,60 @@
+"""
+Autocomplete: accent-insensitive token prefix matching ranked by emissions
+"""
+import pytest
+
+from app.services.search_service import normalize_text, tokenize
+from tests.conftest import TEST_TENANT
+
+
+@pytest.fixture
+def onibus_parameters(test_data):
+    """Parameters mentioning "ônibus" that kept rows after cleaning"""
+    parameters = test_data.df['Parâmetro'].unique()
+    return {parameter for parameter in parameters if 'ônibus' in parameter}
+
+
+def test_normalize_text_folds_case_and_accents():
+    assert normalize_text('Ônibus') == 'onibus'
+    assert normalize_text('Emissões') == 'emissoes'
+    assert tokenize('CD 6900 - Extrema/Época') == ['cd', '6900', 'extrema', 'epoca']
+
+
+@pytest.mark.parametrize('query', ['onibus', 'ÔNIBUS', 'ônib'])
+def test_unaccented_prefix_finds_accented_values(test_data, onibus_parameters, query):
+    assert onibus_parameters
+    results = test_data.get_search_suggestions(query, ['Parâmetro'], limit=50)['results']
+    assert {result['value'] for result in results} == onibus_parameters
+
+
+def test_every_query_token_must_prefix_a_value_token(test_data):
+    results = test_data.get_search_suggestions('cons dies', limit=50)['results']
+    assert results
+    for result in results:
+        tokens = tokenize(result['value'])
+        assert any(token.startswith('cons') for token in tokens)
+        assert any(token.startswith('dies') for token in tokens)
+
+    # Prefixes anchor at token starts: "nibus" is inside "ônibus" but starts no token
+    assert test_data.get_search_suggestions('nibus')['results'] == []
+    assert test_data.get_search_suggestions('joao pess', ['Unidade operacional'])['results'][0]['value'] == 'EC723 - João Pessoa'
+
+
+def test_results_are_ranked_by_emissions(test_data):
+    results = test_data.get_search_suggestions('', limit=100)['results']
+    emissions = [result['emissions'] for result in results]
+    assert emissions == sorted(emissions, reverse=True)
+
+    top_parameter = test_data.get_top_n('Parâmetro', limit=1)['top_n']['items'][0]
+    parameters = test_data.get_search_suggestions('', ['Parâmetro'], limit=1)['results']
+    assert parameters[0]['value'] == top_parameter['name']
+    assert parameters[0]['emissions'] == pytest.approx(top_parameter['emissions'])
+
+
+def test_search_endpoint(client, onibus_parameters):
+    response = client.get('/api/data/search', params={'q': 'onibus', 'dimension': 'Parâmetro', 'tenant': TEST_TENANT})
+    assert response.status_code == 200
+    assert len(response.json()['results']) == len(onibus_parameters)
+
+    assert client.get('/api/data/search', params={'q': 'co2', 'dimension': 'Ano', 'tenant': TEST_TENANT}).status_code == 400
+    assert client.get('/api/data/search', params={'q': 'co2', 'limit': 0, 'tenant': TEST_TENANT}).status_code == 400
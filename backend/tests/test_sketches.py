@@ -0,0 +1,100 @@
+"""
+Mergeable sketches: accuracy against exact counts / quantiles on TestData, and month partitions
+merged per query against the exact=true full scans
+"""
+import numpy as np
+import pytest
+
+from app.services.sketch_service import (
+    HyperLogLog, QuantileSketch, hash_values, HLL_PRECISION, QUANTILE_RELATIVE_ACCURACY, SUMMARY_QUANTILES
+)
+from tests.conftest import TEST_TENANT
+
+# Three standard errors of a dense sketch (1.04 / sqrt(2^precision))
+HLL_TOLERANCE = 3 * 1.04 / np.sqrt(1 << HLL_PRECISION)
+
+QUANTILES = [0.0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0]
+
+
+@pytest.mark.parametrize('column', ['Unidade operacional', 'Parâmetro', 'ID do parâmetro', 'Valor', 'Emissões (tCO2e)'])
+def test_hyperloglog_count(test_data, column):
+    values = test_data.df[column]
+    sketch = HyperLogLog.from_hashes(hash_values(values))
+    exact = values.nunique()
+
+    if sketch.registers is None:
+        # Small sets are kept exactly
+        assert sketch.count() == exact
+    else:
+        assert sketch.count() == pytest.approx(exact, rel=HLL_TOLERANCE)
+
+
+def test_hyperloglog_merge_is_a_union(test_data):
+    df = test_data.df
+    parts = [HyperLogLog.from_hashes(hash_values(month['Valor'])) for _, month in df.groupby('month_index')]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged = merged.merge(part)
+
+    whole = HyperLogLog.from_hashes(hash_values(df['Valor']))
+    np.testing.assert_array_equal(merged.registers, whole.registers)
+    assert merged.count() == whole.count()
+
+
+@pytest.mark.parametrize('column', ['Emissões (tCO2e)', 'Valor', 'Emissões (tGEE)'])
+def test_quantile_sketch_relative_error(test_data, column):
+    values = test_data.df[column].to_numpy(dtype=float)
+    sketch = QuantileSketch.from_values(values)
+    ordered = np.sort(np.maximum(values, 0))
+
+    for q, estimate in zip(QUANTILES, sketch.quantiles(QUANTILES)):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert estimate == pytest.approx(exact, rel=QUANTILE_RELATIVE_ACCURACY * 1.0001, abs=1e-12), f"q={q}"
+
+
+def test_quantile_sketch_merge_matches_single_sketch(test_data):
+    df = test_data.df
+    parts = [QuantileSketch.from_values(month['Emissões (tCO2e)'].to_numpy()) for _, month in df.groupby('month_index')]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged = merged.merge(part)
+
+    whole = QuantileSketch.from_values(df['Emissões (tCO2e)'].to_numpy())
+    assert merged.count == whole.count
+    assert merged.quantiles(QUANTILES) == whole.quantiles(QUANTILES)
+
+
+def test_summary_from_partitions_matches_exact(client):
+    estimated = client.get('/api/data/summary', params={'tenant': TEST_TENANT}).json()
+    exact = client.get('/api/data/summary', params={'tenant': TEST_TENANT, 'exact': 'true'}).json()
+    assert not estimated['exact'] and exact['exact']
+
+    # Sums, counts and maxima merge exactly; the distinct count stays in exact (sparse) mode here
+    assert estimated['total_emissions'] == pytest.approx(exact['total_emissions'])
+    assert estimated['average_emissions'] == pytest.approx(exact['average_emissions'])
+    assert estimated['max_emissions'] == exact['max_emissions']
+    assert estimated['total_records'] == exact['total_records']
+    assert estimated['unique_parameters'] == exact['unique_parameters']
+    assert estimated['year_range'] == exact['year_range']
+
+    # Interpolated exact percentiles lie between neighbouring values, so allow a little more than the sketch error
+    assert list(estimated['emissions_percentiles']) == [f"p{round(q * 100)}" for q in SUMMARY_QUANTILES]
+    for name, value in exact['emissions_percentiles'].items():
+        assert estimated['emissions_percentiles'][name] == pytest.approx(value, rel=3 * QUANTILE_RELATIVE_ACCURACY), name
+
+
+@pytest.mark.parametrize('level', [1, 2, 3])
+def test_hierarchical_intelligence_from_partitions_matches_exact(client, level):
+    params = {'tenant': TEST_TENANT, 'level': level, 'year': 2023}
+    estimated = client.get('/api/data/emissions/hierarchical-intelligence', params=params).json()
+    exact = client.get('/api/data/emissions/hierarchical-intelligence', params={**params, 'exact': 'true'}).json()
+
+    estimated_tree = estimated['hierarchical_intelligence']['tree_structure']
+    exact_tree = exact['hierarchical_intelligence']['tree_structure']
+    assert list(estimated_tree) == list(exact_tree)
+    for node, expected in exact_tree.items():
+        actual = estimated_tree[node]
+        assert actual['units'] == expected['units'], node
+        assert actual['emissions'] == pytest.approx(expected['emissions']), node
+        assert actual['scope_breakdown'] == pytest.approx(expected['scope_breakdown']), node
+    assert estimated['hierarchical_intelligence']['recommendations'] == exact['hierarchical_intelligence']['recommendations']
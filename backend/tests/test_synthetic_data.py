@@ -0,0 +1,53 @@
+"""
+Synthetic datasets: size and period layout, preserved hierarchy nesting and cardinalities, consistent measures
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.data_service import EmissionsDataService
+from tools.synthetic_data import CATEGORICAL_COLUMNS, DatasetProfile, generate
+
+
+@pytest.fixture(scope='module')
+def profile(test_data) -> DatasetProfile:
+    return DatasetProfile(test_data.df)
+
+
+@pytest.fixture(scope='module')
+def synthetic(profile) -> pd.DataFrame:
+    return generate(profile, 30000, years=3, seed=1)
+
+
+def test_rows_columns_and_periods(profile, synthetic, test_data):
+    assert len(synthetic) == 30000
+    assert list(synthetic.columns) == list(test_data.df.columns)
+    assert sorted(synthetic['Ano'].unique()) == [2021, 2022, 2023]
+    assert (synthetic['Competência'].astype(str).str[:4].astype(int) == synthetic['Ano']).all()
+
+    # Seeded runs are reproducible
+    pd.testing.assert_frame_equal(generate(profile, 500, seed=3), generate(profile, 500, seed=3))
+
+
+def test_hierarchy_nesting_and_cardinalities_are_preserved(synthetic, test_data):
+    source = test_data.df
+    levels = [f'Hierarquia nível {level}' for level in range(1, 8)]
+    for parent, child in zip(levels, levels[1:]):
+        pairs = set(synthetic[[parent, child]].dropna().astype(str).itertuples(index=False))
+        assert pairs <= set(source[[parent, child]].dropna().astype(str).itertuples(index=False)), child
+
+    for col in CATEGORICAL_COLUMNS:
+        assert synthetic[col].nunique() <= source[col].nunique(), col
+
+
+def test_emissions_follow_the_learned_factors(synthetic):
+    tgee = synthetic['Valor'] * synthetic['Fator de conversão'] * synthetic['Fator de emissão']
+    np.testing.assert_allclose(synthetic['Emissões (tGEE)'], tgee)
+    assert (synthetic['Emissões (tCO2e)'] >= 0).all()
+    assert (synthetic['Valor'] >= 0).all()
+
+
+def test_synthetic_data_loads_cleanly(synthetic):
+    service = EmissionsDataService(df=synthetic)
+    assert service.load_error is None
+    assert service.get_summary_stats()['year_range'] == '2021 - 2023'
@@ -0,0 +1,84 @@
+"""
+Time-series layer: monthly values, rolling averages, YoY deltas and trends against pandas
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.data_service import EmissionsDataService
+from app.services.timeseries_service import classify_trend
+
+
+@pytest.fixture(scope='module')
+def two_years(test_data) -> EmissionsDataService:
+    """TestData (2023) plus a 2022 copy with randomly scaled emissions, so YoY has a base year"""
+    current = test_data.df
+    previous = current.copy()
+    previous['Ano'] -= 1
+    previous['month_index'] -= 12
+    previous['Emissões (tCO2e)'] *= np.random.default_rng(7).uniform(0.5, 1.5, len(previous))
+    # Empty a month of one scope, so a YoY base is zero
+    previous.loc[(previous['month_index'] == previous['month_index'].min()) & (previous['Escopo'] == 'Escopo 1'),
+                 'Emissões (tCO2e)'] = 0.0
+    return EmissionsDataService(df=pd.concat([previous, current], ignore_index=True), clean=False)
+
+
+def _monthly(df: pd.DataFrame, dimension: str) -> pd.DataFrame:
+    """Months x keys emissions, every month of the range present"""
+    months = range(df['month_index'].min(), df['month_index'].max() + 1)
+    return df.pivot_table(index='month_index', columns=dimension, values='Emissões (tCO2e)',
+                          aggfunc='sum', fill_value=0.0).reindex(months, fill_value=0.0)
+
+
+@pytest.mark.parametrize('dimension', ['Escopo', 'Hierarquia nível 2'])
+@pytest.mark.parametrize('window', [1, 3, 6])
+def test_series_match_pandas(two_years, dimension, window):
+    monthly = _monthly(two_years.df, dimension)
+    rolling = monthly.rolling(window, min_periods=1).mean()
+    delta = monthly.diff(12)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = (delta / monthly.shift(12) * 100).replace([np.inf, -np.inf], np.nan)
+
+    result = two_years.get_time_series(dimension, year=2023, window=window)['time_series']
+    in_year = monthly.index >= 2023 * 12
+    assert result['periods'] == [f"2023-{month:02d}" for month in range(1, 13)]
+    assert list(result['series']) == [str(key) for key in monthly.columns]
+
+    for key in monthly.columns:
+        series = result['series'][str(key)]
+        np.testing.assert_allclose(series['values'], monthly.loc[in_year, key])
+        np.testing.assert_allclose(series['rolling_average'], rolling.loc[in_year, key])
+        np.testing.assert_allclose(series['yoy_delta'], delta.loc[in_year, key])
+        expected_pct = pct.loc[in_year, key]
+        assert [value is None for value in series['yoy_percentage']] == expected_pct.isna().tolist()
+        np.testing.assert_allclose([value for value in series['yoy_percentage'] if value is not None],
+                                   expected_pct.dropna())
+
+    np.testing.assert_allclose(result['total']['values'], monthly.loc[in_year].sum(axis=1))
+    np.testing.assert_allclose(result['total']['rolling_average'],
+                               monthly.sum(axis=1).rolling(window, min_periods=1).mean()[in_year])
+
+
+def test_first_year_has_no_yoy(two_years):
+    series = two_years.get_time_series('Escopo', year=2022)['time_series']['series']
+    assert all(value is None for key in series for value in series[key]['yoy_delta'])
+
+    # Without a year the whole range is returned, YoY only from the second year on
+    full = two_years.get_time_series('Escopo')['time_series']
+    assert len(full['periods']) == 24
+    assert full['series']['Escopo 2']['yoy_delta'][:12] == [None] * 12
+    assert None not in full['series']['Escopo 2']['yoy_delta'][12:]
+
+
+def test_trend_classification():
+    months = np.arange(12, dtype=float)
+    values = np.array([100 + 5 * months, 100 - 5 * months, np.full(12, 100.0), np.zeros(12)])
+    assert classify_trend(values).tolist() == ['increasing', 'decreasing', 'stable', 'stable']
+
+    # The slope is relative to the mean: +0.5/month on a mean of 100 is within the 1% threshold
+    assert classify_trend(100 + 0.5 * months) == 'stable'
+
+
+def test_unsupported_dimension(test_data):
+    with pytest.raises(ValueError, match='Unsupported time-series dimension'):
+        test_data.get_time_series('Valor')
@@ -0,0 +1,47 @@
+"""
+Top-N ranking: single-pass aggregation against groupby, shares of the full total and the missing-key bucket
+"""
+import pytest
+
+from app.services.data_service import EmissionsDataService
+
+
+@pytest.mark.parametrize('dimension', ['Parâmetro', 'Gás', 'Hierarquia nível 2', 'Hierarquia nível 7'])
+@pytest.mark.parametrize('year', [None, 2023])
+def test_top_n_matches_groupby(test_data, dimension, year):
+    df = test_data.df if year is None else test_data.df[test_data.df['Ano'] == year]
+    expected = df.groupby(dimension)['Emissões (tCO2e)'].agg(['sum', 'count']).sort_values('sum', ascending=False)
+
+    top_n = test_data.get_top_n(dimension, limit=5, year=year)['top_n']
+
+    assert [item['name'] for item in top_n['items']] == list(expected.index[:5])
+    for item in top_n['items']:
+        assert item['emissions'] == pytest.approx(expected.loc[item['name'], 'sum'])
+        assert item['count'] == expected.loc[item['name'], 'count']
+    assert top_n['others']['members'] == max(len(expected) - 5, 0)
+    assert top_n['others']['emissions'] == pytest.approx(expected['sum'].iloc[5:].sum())
+
+
+@pytest.mark.parametrize('dimension', ['Parâmetro', 'Hierarquia nível 7'])
+def test_shares_are_of_the_full_total(test_data, dimension):
+    df = test_data.df
+    top_n = test_data.get_top_n(dimension, limit=3)['top_n']
+    missing = df[dimension].isna()
+
+    assert top_n['total_emissions'] == pytest.approx(df['Emissões (tCO2e)'].sum())
+    assert top_n['missing']['count'] == missing.sum()
+    assert top_n['missing']['emissions'] == pytest.approx(df.loc[missing, 'Emissões (tCO2e)'].sum())
+
+    shares = [item['share'] for item in top_n['items']] + [top_n['others']['share'], top_n['missing']['share']]
+    assert sum(shares) == pytest.approx(100)
+
+
+def test_empty_frame_keeps_the_payload_shape(test_data):
+    empty = EmissionsDataService(df=test_data.df.iloc[:0], clean=False)
+    top_n = empty.get_top_n('Gás')['top_n']
+    assert set(top_n) == set(test_data.get_top_n('Gás')['top_n'])
+    assert top_n['items'] == [] and top_n['total_emissions'] == 0
+    assert 'others' not in empty.get_top_n('Gás', include_others=False)['top_n']
+
+    with pytest.raises(ValueError, match='Unsupported ranking dimension'):
+        empty.get_top_n('Valor')
@@ -0,0 +1,120 @@
+"""
+Startup warm-up: target ordering by route frequency, per-tenant progress and the /ready check
+"""
+import json
+import threading
+import time
+
+import pytest
+
+from app import main
+from app.services import warmup_service
+from app.services.data_service import EmissionsDataService
+from app.services.warmup_service import WarmupRunner
+from app.utils.metrics import MetricsRegistry
+
+SUMMARY = {'route': '/api/data/summary', 'params': {}}
+TOP = {'route': '/api/data/emissions/top', 'params': {'dimension': 'Gás', 'others': True}}
+TRANSPORTATION = {'route': '/api/data/emissions/transportation', 'params': {}}
+FLOWS = {'route': '/api/data/emissions/flows', 'params': {'stages': 'Escopo, Gás'}}
+
+
+class GatedRegistry:
+    """Serves one tenant once `release` is set; every other tenant is unknown"""
+
+    def __init__(self, tenant: str, service: EmissionsDataService):
+        self.tenant = tenant
+        self.service = service
+        self.release = threading.Event()
+
+    def get(self, tenant: str = None) -> EmissionsDataService:
+        assert self.release.wait(30)
+        if tenant != self.tenant:
+            raise KeyError(f"Unknown tenant: {tenant}")
+        return self.service
+
+
+@pytest.fixture
+def live_metrics(monkeypatch) -> MetricsRegistry:
+    registry = MetricsRegistry()
+    monkeypatch.setattr(warmup_service, 'metrics', registry)
+    return registry
+
+
+@pytest.fixture
+def gated(clean_frame) -> GatedRegistry:
+    return GatedRegistry('warm', EmissionsDataService(df=clean_frame, clean=False))
+
+
+def _until(condition, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def test_targets_are_ordered_by_saved_and_live_route_counts(tmp_path, live_metrics):
+    frequency_file = tmp_path / 'frequencies.json'
+    frequency_file.write_text(json.dumps({TRANSPORTATION['route']: 3}))
+    for _ in range(5):
+        # Newer FastAPI releases label routes relative to the router prefix
+        live_metrics.request_duration.observe(0.1, method='GET', route='/emissions/top', status='200')
+    runner = WarmupRunner(registry=None, tenants=['warm'], frequency_file=str(frequency_file))
+
+    assert runner.prioritized([SUMMARY, FLOWS, TRANSPORTATION, TOP]) == [TOP, TRANSPORTATION, SUMMARY, FLOWS]
+
+    runner.save_frequencies()
+    assert json.loads(frequency_file.read_text()) == {TRANSPORTATION['route']: 3, '/emissions/top': 5}
+
+
+def test_unknown_target_routes_are_dropped(tmp_path):
+    path = tmp_path / 'targets.json'
+    path.write_text(json.dumps([SUMMARY, {'route': '/api/data/nope'}, {'route': TOP['route']}]))
+    assert warmup_service.load_targets(str(path)) == [SUMMARY, {'route': TOP['route'], 'params': {}}]
+    assert warmup_service.load_targets(str(tmp_path / 'missing.json')) == warmup_service.DEFAULT_WARMUP_TARGETS
+
+
+def test_run_reports_each_tenant_and_target(gated, live_metrics):
+    runner = WarmupRunner(registry=gated, tenants=['warm', 'gone'], frequency_file=None)
+    failing = {'route': TOP['route'], 'params': {'dimension': 'Valor'}}
+    assert runner.start([SUMMARY, FLOWS, failing])
+
+    assert runner.is_warming('warm') and runner.is_warming('gone') and not runner.is_warming('other')
+    assert not runner.is_data_ready() and not runner.is_finished()
+    assert not runner.start()
+
+    gated.release.set()
+    _until(runner.is_finished)
+
+    status = runner.status()
+    assert status['status'] == 'failed'
+    warm, gone = status['tenants']['warm'], status['tenants']['gone']
+    assert warm['status'] == 'done' and warm['load_seconds'] is not None and 'index_seconds' in warm
+    assert [target['status'] for target in warm['targets']] == ['cached', 'cached', 'failed']
+    assert warm['targets'][2]['error'].startswith('ValueError')
+    assert gone['status'] == 'failed' and gone['error'].startswith('KeyError')
+    assert runner.is_data_ready() and not runner.is_warming('warm')
+
+    # The payloads are now served from the cache
+    assert gated.service.get_emissions_flows(['Escopo', 'Gás']) is gated.service.get_emissions_flows(['Escopo', 'Gás'])
+
+
+@pytest.mark.parametrize('waits_for_warmup', [False, True])
+def test_ready_reports_503_until_warm(client, monkeypatch, gated, live_metrics, waits_for_warmup):
+    runner = WarmupRunner(registry=gated, tenants=['warm'], frequency_file=None)
+    monkeypatch.setattr(main, 'warmup_runner', runner)
+    monkeypatch.setattr(main, 'WARMUP_ENABLED', True)
+    monkeypatch.setattr(main, 'READINESS_WAITS_FOR_WARMUP', waits_for_warmup)
+
+    runner.start([SUMMARY])
+    response = client.get('/ready')
+    assert response.status_code == 503
+    assert response.json() == {'status': 'starting', 'warmup': 'running'}
+
+    gated.release.set()
+    _until(runner.is_finished if waits_for_warmup else runner.is_data_ready)
+    response = client.get('/ready')
+    assert response.status_code == 200 and response.json()['status'] == 'ready'
+
+    monkeypatch.setattr(main, 'WARMUP_ENABLED', False)
+    assert client.get('/ready').json() == {'status': 'ready', 'warmup': 'disabled'}
@@ -0,0 +1 @@
+# Command-line tools for ESG Dashboard (benchmarks, data generation, diagnostics) 
\ No newline at end of file
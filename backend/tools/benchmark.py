@@ -0,0 +1,303 @@
+"""
+Benchmark suite for every public EmissionsDataService method at scaled data sizes
+
+Usage (from backend/):
+    python -m tools.benchmark --scales 1,10,100 --output results.json
+    python -m tools.benchmark --baseline benchmarks_baseline.json          # compare, exit 1 on regression
+    python -m tools.benchmark --baseline benchmarks_baseline.json --save-baseline
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.data_service import EmissionsDataService
+
+DEFAULT_DATA_FILE = "../data/TestData.xlsx"
+
+# Slower than baseline by more than this ratio (and by more than the absolute floor) is a regression
+REGRESSION_RATIO = 1.25
+REGRESSION_FLOOR_SECONDS = 0.002
+
+SCENARIO_LEVERS = [
+    {'dimension': 'Categoria', 'value': 'Combustão móvel', 'low': 10, 'high': 30, 'mode': None},
+    {'dimension': 'Tecnologia', 'value': 'Emissões fugitivas', 'low': 20, 'high': 60, 'mode': 50}
+]
+
+
+def scale_dataset(raw_df: pd.DataFrame, factor: int, max_years: int = 5, seed: int = 0) -> pd.DataFrame:
+    """Replicate the raw frame `factor` times with perturbed values
+
+    Copies are spread over up to `max_years` consecutive years (shifting Ano/Competência back),
+    and copies beyond the first per year get suffixed operational units / level-3 nodes so
+    dimension cardinality grows with the data, as it would for a larger client.
+    """
+    if factor <= 1:
+        return raw_df
+
+    rng = np.random.default_rng(seed)
+    n_years = max(1, min(factor, max_years))
+    measures = ['Valor', 'Emissões (tGEE)', 'Emissões (tCO2e)']
+
+    copies = []
+    for i in range(factor):
+        copy = raw_df.copy()
+        year_shift = i % n_years
+        generation = i // n_years
+
+        if year_shift:
+            copy['Ano'] = copy['Ano'] - year_shift
+            copy['Competência'] = (
+                (pd.to_numeric(copy['Competência'].str[:4]) - year_shift).astype(str) + copy['Competência'].str[4:]
+            )
+        if generation:
+            for col in ['Unidade operacional', 'Hierarquia nível 3']:
+                copy[col] = copy[col].astype(str) + f" #{generation}"
+
+        # Same multiplicative noise on every measure keeps tCO2e consistent with Valor x factors
+        noise = rng.lognormal(0.0, 0.2, len(copy))
+        for col in measures:
+            copy[col] = copy[col] * noise
+        copies.append(copy)
+
+    return pd.concat(copies, ignore_index=True)
+
+
+def benchmark_cases(service: EmissionsDataService) -> List[Tuple[str, Callable[[], Any]]]:
+    """(name, call) for every public method and its parameter variants"""
+    df = service.df
+    year = int(df['Ano'].max())
+    technology = df['Tecnologia'].value_counts().index[0]
+
+    cases = [
+        ('get_emissions_by_scope', lambda: service.get_emissions_by_scope()),
+        ('get_emissions_by_parameter[limit=10]', lambda: service.get_emissions_by_parameter(10)),
+        ('get_emissions_by_hierarchy', lambda: service.get_emissions_by_hierarchy()),
+        ('get_summary_stats', lambda: service.get_summary_stats()),
+        ('get_summary_stats[exact]', lambda: service.get_summary_stats(exact=True)),
+        ('get_top_emission_parameters[limit=15]', lambda: service.get_top_emission_parameters(15)),
+        ('get_transportation_emissions', lambda: service.get_transportation_emissions()),
+        ('get_emissions_by_scope_category', lambda: service.get_emissions_by_scope_category(year)),
+        ('get_gas_emissions_breakdown', lambda: service.get_gas_emissions_breakdown(year)),
+        ('get_hierarchical_emissions_heatmap', lambda: service.get_hierarchical_emissions_heatmap(year)),
+        ('get_operational_performance[limit=15]', lambda: service.get_operational_performance(year, 15)),
+        ('get_process_technology_analysis', lambda: service.get_process_technology_analysis()),
+        ('get_process_technology_analysis[technology]',
+         lambda: service.get_process_technology_analysis(technology=technology)),
+        ('get_process_technology_analysis[scope=scope1]',
+         lambda: service.get_process_technology_analysis(scope='scope1')),
+        ('get_emissions_flows', lambda: service.get_emissions_flows()),
+        ('get_top_n[Parâmetro]', lambda: service.get_top_n('Parâmetro', 10)),
+        ('get_top_n[Hierarquia nível 3]', lambda: service.get_top_n('Hierarquia nível 3', 10)),
+        ('get_time_series[Escopo]', lambda: service.get_time_series('Escopo')),
+        ('get_time_series[Parâmetro]', lambda: service.get_time_series('Parâmetro')),
+        ('get_search_suggestions[q=cons dies]', lambda: service.get_search_suggestions('cons dies')),
+        ('simulate_reduction_scenario[trials=5000]',
+         lambda: service.simulate_reduction_scenario(SCENARIO_LEVERS, year, 5000, 0)),
+        ('with_factor_set[AR6].get_summary_stats', lambda: service.with_factor_set('AR6').get_summary_stats())
+    ]
+    for level in [1, 3, 7]:
+        cases.append((f'get_hierarchy_treemap_data[level={level}]',
+                      lambda level=level: service.get_hierarchy_treemap_data(level)))
+        cases.append((f'get_hierarchical_intelligence[level={level}]',
+                      lambda level=level: service.get_hierarchical_intelligence(level, year)))
+    return cases
+
+
+def _distribution(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'min': ordered[0],
+        'median': statistics.median(ordered),
+        'mean': statistics.fmean(ordered),
+        'p95': ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        'max': ordered[-1],
+        'stdev': statistics.pstdev(ordered)
+    }
+
+
+def _reset(service: EmissionsDataService):
+    """Drop lazily built structures so the next call pays the full cost"""
+    service.factor_engine.bind(service.df)
+    service._reset_caches()
+
+
+def run_case(service: EmissionsDataService, call: Callable[[], Any], repeat: int,
+             max_seconds: float) -> Dict[str, Any]:
+    """Cold (caches dropped) and warm timings plus the peak traced allocation of a cold call"""
+    cold, warm = [], []
+    for _ in range(repeat):
+        _reset(service)
+        start = time.perf_counter()
+        call()
+        cold.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        call()
+        warm.append(time.perf_counter() - start)
+
+        if cold[-1] > max_seconds:
+            break  # too slow to repeat at this scale - one sample is enough to show it
+
+    _reset(service)
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'cold': _distribution(cold),
+        'warm': _distribution(warm),
+        'peak_memory_bytes': peak
+    }
+
+
+def synthetic_dataset(raw_df: pd.DataFrame, factor: int, max_years: int = 5, seed: int = 0) -> pd.DataFrame:
+    """Synthetic frame with `factor` times the source rows, learned from the source distributions"""
+    from tools.synthetic_data import DatasetProfile, generate
+
+    return generate(DatasetProfile(raw_df), len(raw_df) * factor, max(1, min(factor, max_years)), seed=seed)
+
+
+def run_benchmarks(raw_df: pd.DataFrame, scales: List[int], repeat: int, max_seconds: float,
+                   case_filter: str = None, generator: str = 'replicate') -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for scale in scales:
+        if generator == 'synthetic':
+            scaled = synthetic_dataset(raw_df, scale)
+        else:
+            scaled = scale_dataset(raw_df, scale)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        service = EmissionsDataService(df=scaled)
+        load_seconds = time.perf_counter() - start
+        _, load_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        scale_result = {
+            'rows': int(len(scaled)),
+            'rows_after_cleaning': int(len(service.df)),
+            'load': {'seconds': load_seconds, 'peak_memory_bytes': load_peak},
+            'cases': {}
+        }
+        print(f"== {scale}x: {len(scaled):,} rows (load {load_seconds:.2f}s)", file=sys.stderr)
+
+        for name, call in benchmark_cases(service):
+            if case_filter and case_filter not in name:
+                continue
+            case = run_case(service, call, repeat, max_seconds)
+            scale_result['cases'][name] = case
+            print(
+                f"  {name:<50} cold {case['cold']['median'] * 1000:9.2f} ms"
+                f"  warm {case['warm']['median'] * 1000:9.2f} ms"
+                f"  peak {case['peak_memory_bytes'] / 1e6:8.1f} MB",
+                file=sys.stderr
+            )
+
+        results[f'{scale}x'] = scale_result
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], ratio: float = REGRESSION_RATIO) -> List[Dict[str, Any]]:
+    """Cases whose median cold time regressed against the baseline run"""
+    regressions = []
+    for scale, scale_result in results['results'].items():
+        baseline_cases = baseline.get('results', {}).get(scale, {}).get('cases', {})
+        for name, case in scale_result['cases'].items():
+            if name not in baseline_cases:
+                continue
+            current = case['cold']['median']
+            previous = baseline_cases[name]['cold']['median']
+            if current > previous * ratio and current - previous > REGRESSION_FLOOR_SECONDS:
+                regressions.append({
+                    'scale': scale,
+                    'case': name,
+                    'baseline_seconds': previous,
+                    'current_seconds': current,
+                    'ratio': current / previous if previous > 0 else float('inf')
+                })
+    return regressions
+
+
+def read_raw(path: str) -> pd.DataFrame:
+    """Read a raw CLIMAS export by extension"""
+    if path.endswith('.csv'):
+        return pd.read_csv(path)
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_excel(path)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark EmissionsDataService methods at scaled data sizes")
+    parser.add_argument('--data', default=DEFAULT_DATA_FILE, help="source CLIMAS export (xlsx/csv/parquet)")
+    parser.add_argument('--scales', default='1,10,100', help="comma-separated replication factors")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per case")
+    parser.add_argument('--max-seconds', type=float, default=5.0, help="stop repeating a case slower than this")
+    parser.add_argument('--generator', choices=['replicate', 'synthetic'], default='replicate',
+                        help="how scaled datasets are built (replicated copies or tools.synthetic_data)")
+    parser.add_argument('--filter', default=None, help="only run cases whose name contains this text")
+    parser.add_argument('--output', default=None, help="write the JSON results to this file")
+    parser.add_argument('--baseline', default=None, help="baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="overwrite --baseline with this run")
+    parser.add_argument('--ratio', type=float, default=REGRESSION_RATIO, help="regression threshold ratio")
+    args = parser.parse_args(argv)
+
+    raw_df = read_raw(args.data)
+    scales = [int(scale) for scale in args.scales.split(',') if scale.strip()]
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'source': args.data,
+            'source_rows': int(len(raw_df)),
+            'repeat': args.repeat,
+            'generator': args.generator
+        },
+        'results': run_benchmarks(raw_df, scales, args.repeat, args.max_seconds, args.filter, args.generator)
+    }
+
+    exit_code = 0
+    if args.baseline and not args.save_baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.ratio)
+        results['regressions'] = regressions
+        for regression in regressions:
+            print(
+                f"REGRESSION {regression['scale']} {regression['case']}: "
+                f"{regression['baseline_seconds'] * 1000:.2f} ms -> {regression['current_seconds'] * 1000:.2f} ms "
+                f"(x{regression['ratio']:.2f})",
+                file=sys.stderr
+            )
+        exit_code = 1 if regressions else 0
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    if not args.output and not args.save_baseline:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+Load-test harness that replays the dashboard's per-page request mix
+
+Each virtual user loads a page the way the browser does - every request that the page's
+components issue through frontend/src/services/api_service.js is sent concurrently - then
+waits a think time and loads the next page. By default the app is driven in-process through
+the ASGI transport (no network); --base-url targets a running uvicorn instead.
+In-process runs go through the app's lifespan, so the startup warm-up runs as it does in production.
+
+Usage (from backend/):
+    python -m tools.load_test --concurrency 20 --ramp-up 10 --duration 60
+    python -m tools.load_test --base-url http://localhost:8000 --pages dashboard,environmental
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Any, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+# Requests issued per page load, as the page components call api_service.js
+PAGE_PROFILES = {
+    'dashboard': [
+        '/api/data/summary',
+        '/api/data/emissions/operational-performance?year=2023&limit=15',
+        '/api/data/emissions/process-technology-analysis',
+        '/api/data/emissions/hierarchical-intelligence?level=1&year=2023'
+    ],
+    'environmental': [
+        '/api/data/emissions/top-parameters?limit=15',
+        '/api/data/emissions/hierarchy-treemap?level=3',
+        '/api/data/emissions/transportation'
+    ],
+    'chart_proposals': [
+        '/api/data/emissions/scope-category?year=2023',
+        '/api/data/emissions/gas-breakdown?year=2023',
+        '/api/data/emissions/hierarchical-heatmap?year=2023'
+    ],
+    'health': [
+        '/health'
+    ]
+}
+
+DEFAULT_PAGES = ['dashboard', 'environmental', 'chart_proposals']
+
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+
+class LoadTestResults:
+    """Raw samples collected by the virtual users"""
+
+    def __init__(self):
+        # endpoint -> [(latency seconds, status code or None on transport error)]
+        self.requests: Dict[str, List[Tuple[float, Any]]] = {}
+        # page -> [page load seconds]
+        self.pages: Dict[str, List[float]] = {}
+        self.failures: Dict[str, int] = {}
+
+    def record_request(self, endpoint: str, latency: float, status: Any):
+        self.requests.setdefault(endpoint, []).append((latency, status))
+
+    def record_failure(self, endpoint: str, error: Exception):
+        key = f"{endpoint}: {type(error).__name__}"
+        self.failures[key] = self.failures.get(key, 0) + 1
+
+    def record_page(self, page: str, latency: float):
+        self.pages.setdefault(page, []).append(latency)
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def _latency_stats(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        'p50_ms': _percentile(ordered, 50) * 1000,
+        'p95_ms': _percentile(ordered, 95) * 1000,
+        'p99_ms': _percentile(ordered, 99) * 1000,
+        'mean_ms': sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        'max_ms': ordered[-1] * 1000 if ordered else 0.0
+    }
+
+
+def _endpoint(url: str) -> str:
+    """Report label for a request: its path without the query string"""
+    return urlsplit(url).path
+
+
+async def _fetch(client: httpx.AsyncClient, url: str, results: LoadTestResults):
+    endpoint = _endpoint(url)
+    start = time.perf_counter()
+    try:
+        response = await client.get(url)
+        await response.aread()
+        results.record_request(endpoint, time.perf_counter() - start, response.status_code)
+    except Exception as e:
+        results.record_request(endpoint, time.perf_counter() - start, None)
+        results.record_failure(endpoint, e)
+
+
+async def _virtual_user(client: httpx.AsyncClient, pages: List[str], start_delay: float, deadline: float,
+                        iterations: int, think_time: float, results: LoadTestResults, rng: random.Random):
+    await asyncio.sleep(start_delay)
+    loads = 0
+    while time.perf_counter() < deadline and (not iterations or loads < iterations):
+        page = rng.choice(pages)
+        start = time.perf_counter()
+        await asyncio.gather(*(_fetch(client, url, results) for url in PAGE_PROFILES[page]))
+        results.record_page(page, time.perf_counter() - start)
+        loads += 1
+
+        if think_time > 0:
+            # +/-50% jitter so the users do not stay in lockstep
+            await asyncio.sleep(think_time * rng.uniform(0.5, 1.5))
+
+
+async def run_load_test(pages: List[str], concurrency: int, duration: float, ramp_up: float = 0.0,
+                        think_time: float = 1.0, iterations: int = 0, base_url: str = None,
+                        timeout: float = DEFAULT_TIMEOUT_SECONDS, seed: int = None) -> Dict[str, Any]:
+    """Run `concurrency` virtual users for `duration` seconds (or `iterations` page loads each)"""
+    async with contextlib.AsyncExitStack() as stack:
+        if base_url:
+            transport = None
+        else:
+            from app.main import app
+            transport = httpx.ASGITransport(app=app)
+            # The ASGI transport sends no lifespan events: run the startup (warm-up) and shutdown
+            # (frequency save, report workers) handlers around the test as uvicorn would
+            await stack.enter_async_context(app.router.lifespan_context(app))
+
+        client = await stack.enter_async_context(httpx.AsyncClient(
+            transport=transport, base_url=base_url or 'http://loadtest', timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency * 4, max_keepalive_connections=concurrency * 4)
+        ))
+        results = LoadTestResults()
+        rng = random.Random(seed)
+        start = time.perf_counter()
+        deadline = start + ramp_up + duration if duration else float('inf')
+        users = [
+            _virtual_user(
+                client, pages, ramp_up * i / concurrency, deadline, iterations, think_time, results,
+                random.Random(rng.random())
+            )
+            for i in range(concurrency)
+        ]
+        await asyncio.gather(*users)
+        elapsed = time.perf_counter() - start
+
+    return summarize(results, elapsed, {
+        'target': base_url or 'in-process',
+        'pages': pages,
+        'concurrency': concurrency,
+        'ramp_up_seconds': ramp_up,
+        'duration_seconds': duration,
+        'iterations': iterations,
+        'think_time_seconds': think_time
+    })
+
+
+def summarize(results: LoadTestResults, elapsed: float, config: Dict[str, Any]) -> Dict[str, Any]:
+    """Throughput, latency percentiles and error rates per endpoint and page"""
+    endpoints = {}
+    total_requests = 0
+    total_errors = 0
+    for endpoint, samples in sorted(results.requests.items()):
+        errors = sum(1 for _, status in samples if status is None or status >= 400)
+        statuses: Dict[str, int] = {}
+        for _, status in samples:
+            key = str(status) if status is not None else 'transport_error'
+            statuses[key] = statuses.get(key, 0) + 1
+
+        endpoints[endpoint] = {
+            'requests': len(samples),
+            'errors': errors,
+            'error_rate': errors / len(samples),
+            'throughput_rps': len(samples) / elapsed if elapsed > 0 else 0.0,
+            'statuses': statuses,
+            **_latency_stats([latency for latency, _ in samples])
+        }
+        total_requests += len(samples)
+        total_errors += errors
+
+    pages = {
+        page: {'loads': len(samples), **_latency_stats(samples)}
+        for page, samples in sorted(results.pages.items())
+    }
+
+    all_latencies = [latency for samples in results.requests.values() for latency, _ in samples]
+    return {
+        'config': config,
+        'elapsed_seconds': elapsed,
+        'total': {
+            'requests': total_requests,
+            'errors': total_errors,
+            'error_rate': total_errors / total_requests if total_requests else 0.0,
+            'throughput_rps': total_requests / elapsed if elapsed > 0 else 0.0,
+            'page_loads_per_second': sum(len(s) for s in results.pages.values()) / elapsed if elapsed > 0 else 0.0,
+            **_latency_stats(all_latencies)
+        },
+        'endpoints': endpoints,
+        'pages': pages,
+        'failures': results.failures
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    total = report['total']
+    print(
+        f"== {report['config']['target']}: {report['config']['concurrency']} users, "
+        f"{report['elapsed_seconds']:.1f}s, {total['requests']:,} requests "
+        f"({total['throughput_rps']:.1f} req/s, {total['page_loads_per_second']:.2f} pages/s), "
+        f"errors {total['error_rate'] * 100:.2f}%",
+        file=sys.stderr
+    )
+    print(f"  {'endpoint':<52} {'reqs':>6} {'err%':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=sys.stderr)
+    for endpoint, stats in report['endpoints'].items():
+        print(
+            f"  {endpoint:<52} {stats['requests']:>6} {stats['error_rate'] * 100:>6.2f}"
+            f" {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}",
+            file=sys.stderr
+        )
+    for page, stats in report['pages'].items():
+        print(
+            f"  page {page:<47} {stats['loads']:>6} {'':>6}"
+            f" {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}",
+            file=sys.stderr
+        )
+    for failure, count in report['failures'].items():
+        print(f"  FAILED {failure} x{count}", file=sys.stderr)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay the dashboard's per-page request mix under load")
+    parser.add_argument('--base-url', default=None, help="target server (default: the app in-process via ASGI)")
+    parser.add_argument('--pages', default=','.join(DEFAULT_PAGES),
+                        help=f"comma-separated page mix, repeat a page to weight it ({', '.join(PAGE_PROFILES)})")
+    parser.add_argument('--concurrency', type=int, default=10, help="number of virtual users")
+    parser.add_argument('--ramp-up', type=float, default=0.0, help="seconds over which the users start")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds to run after ramp-up (0 = until --iterations)")
+    parser.add_argument('--iterations', type=int, default=0, help="page loads per user (0 = until --duration)")
+    parser.add_argument('--think-time', type=float, default=1.0, help="mean seconds between page loads per user")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT_SECONDS, help="per-request timeout")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default=None, help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    pages = [page.strip() for page in args.pages.split(',') if page.strip()]
+    unknown = [page for page in pages if page not in PAGE_PROFILES]
+    if unknown or not pages:
+        print(f"Error: unknown pages {unknown} - choose from {', '.join(PAGE_PROFILES)}", file=sys.stderr)
+        return 1
+    if not args.duration and not args.iterations:
+        print("Error: set --duration or --iterations", file=sys.stderr)
+        return 1
+
+    report = asyncio.run(run_load_test(
+        pages, max(1, args.concurrency), args.duration, args.ramp_up, args.think_time, args.iterations,
+        args.base_url, args.timeout, args.seed
+    ))
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    return 1 if report['total']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
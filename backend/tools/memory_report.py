@@ -0,0 +1,85 @@
+"""
+Memory report for EmissionsDataService: column and derived-structure bytes, load peaks, per-method deltas
+
+The dataset is loaded with tracemalloc running, then (unless --no-calls) every benchmark case is
+called once so the derived structures are built and each method's allocation delta is recorded.
+
+Usage (from backend/):
+    python -m tools.memory_report
+    python -m tools.memory_report --scale 10 --output memory.json
+"""
+import argparse
+import json
+import sys
+from typing import Dict, List, Any
+
+from app.services.data_service import EmissionsDataService
+from app.utils.memory import start_tracing, memory_report
+from tools.benchmark import DEFAULT_DATA_FILE, benchmark_cases, read_raw, scale_dataset
+
+
+def print_report(report: Dict[str, Any], top: int):
+    mb = 1e6
+    dataset = report['dataset']
+    print(f"== dataset: {dataset['rows']:,} rows, {dataset['total_bytes'] / mb:.1f} MB", file=sys.stderr)
+    for col, info in list(dataset['columns'].items())[:top]:
+        print(f"  {col:<50} {info['dtype']:<16} {info['bytes'] / mb:9.2f} MB", file=sys.stderr)
+
+    load = report['load']
+    print("== load phases (traced)", file=sys.stderr)
+    for phase, trace in load.items():
+        print(
+            f"  {phase:<50} peak {trace['peak_bytes'] / mb:9.2f} MB  net {trace['net_bytes'] / mb:9.2f} MB"
+            f"  {trace['seconds']:.2f}s",
+            file=sys.stderr
+        )
+
+    structures = report['structures']
+    print(f"== derived structures: {structures['total_bytes'] / mb:.1f} MB", file=sys.stderr)
+    for name, size in structures['structures'].items():
+        print(f"  {name:<50} {size / mb:9.2f} MB", file=sys.stderr)
+
+    print("== service methods (largest peak first)", file=sys.stderr)
+    for method, stats in list(report['methods'].items())[:top]:
+        print(
+            f"  {method:<50} peak {stats['peak_bytes_max'] / mb:9.2f} MB"
+            f"  net {stats['net_bytes_max'] / mb:9.2f} MB  calls {stats['calls']}",
+            file=sys.stderr
+        )
+
+    process = report['process']
+    if 'max_rss_bytes' in process:
+        print(f"== process max RSS {process['max_rss_bytes'] / mb:.1f} MB", file=sys.stderr)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report EmissionsDataService memory usage")
+    parser.add_argument('--data', default=DEFAULT_DATA_FILE, help="source CLIMAS export (xlsx/csv/parquet)")
+    parser.add_argument('--scale', type=int, default=1, help="replication factor (see tools.benchmark)")
+    parser.add_argument('--no-calls', action='store_true', help="only load the dataset, call no methods")
+    parser.add_argument('--top', type=int, default=15, help="rows shown per table")
+    parser.add_argument('--output', default=None, help="write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    raw_df = scale_dataset(read_raw(args.data), args.scale)
+
+    start_tracing()
+    service = EmissionsDataService(df=raw_df)
+
+    if not args.no_calls:
+        for _, call in benchmark_cases(service):
+            call()
+
+    report = memory_report(service)
+    print_report(report, args.top)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False, default=str))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
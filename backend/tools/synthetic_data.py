@@ -0,0 +1,230 @@
+"""
+Synthetic CLIMAS dataset generator that learns from a real export
+
+The generator treats every (ID do parâmetro, Gás) pair of the source file as a monthly series
+template. Synthetic parameters are clones of real parameters (all their gases together), so the
+hierarchy / parameter / gas combinations - and therefore the documented cardinalities and the
+hierarchy nesting - are exactly those of the real data. Per series it learns the log-normal
+distribution of Valor, the share of zero months, the monthly emission factor and the implied
+GWP, then recomputes emissions as Valor x conversion factor x emission factor x GWP.
+
+Usage (from backend/):
+    python -m tools.synthetic_data --rows 2000000 --years 5 --output ../data/synthetic.parquet
+"""
+import argparse
+import sys
+import time
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from tools.benchmark import read_raw, DEFAULT_DATA_FILE
+
+SERIES_KEY = ['ID do parâmetro', 'Gás']
+
+CATEGORICAL_COLUMNS = [
+    'Hierarquia nível 1', 'Hierarquia nível 2', 'Hierarquia nível 3', 'Hierarquia nível 4',
+    'Hierarquia nível 5', 'Hierarquia nível 6', 'Hierarquia nível 7', 'Unidade operacional', 'País',
+    'Parâmetro', 'Unidade de medida', 'Tecnologia', 'Precursor', 'Escopo', 'Categoria',
+    'Superfamília de gás', 'Família de gás', 'Gás'
+]
+
+ZERO_COLUMNS = [
+    'Emissões de controle operacional (tGEE)', 'Emissões de participação acionária (tGEE)',
+    'Emissões de controle operacional (tCO2e)', 'Emissões de participação acionária (tCO2e)'
+]
+
+XLSX_MAX_ROWS = 1_048_575
+
+# Spread of the per-series scale (cross-series skew) and of the yearly drift
+SERIES_SCALE_SIGMA = 0.6
+YEARLY_DRIFT_SIGMA = 0.05
+DEFAULT_MONTHLY_SIGMA = 0.3
+
+
+class DatasetProfile:
+    """Per-series statistics learned from a real CLIMAS export"""
+
+    def __init__(self, raw_df: pd.DataFrame):
+        self.columns = list(raw_df.columns)
+        self.last_year = int(raw_df['Ano'].max())
+
+        # One template per series, in first-appearance order (matches ngroup(sort=False)). Series with a
+        # missing key are kept as their own group, like drop_duplicates does, so codes never go NaN
+        series_id = raw_df.groupby(SERIES_KEY, sort=False, dropna=False).ngroup().to_numpy(dtype=np.int64)
+        self.templates = raw_df.drop_duplicates(SERIES_KEY).reset_index(drop=True)
+        n_templates = len(self.templates)
+
+        month = pd.to_numeric(raw_df['Competência'].astype(str).str[5:7], errors='coerce').fillna(1).to_numpy(int) - 1
+        valor = raw_df['Valor'].to_numpy(dtype=float)
+        positive = valor > 0
+
+        # Log-normal Valor per series from its non-zero months
+        n_rows = np.bincount(series_id, minlength=n_templates)
+        n_positive = np.bincount(series_id[positive], minlength=n_templates)
+        log_valor = np.log(valor[positive])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mu = np.bincount(series_id[positive], weights=log_valor, minlength=n_templates) / n_positive
+            second_moment = np.bincount(series_id[positive], weights=log_valor ** 2, minlength=n_templates) / n_positive
+        self.log_mu = mu  # NaN for series that were always zero
+        self.log_sigma = np.where(n_positive >= 2, np.sqrt(np.maximum(second_moment - mu ** 2, 0)), DEFAULT_MONTHLY_SIGMA)
+        self.zero_probability = 1 - n_positive / np.maximum(n_rows, 1)
+
+        # Emission factor per series and calendar month (falls back to the series mean)
+        factor = raw_df['Fator de emissão'].to_numpy(dtype=float)
+        cell = series_id * 12 + month
+        factor_sum = np.bincount(cell, weights=factor, minlength=n_templates * 12).reshape(n_templates, 12)
+        factor_count = np.bincount(cell, minlength=n_templates * 12).reshape(n_templates, 12)
+        series_factor = np.bincount(series_id, weights=factor, minlength=n_templates) / np.maximum(n_rows, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.emission_factor = np.where(factor_count > 0, factor_sum / factor_count, series_factor[:, None])
+
+        # GWP implied by the stored tCO2e / tGEE
+        tgee = raw_df['Emissões (tGEE)'].to_numpy(dtype=float)
+        tco2e = raw_df['Emissões (tCO2e)'].to_numpy(dtype=float)
+        has_ratio = tgee > 0
+        ratio_sum = np.bincount(series_id[has_ratio], weights=tco2e[has_ratio] / tgee[has_ratio], minlength=n_templates)
+        ratio_count = np.bincount(series_id[has_ratio], minlength=n_templates)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.gwp = np.where(ratio_count > 0, ratio_sum / ratio_count, 1.0)
+        self.conversion_factor = self.templates['Fator de conversão'].to_numpy(dtype=float)
+
+        # Parameters (IDs) group their gas series - clones copy all of them together
+        # (templates without an ID form one parameter rather than a -1 code)
+        self.parameter_codes, self.parameter_ids = pd.factorize(self.templates['ID do parâmetro'], use_na_sentinel=False)
+        self.templates_per_parameter = np.bincount(self.parameter_codes)
+        self.parameter_order = np.argsort(self.parameter_codes, kind='stable')
+        self.parameter_starts = np.concatenate([[0], np.cumsum(self.templates_per_parameter)[:-1]])
+
+        self.category_codes = {}
+        for col in CATEGORICAL_COLUMNS:
+            codes, uniques = pd.factorize(self.templates[col])
+            self.category_codes[col] = (codes, uniques)
+
+
+def generate(profile: DatasetProfile, rows: int, years: int = 1, start_year: int = None,
+             seed: int = None) -> pd.DataFrame:
+    """Generate `rows` synthetic rows spread over `years` years of monthly periods"""
+    rng = np.random.default_rng(seed)
+    start_year = start_year if start_year is not None else profile.last_year - years + 1
+    n_months = years * 12
+
+    # Sample parameters (with replacement) until the expected row count is reached
+    rows_per_parameter = profile.templates_per_parameter.mean() * n_months
+    n_parameters = max(1, int(np.ceil(rows / rows_per_parameter)))
+    sampled = rng.integers(0, len(profile.templates_per_parameter), n_parameters)
+    while profile.templates_per_parameter[sampled].sum() * n_months < rows:
+        extra = max(1, n_parameters // 20)
+        sampled = np.concatenate([sampled, rng.integers(0, len(profile.templates_per_parameter), extra)])
+    n_parameters = len(sampled)
+
+    counts = profile.templates_per_parameter[sampled]
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    series_template = profile.parameter_order[np.repeat(profile.parameter_starts[sampled], counts) + offsets]
+    series_clone = np.repeat(np.arange(n_parameters), counts)
+    n_series = len(series_template)
+
+    # Cross-series skew and a small yearly drift per series
+    series_scale = rng.lognormal(0.0, SERIES_SCALE_SIGMA, n_series)
+    series_drift = rng.normal(0.0, YEARLY_DRIFT_SIGMA, n_series)
+
+    series = np.repeat(np.arange(n_series), n_months)[:rows]
+    period = np.tile(np.arange(n_months), n_series)[:rows]
+    template = series_template[series]
+    year = start_year + period // 12
+    month = period % 12
+    n_rows = len(series)
+
+    mu = profile.log_mu[template]
+    valor = np.exp(np.nan_to_num(mu) + profile.log_sigma[template] * rng.standard_normal(n_rows))
+    valor *= series_scale[series] * (1 + series_drift[series]) ** (year - start_year)
+    is_zero = np.isnan(mu) | (rng.random(n_rows) < profile.zero_probability[template])
+    valor = np.where(is_zero, 0.0, valor)
+
+    emission_factor = profile.emission_factor[template, month]
+    tgee = valor * profile.conversion_factor[template] * emission_factor
+    tco2e = tgee * profile.gwp[template]
+
+    data = {}
+    for col in profile.columns:
+        if col in profile.category_codes:
+            codes, uniques = profile.category_codes[col]
+            data[col] = pd.Categorical.from_codes(codes[template], categories=uniques)
+        elif col in ZERO_COLUMNS:
+            data[col] = np.zeros(n_rows, dtype=np.int64)
+        elif col == 'ID do parâmetro':
+            # Every clone is a new parameter series
+            data[col] = int(profile.parameter_ids.max()) + 1 + series_clone[series]
+        elif col == 'Competência':
+            labels = np.array([f"{start_year + i // 12}-{i % 12 + 1:02d}" for i in range(n_months)])
+            data[col] = pd.Categorical.from_codes(period, categories=labels)
+        elif col == 'Ano':
+            data[col] = year.astype(np.int64)
+        elif col == 'Valor':
+            data[col] = valor
+        elif col == 'Fator de emissão':
+            data[col] = emission_factor
+        elif col == 'Emissões (tGEE)':
+            data[col] = tgee
+        elif col == 'Emissões (tCO2e)':
+            data[col] = tco2e
+        else:
+            data[col] = profile.templates[col].to_numpy()[template]
+
+    return pd.DataFrame(data, columns=profile.columns)
+
+
+def write_dataset(df: pd.DataFrame, path: str):
+    """Write by extension: .csv, .xlsx, .parquet or .feather (columnar formats need pyarrow)"""
+    if path.endswith('.csv'):
+        df.to_csv(path, index=False)
+    elif path.endswith('.xlsx'):
+        if len(df) > XLSX_MAX_ROWS:
+            raise ValueError(f"xlsx holds at most {XLSX_MAX_ROWS:,} rows - use .csv or .parquet")
+        df.to_excel(path, index=False)
+    elif path.endswith('.parquet') or path.endswith('.feather'):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("pyarrow is required for columnar output (pip install pyarrow)")
+        if path.endswith('.parquet'):
+            df.to_parquet(path, index=False)
+        else:
+            df.to_feather(path)
+    else:
+        raise ValueError(f"Unsupported output format: {path}")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate a synthetic CLIMAS dataset from a real export")
+    parser.add_argument('--source', default=DEFAULT_DATA_FILE, help="real CLIMAS export to learn from")
+    parser.add_argument('--rows', type=int, required=True, help="number of rows to generate")
+    parser.add_argument('--years', type=int, default=1, help="number of consecutive years")
+    parser.add_argument('--start-year', type=int, default=None, help="first year (default: ends at the source's last year)")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', required=True, help="output file (.csv, .xlsx, .parquet, .feather)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    profile = DatasetProfile(read_raw(args.source))
+    learned = time.perf_counter()
+    df = generate(profile, args.rows, args.years, args.start_year, args.seed)
+    generated = time.perf_counter()
+    try:
+        write_dataset(df, args.output)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    written = time.perf_counter()
+
+    print(
+        f"{len(df):,} rows, {df['Ano'].min()}-{df['Ano'].max()}: learn {learned - start:.2f}s, "
+        f"generate {generated - learned:.2f}s, write {written - generated:.2f}s -> {args.output}",
+        file=sys.stderr
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -156,12 +156,12 @@ const ProcessTechnologyAnalysis = () => {
                   <div className="mb-2">
                     <small className="text-muted">Emission Factor:</small>
                     <br />
-                    <Badge bg="info">{tech.emission_factor.toFixed(2)}</Badge>
+                    <Badge bg="info">{tech.emission_factor != null ? tech.emission_factor.toFixed(2) : 'n/a'}</Badge>
                   </div>
                   <div className="mb-2">
                     <small className="text-muted">Conversion Factor:</small>
                     <br />
-                    <Badge bg="secondary">{tech.conversion_factor.toFixed(2)}</Badge>
+                    <Badge bg="secondary">{tech.conversion_factor != null ? tech.conversion_factor.toFixed(2) : 'n/a'}</Badge>
                   </div>
                   <div className="mb-2">
                     <small className="text-muted">Total Emissions:</small>